@@ -636,6 +636,12 @@ END;
 
 def install_tc(sender, **kwargs):
     from django.db import connection, transaction
+    from aiida.backends.utils import is_dbpath_enabled
+
+    if not is_dbpath_enabled():
+        # The DbPath table is disabled, see migration 0007
+        uninstall_tc()
+        return
 
     cursor = connection.cursor()
 
@@ -780,6 +786,34 @@ def install_tc(sender, **kwargs):
     else:
         print '== No transitive closure installed =='
 
+def uninstall_tc():
+    """
+    Drop the triggers updating the transitive closure table, and the table.
+    """
+    from django.db import connection, transaction
+
+    cursor = connection.cursor()
+    engine = settings.DATABASES['default']['ENGINE']
+
+    if "mysql" in engine:
+        db_name = settings.DATABASES['default']['NAME']
+        cursor.execute("DROP TRIGGER IF EXISTS update_tc_insert;")
+        cursor.execute("DROP TRIGGER IF EXISTS update_tc_delete;")
+        cursor.execute(
+            "DROP PROCEDURE IF EXISTS `" + db_name + "`.`update_tc`;")
+        cursor.execute("DROP TABLE IF EXISTS PurgeList;")
+    elif "postgresql" in engine:
+        cursor.execute("DROP TRIGGER IF EXISTS autoupdate_tc ON db_dblink;")
+        cursor.execute("DROP FUNCTION IF EXISTS update_tc();")
+    elif "sqlite3" in engine:
+        cursor.execute("DROP TRIGGER IF EXISTS update_tc;")
+        cursor.execute("DROP TRIGGER IF EXISTS deleted_from;")
+        cursor.execute("DROP TRIGGER IF EXISTS update_purgelist;")
+        cursor.execute("DROP TABLE IF EXISTS purge_list;")
+
+    cursor.execute("DROP TABLE IF EXISTS db_dbpath;")
+    transaction.commit_unless_managed()
+
 ## dispatch_uid used to avoid to install twice the signal if this
 ## module is loaded twice (it happens e.g. when tests are run)
 from django.db.models.signals import post_migrate
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from aiida.backends.djsite.db.migrations import update_schema_version
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+SCHEMA_VERSION = "1.0.4"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0003_add_link_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DbCheckpoint',
+            fields=[
+                ('pid', models.CharField(max_length=255, serialize=False, primary_key=True)),
+                ('state', models.CharField(max_length=25, db_index=True)),
+                ('waiting_on', models.TextField(blank=True)),
+                ('version', models.IntegerField()),
+                ('checkpoint', models.BinaryField()),
+                ('mtime', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        update_schema_version(SCHEMA_VERSION)
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from aiida.backends.djsite.db.migrations import update_schema_version
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+SCHEMA_VERSION = "1.0.5"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0004_add_dbcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dbcheckpoint',
+            name='lease_owner',
+            field=models.CharField(db_index=True, max_length=255, blank=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='dbcheckpoint',
+            name='lease_expiry',
+            field=models.DateTimeField(null=True),
+            preserve_default=True,
+        ),
+        update_schema_version(SCHEMA_VERSION)
+    ]
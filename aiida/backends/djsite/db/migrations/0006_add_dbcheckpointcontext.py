@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+from aiida.backends.djsite.db.migrations import update_schema_version
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+SCHEMA_VERSION = "1.0.6"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0005_dbcheckpoint_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DbCheckpointContext',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('key', models.CharField(max_length=255)),
+                ('value', models.BinaryField()),
+                ('dbcheckpoint', models.ForeignKey(related_name='context_entries', to='db.DbCheckpoint', on_delete=django.db.models.deletion.CASCADE)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dbcheckpointcontext',
+            unique_together=set([('dbcheckpoint', 'key')]),
+        ),
+        update_schema_version(SCHEMA_VERSION)
+    ]
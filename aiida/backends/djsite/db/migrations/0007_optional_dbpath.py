@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+from aiida.backends.djsite.db.migrations import update_schema_version
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+SCHEMA_VERSION = "1.0.7"
+
+
+def drop_dbpath(apps, schema_editor):
+    """
+    Drop the transitive closure triggers and table, if the DbPath table is
+    disabled in the profile (with the USE_DBPATH setting).
+    """
+    from aiida.backends.utils import is_dbpath_enabled
+    from aiida.backends.djsite.db.management import uninstall_tc
+
+    if not is_dbpath_enabled():
+        uninstall_tc()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0006_add_dbcheckpointcontext'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dbpath',
+            name='child',
+            field=models.ForeignKey(related_name='parent_paths', on_delete=django.db.models.deletion.DO_NOTHING, editable=False, to='db.DbNode'),
+        ),
+        migrations.AlterField(
+            model_name='dbpath',
+            name='parent',
+            field=models.ForeignKey(related_name='child_paths', on_delete=django.db.models.deletion.DO_NOTHING, editable=False, to='db.DbNode'),
+        ),
+        migrations.RunPython(drop_dbpath),
+        update_schema_version(SCHEMA_VERSION)
+    ]
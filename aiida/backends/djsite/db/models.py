@@ -301,9 +301,16 @@ class DbLink(m.Model):
 class DbPath(m.Model):
     """
     Transitive closure table for all dbnode paths.
+
+    The table is only managed by the triggers on the DbLink table (that also
+    delete the paths of the deleted links), and can be disabled altogether
+    (see :func:`aiida.backends.utils.is_dbpath_enabled`): Django does not look
+    for the paths of the nodes it deletes.
     """
-    parent = m.ForeignKey('DbNode', related_name='child_paths', editable=False)
-    child = m.ForeignKey('DbNode', related_name='parent_paths', editable=False)
+    parent = m.ForeignKey('DbNode', related_name='child_paths', editable=False,
+                          on_delete=m.DO_NOTHING)
+    child = m.ForeignKey('DbNode', related_name='parent_paths', editable=False,
+                         on_delete=m.DO_NOTHING)
     depth = m.IntegerField(editable=False)
 
     # Used to delete or to expand the path
@@ -1168,27 +1175,45 @@ class DbAttributeBaseClass(DbMultipleValueAttributeBaseClass):
             stored in the Db table, correctly converted
             to the right type.
         """
-        dballsubvalues = cls.objects.filter(dbnode__id=dbnodepk).values_list(
-            'key', 'datatype', 'tval', 'fval',
+        return cls.get_all_values_for_nodepks([dbnodepk])[dbnodepk]
+
+    @classmethod
+    def get_all_values_for_nodepks(cls, dbnodepks):
+        """
+        Return the attributes of many dbnodes, with a single query.
+
+        :param dbnodepks: a list of dbnode PKs
+        :return: a dictionary {pk: attributes}, with an entry for each of
+            the given PKs, where attributes is a dictionary as returned by
+            get_all_values_for_nodepk
+        """
+        dballsubvalues = cls.objects.filter(
+            dbnode__id__in=dbnodepks).values_list(
+            'dbnode_id', 'key', 'datatype', 'tval', 'fval',
             'ival', 'bval', 'dval')
 
-        data = {_[0]: {
-            "datatype": _[1],
-            "tval": _[2],
-            "fval": _[3],
-            "ival": _[4],
-            "bval": _[5],
-            "dval": _[6],
-        } for _ in dballsubvalues
-                }
-        try:
-            return deserialize_attributes(data, sep=cls._sep,
-                                          original_class=cls,
-                                          original_pk=dbnodepk)
-        except DeserializationException as e:
-            exc = DbContentError(e.message)
-            exc.original_exception = e
-            raise exc
+        data = {pk: {} for pk in dbnodepks}
+        for _ in dballsubvalues:
+            data[_[0]][_[1]] = {
+                "datatype": _[2],
+                "tval": _[3],
+                "fval": _[4],
+                "ival": _[5],
+                "bval": _[6],
+                "dval": _[7],
+            }
+
+        result = {}
+        for pk, pkdata in data.iteritems():
+            try:
+                result[pk] = deserialize_attributes(pkdata, sep=cls._sep,
+                                                    original_class=cls,
+                                                    original_pk=pk)
+            except DeserializationException as e:
+                exc = DbContentError(e.message)
+                exc.original_exception = e
+                raise exc
+        return result
 
     @classmethod
     def reset_values_for_node(cls, dbnode, attributes, with_transaction=True,
@@ -1654,6 +1679,42 @@ class DbLock(m.Model):
     owner = m.CharField(max_length=255, blank=False)
 
 
+class DbCheckpoint(m.Model):
+    """
+    Store the checkpoints of the processes of the workflow engine, see
+    aiida.work.persistence.DbPersistence.
+    """
+    # The pid of the process (the pk of its calculation, or a uuid if the
+    # calculation is not stored)
+    pid = m.CharField(max_length=255, primary_key=True)
+    # One of 'running', 'finished' and 'failed'
+    state = m.CharField(max_length=25, db_index=True)
+    # JSON description of what the process is waiting on
+    waiting_on = m.TextField(blank=True)
+    # Version of the format of the checkpoint data
+    version = m.IntegerField()
+    checkpoint = m.BinaryField()
+    mtime = m.DateTimeField(auto_now=True, editable=False)
+    # The daemon worker running the process, if any, until lease_expiry
+    lease_owner = m.CharField(max_length=255, blank=True, db_index=True)
+    lease_expiry = m.DateTimeField(null=True)
+
+
+class DbCheckpointContext(m.Model):
+    """
+    Store separately the variables of the context of the workchains, so
+    that only the ones that changed are rewritten, see
+    aiida.work.persistence.DbPersistence.
+    """
+    dbcheckpoint = m.ForeignKey(DbCheckpoint, on_delete=m.CASCADE,
+                                related_name='context_entries')
+    key = m.CharField(max_length=255)
+    value = m.BinaryField()
+
+    class Meta:
+        unique_together = (("dbcheckpoint", "key"),)
+
+
 @python_2_unicode_compatible
 class DbWorkflow(m.Model):
     from aiida.common.datastructures import wf_states
@@ -275,6 +275,83 @@ class TestNodeBasicDjango(AiidaTestCase):
 
         self.assertEqual(s1.getvalue(), "a")
 
+    def test_attributes_cache(self):
+        """
+        The attributes of a stored node are read with a single query
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from aiida.orm import load_node
+
+        a = Node()
+        a._set_attr('bool', True)
+        a._set_attr('dict', {'a': [1, 2]})
+        a.store()
+
+        b = load_node(a.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEquals(b.get_attr('bool'), True)
+            self.assertEquals(b.get_attr('dict'), {'a': [1, 2]})
+            self.assertIsNone(b.get_attr('missing', None))
+            self.assertEquals(set(b.attrs()), {'bool', 'dict'})
+            self.assertEquals(b.get_attrs(),
+                              {'bool': True, 'dict': {'a': [1, 2]}})
+        self.assertEquals(len(queries), 1)
+
+        # The cached values are not changed through the returned ones
+        b.get_attr('dict')['a'].append(3)
+        self.assertEquals(b.get_attr('dict'), {'a': [1, 2]})
+
+        # The cache is invalidated when the attributes are changed
+        b._set_attr('bool', False)
+        self.assertEquals(b.get_attr('bool'), False)
+        b._del_attr('bool')
+        with self.assertRaises(AttributeError):
+            b.get_attr('bool')
+        self.assertEquals(b.get_attrs(), {'dict': {'a': [1, 2]}})
+
+    def test_prefetch_attributes(self):
+        """
+        The attributes of many nodes are loaded with a single query
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from aiida.orm import load_node
+
+        pks = []
+        for i in range(3):
+            n = Node()
+            n._set_attr('index', i)
+            n.store()
+            pks.append(n.pk)
+
+        nodes = [load_node(pk) for pk in pks]
+        with CaptureQueriesContext(connection) as queries:
+            Node.prefetch_attributes(nodes)
+            self.assertEquals([n.get_attr('index') for n in nodes],
+                              range(3))
+        self.assertEquals(len(queries), 1)
+
+    def test_attributes_cache_unsealed(self):
+        """
+        The attributes of an unsealed node can be changed by other
+        processes, so they are not cached until the node is sealed
+        """
+        from aiida.orm import load_node
+        from aiida.orm.calculation import Calculation
+
+        a = Calculation().store()
+        b = load_node(a.pk)
+        self.assertIsNone(b.get_attr('hash', None))
+        self.assertFalse(b.is_sealed)
+
+        # E.g. the daemon, through another instance of the node
+        a._set_attr('hash', 'abc')
+        a.seal()
+        self.assertEquals(b.get_attr('hash'), 'abc')
+        self.assertTrue(b.is_sealed)
+        self.assertEquals(b.get_attrs()['hash'], 'abc')
+
     def test_load_nodes(self):
         """
         """
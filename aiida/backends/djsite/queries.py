@@ -75,3 +75,54 @@ class QueryManagerDjango(AbstractQueryManager):
             return queryresults[:limit]
         else:
             return queryresults
+
+    def query_job_ids_by_computer_user_state(self, state, computer=None,
+                                             user=None, only_enabled=True):
+        # Overridden: the projection of the attributes with the QueryBuilder
+        # costs two queries per calculation with Django, here the
+        # attributes of all the calculations are fetched with a single query
+        """
+        Like query_jobcalculations_by_computer_user_state, but without loading
+        the calculations: only the few attributes needed to follow the jobs
+        on the scheduler are returned.
+
+        :return: a list of tuples (pk, job_id, scheduler_state) of the
+            calculations matching the filters (job_id and scheduler_state
+            are None if not set).
+        """
+        from aiida.backends.djsite.db.models import DbAttribute
+
+        qb = self._get_calcs_by_computer_user_state_qb(
+            state, computer=computer, user=user, only_enabled=only_enabled)
+        qb.add_projection("calc", "id")
+        pks = [res[0] for res in qb.all()]
+        if not pks:
+            return []
+
+        # Both attributes are strings
+        values = {pk: {} for pk in pks}
+        for pk, key, tval in DbAttribute.objects.filter(
+                dbnode_id__in=pks,
+                key__in=('job_id', 'scheduler_state')).values_list(
+                    'dbnode_id', 'key', 'tval'):
+            values[pk][key] = tval
+
+        return [(pk, values[pk].get('job_id'),
+                 values[pk].get('scheduler_state')) for pk in pks]
+
+    def get_calc_state_changes(self, since_id=None):
+        from django.db.models import Max
+        from aiida.backends.djsite.db.models import DbCalcState
+
+        if since_id is None:
+            last_id = DbCalcState.objects.aggregate(Max('id'))['id__max']
+            return last_id or 0, set()
+
+        new_states = DbCalcState.objects.filter(id__gt=since_id)
+        last_id = new_states.aggregate(Max('id'))['id__max']
+        if last_id is None:
+            return since_id, set()
+
+        states = set(new_states.filter(id__lte=last_id).values_list(
+            'state', flat=True).distinct())
+        return last_id, states
@@ -38,11 +38,49 @@ class AbstractQueryManager(object):
 
         :return: a list of calculation objects matching the filters.
         """
+        qb = self._get_calcs_by_computer_user_state_qb(
+            state, computer=computer, user=user, only_enabled=only_enabled)
+
+        if only_computer_user_pairs:
+            qb.add_projection("computer", "*")
+            qb.add_projection("user", "*")
+            returnresult = qb.distinct().all()
+        else:
+            qb.add_projection("calc", "*")
+            if limit is not None:
+                qb.limit(limit)
+            returnresult = [res[0] for res in qb.all()]
+        return returnresult
+
+    def query_job_ids_by_computer_user_state(self, state, computer=None,
+                                             user=None, only_enabled=True):
+        """
+        Like query_jobcalculations_by_computer_user_state, but without loading
+        the calculations: only the few attributes needed to follow the jobs
+        on the scheduler are returned.
+
+        :return: a list of tuples (pk, job_id, scheduler_state) of the
+            calculations matching the filters (job_id and scheduler_state
+            are None if not set).
+        """
+        qb = self._get_calcs_by_computer_user_state_qb(
+            state, computer=computer, user=user, only_enabled=only_enabled)
+        qb.add_projection("calc", ["id", "attributes.job_id",
+                                   "attributes.scheduler_state"])
+        return [tuple(res) for res in qb.all()]
+
+    def _get_calcs_by_computer_user_state_qb(self, state, computer=None,
+                                             user=None, only_enabled=True):
+        """
+        Return a QueryBuilder, without projections, for the calculations in
+        the given state (tag 'calc') with their computer and user (tags
+        'computer' and 'user'). See query_jobcalculations_by_computer_user_state
+        for the meaning of the parameters.
+        """
         # I assume that calc_states are strings. If this changes in the future,
         # update the filter below from dbattributes__tval to the correct field.
         from aiida.orm.computer import Computer
         from aiida.orm.calculation.job import JobCalculation
-        from aiida.orm.user import User
         from aiida.orm.querybuilder import QueryBuilder
         from aiida.common.exceptions import InputValidationError
         from aiida.common.datastructures import calc_states
@@ -52,9 +90,12 @@ class AbstractQueryManager(object):
                                 "is not a valid calculation state".format(state))
 
         calcfilter = {'state': {'==': state}}
-        computerfilter = {"enabled": {'==': True}}
+        computerfilter = {}
         userfilter = {}
 
+        if only_enabled:
+            computerfilter.update({"enabled": {'==': True}})
+
         if computer is None:
             pass
         elif isinstance(computer, int):
@@ -84,16 +125,25 @@ class AbstractQueryManager(object):
         qb.append(JobCalculation, filters=calcfilter, tag='calc', has_computer='computer')
         qb.append(type="user", tag='user', filters=userfilter,
                   creator_of="calc")
+        return qb
 
-        if only_computer_user_pairs:
-            qb.add_projection("computer", "*")
-            qb.add_projection("user", "*")
-            returnresult = qb.distinct().all()
-        else:
-            qb.add_projection("calc", "*")
-            if limit is not None:
-                qb.limit(limit)
-            returnresult = qb.all()
-            returnresult = zip(*returnresult)[0]
-        return returnresult
 
+    def get_calc_state_changes(self, since_id=None):
+        """
+        Return the calculation states entered since a given point in the
+        DbCalcState table.
+
+        Every call to ``JobCalculation._set_state`` inserts a new row in the
+        DbCalcState table, so the table can be used as a cheap, cross-process
+        log of state transitions (e.g. to wake up the daemon when something
+        changed, instead of waiting for the next polling interval).
+
+        :param since_id: the id of the last DbCalcState row that was already
+            seen, or None to only get the current position in the table.
+        :return: a tuple (last_id, states) where last_id is the id of the most
+            recent DbCalcState row (since_id if there is no new row, 0 if the
+            table is empty) and
+            states is a set with the states entered after since_id (always
+            empty if since_id is None).
+        """
+        raise NotImplementedError
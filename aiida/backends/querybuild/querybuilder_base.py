@@ -61,7 +61,10 @@ class AbstractQueryBuilder(object):
 
         :param bool with_dbpath: 
             Whether to use the DbPath table (if existing) 
-            to query ancestor-descendant relations
+            to query ancestor-descendant relations.
+            By default, the DbPath table is used unless disabled with
+            the USE_DBPATH setting of the profile,
+            see :func:`aiida.backends.utils.is_dbpath_enabled`
         :param list path: A list of the vertices to traverse
         :param dict filters: The filters to apply
         :param dict project: The projections to apply
@@ -107,7 +110,10 @@ class AbstractQueryBuilder(object):
         self._hash = None
         self._injected = False
 
-        self._with_dbpath = kwargs.pop('with_dbpath', True)
+        self._with_dbpath = kwargs.pop('with_dbpath', None)
+        if self._with_dbpath is None:
+            from aiida.backends.utils import is_dbpath_enabled
+            self._with_dbpath = is_dbpath_enabled()
         if self._with_dbpath:
             self._prepare_with_dbpath()
 
@@ -2205,7 +2211,7 @@ class AbstractQueryBuilder(object):
         pass
 
 
-    def all(self, batch_size=None):
+    def all(self, batch_size=None, prefetch_attributes=False):
         """
         Executes the full query with the order of the rows as returned by the backend.
         the order inside each row is given by the order of the vertices in the path
@@ -2216,11 +2222,20 @@ class AbstractQueryBuilder(object):
             You can optimize the speed of the query by tuning this parameter.
             Leave the default (*None*) if speed is not critical or if you don't know
             what you're doing!
+        :param bool prefetch_attributes:
+            If True, the attributes of all the nodes returned are loaded with
+            a few queries (see :func:`Node.prefetch_attributes`), instead of
+            one for each node when they are first read.
 
         :returns: a list of lists of all projected entities.
         """
-
-        return list(self.iterall(batch_size=batch_size))
+        results = list(self.iterall(batch_size=batch_size))
+        if prefetch_attributes:
+            from aiida.orm.node import Node
+            Node.prefetch_attributes(
+                item for row in results for item in row
+                if isinstance(item, Node))
+        return results
 
 
     def dict(self, batch_size=None):
@@ -131,6 +131,15 @@ class QueryBuilder(AbstractQueryBuilder):
         if operator == '==':
             type_filter, casted_entity = cast_according_to_type(database_entity, value)
             expr = and_(type_filter, casted_entity == value)
+            if (isinstance(value, (bool, str, unicode)) and
+                    not any(key.isdigit() for key in attr_key)):
+                # The same condition as a containment (the path does not
+                # go through lists), that can use the GIN index of the
+                # column (see aiida.backends.sqlalchemy.indexes)
+                contained = value
+                for key in reversed(attr_key):
+                    contained = {key: contained}
+                expr = and_(column.contains(contained), expr)
         elif operator == '>':
             type_filter, casted_entity = cast_according_to_type(database_entity, value)
             expr = and_(type_filter, casted_entity > value)
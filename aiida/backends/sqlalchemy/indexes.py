@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Management of the indexes on the JSONB columns (attributes and extras) of the
+DbNode table.
+
+The GIN indexes defined in the model are used by the containment filters
+(and by the QueryBuilder equality filters on strings and booleans). They are
+created with the tables by 'verdi setup', and can be added to a database
+created before with install_default_indexes ('verdi index install').
+
+In addition, expression indexes can be declared on the attribute (or extra)
+paths that are often filtered on, possibly only for the nodes of a given
+class and its subclasses::
+
+    add_path_index('attributes.md5', UpfData)
+
+Such an index is used by the QueryBuilder filters comparing the value at
+that path with a string ('==', 'like', 'in', ...) on UpfData nodes.
+"""
+import hashlib
+import re
+
+from sqlalchemy import text
+
+from aiida.common.exceptions import (InputValidationError, NotExistent,
+                                     UniquenessError)
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+# The indexes of the model, with the SQL creating them
+DEFAULT_INDEXES = {
+    'ix_db_dbnode_attributes_gin':
+        "CREATE INDEX ix_db_dbnode_attributes_gin ON db_dbnode "
+        "USING gin (attributes jsonb_path_ops)",
+    'ix_db_dbnode_extras_gin':
+        "CREATE INDEX ix_db_dbnode_extras_gin ON db_dbnode "
+        "USING gin (extras jsonb_path_ops)",
+}
+
+# The prefix of the names of the indexes created by add_path_index
+PATH_INDEX_PREFIX = 'ix_db_dbnode_path_'
+
+_COLUMNS = ('attributes', 'extras')
+# The maximum length of an identifier in PostgreSQL
+_MAX_NAME_LENGTH = 63
+_VALID_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def _get_session(session):
+    if session is None:
+        from aiida.backends.sqlalchemy import session
+    return session
+
+
+def _index_exists(session, name):
+    return session.execute(
+        text("SELECT 1 FROM pg_indexes WHERE indexname = :name"),
+        {'name': name}).first() is not None
+
+
+def install_default_indexes(session=None):
+    """
+    Create the default indexes that do not exist yet.
+
+    :param session: the session (or engine) to use, by default the one of
+        AiiDA
+    :return: the list of the names of the indexes created
+    """
+    session = _get_session(session)
+    created = []
+    for name in sorted(DEFAULT_INDEXES):
+        if not _index_exists(session, name):
+            session.execute(DEFAULT_INDEXES[name])
+            created.append(name)
+    if created and hasattr(session, 'commit'):
+        session.commit()
+    return created
+
+
+def get_indexes(session=None):
+    """
+    :return: a list of tuples (name, definition) with the indexes of the
+        DbNode table, sorted by name
+    """
+    session = _get_session(session)
+    return [tuple(row) for row in session.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes "
+             "WHERE tablename = 'db_dbnode' ORDER BY indexname"))]
+
+
+def _parse_path(path):
+    """
+    :param path: a path as in the QueryBuilder filters, e.g. 'attributes.md5'
+    :return: the column and the list of keys
+    """
+    column, _, keys = path.partition('.')
+    if column not in _COLUMNS or not keys:
+        raise InputValidationError(
+            "The path must be of the form 'attributes.<key>' or "
+            "'extras.<key>', e.g. 'attributes.md5', got '{}'".format(path))
+    return column, keys.split('.')
+
+
+def _get_type_string(node_class):
+    if node_class is None or isinstance(node_class, basestring):
+        return node_class
+    return node_class._query_type_string
+
+
+def get_path_index_name(path, node_class=None):
+    """
+    :return: the default name of the index on the given path, see
+        add_path_index
+    """
+    type_string = _get_type_string(node_class)
+    name = path if type_string is None else '{}_{}'.format(path, type_string)
+    name = PATH_INDEX_PREFIX + re.sub(r'[^a-z0-9_]+', '_', name.lower()).strip(
+        '_')
+    if len(name) > _MAX_NAME_LENGTH:
+        name = PATH_INDEX_PREFIX + hashlib.md5(name).hexdigest()
+    return name
+
+
+def add_path_index(path, node_class=None, name=None, session=None):
+    """
+    Create an index on the values at the given path of the attributes or of
+    the extras, compared as strings.
+
+    :param path: the path, as in the QueryBuilder filters, e.g.
+        'attributes.md5' or 'extras.project'
+    :param node_class: if given, only the nodes of this class (and of its
+        subclasses) are indexed, and the index is only used by the queries on
+        this class. Either a Node subclass or its query type string (e.g.
+        'data.upf.' for UpfData).
+    :param name: the name of the index, by default one built from the path
+        and the class, starting with PATH_INDEX_PREFIX
+    :param session: the session to use, by default the one of AiiDA
+    :return: the name of the index
+    :raise UniquenessError: if an index with the same name exists
+    """
+    session = _get_session(session)
+    column, keys = _parse_path(path)
+    type_string = _get_type_string(node_class)
+    if name is None:
+        name = get_path_index_name(path, type_string)
+    if not _VALID_NAME.match(name) or len(name) > _MAX_NAME_LENGTH:
+        raise InputValidationError("Invalid index name '{}'".format(name))
+    if _index_exists(session, name):
+        raise UniquenessError("An index named '{}' exists already".format(
+            name))
+
+    # The expressions must be the same as the ones of the QueryBuilder, for
+    # the index to be used
+    sql = "CREATE INDEX {} ON db_dbnode (({} #>> :keys))".format(name, column)
+    params = {'keys': u'{{{}}}'.format(u','.join(keys))}
+    if type_string is not None:
+        sql += " WHERE type LIKE :type_like"
+        params['type_like'] = u'{}%'.format(type_string)
+    session.execute(text(sql), params)
+    session.commit()
+    return name
+
+
+def remove_path_index(name, session=None):
+    """
+    Drop an index created by add_path_index.
+
+    :raise NotExistent: if no such index exists
+    """
+    session = _get_session(session)
+    if not name.startswith(PATH_INDEX_PREFIX) or not _VALID_NAME.match(name):
+        raise InputValidationError(
+            "Only the indexes whose name starts with '{}' can be "
+            "removed".format(PATH_INDEX_PREFIX))
+    if not _index_exists(session, name):
+        raise NotExistent("No index named '{}'".format(name))
+    session.execute("DROP INDEX {}".format(name))
+    session.commit()
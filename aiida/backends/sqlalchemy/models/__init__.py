@@ -21,6 +21,7 @@ SCHEMA_VERSION = 0.1
 # This is convenience so that one can import all ORM classes from one module
 # from aiida.backends.sqlalchemy.models import *
 # Also, only by import
+from checkpoint import DbCheckpoint, DbCheckpointContext
 from comment import DbComment
 from computer import DbComputer
 from group import DbGroup
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from sqlalchemy.schema import Column, ForeignKey, UniqueConstraint
+from sqlalchemy.types import Integer, DateTime, String, Text, LargeBinary
+
+from aiida.utils import timezone
+from aiida.backends.sqlalchemy.models.base import Base
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+
+class DbCheckpoint(Base):
+    """
+    Store the checkpoints of the processes of the workflow engine, see
+    aiida.work.persistence.DbPersistence.
+    """
+    __tablename__ = "db_dbcheckpoint"
+
+    # The pid of the process (the pk of its calculation, or a uuid if the
+    # calculation is not stored)
+    pid = Column(String(255), primary_key=True)
+    # One of 'running', 'finished' and 'failed'
+    state = Column(String(25), index=True)
+    # JSON description of what the process is waiting on
+    waiting_on = Column(Text, default='')
+    # Version of the format of the checkpoint data
+    version = Column(Integer)
+    checkpoint = Column(LargeBinary)
+    mtime = Column(DateTime(timezone=True), default=timezone.now,
+                   onupdate=timezone.now)
+    # The daemon worker running the process, if any, until lease_expiry
+    lease_owner = Column(String(255), index=True, default='')
+    lease_expiry = Column(DateTime(timezone=True), nullable=True)
+
+
+class DbCheckpointContext(Base):
+    """
+    Store separately the variables of the context of the workchains, so
+    that only the ones that changed are rewritten, see
+    aiida.work.persistence.DbPersistence.
+    """
+    __tablename__ = "db_dbcheckpointcontext"
+
+    id = Column(Integer, primary_key=True)
+    dbcheckpoint_id = Column(
+        String(255), ForeignKey('db_dbcheckpoint.pid', ondelete="CASCADE"),
+        index=True)
+    key = Column(String(255))
+    value = Column(LargeBinary)
+
+    __table_args__ = (
+        UniqueConstraint('dbcheckpoint_id', 'key'),
+    )
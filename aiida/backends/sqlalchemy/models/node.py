@@ -6,7 +6,7 @@ from sqlalchemy.orm import (
     foreign, column_property, aliased
 )
 from sqlalchemy.orm.attributes import flag_modified
-from sqlalchemy.schema import Column, UniqueConstraint
+from sqlalchemy.schema import Column, Index, UniqueConstraint
 from sqlalchemy.types import Integer, String, Boolean, DateTime, Text
 # Specific to PGSQL. If needed to be agnostic
 # http://docs.sqlalchemy.org/en/rel_0_9/core/custom_types.html?highlight=guid#backend-agnostic-guid-type
@@ -47,6 +47,16 @@ class DbNode(Base):
     attributes = Column(JSONB)
     extras = Column(JSONB)
 
+    # The GIN indexes allow to find the nodes with given attributes or
+    # extras (the @> operator). See also aiida.backends.sqlalchemy.indexes
+    __table_args__ = (
+        Index('ix_db_dbnode_attributes_gin', 'attributes',
+              postgresql_using='gin',
+              postgresql_ops={'attributes': 'jsonb_path_ops'}),
+        Index('ix_db_dbnode_extras_gin', 'extras',
+              postgresql_using='gin',
+              postgresql_ops={'extras': 'jsonb_path_ops'}),
+    )
 
     dbcomputer_id = Column(
         Integer,
@@ -2,5 +2,23 @@ from aiida.backends.general.abstractqueries import AbstractQueryManager
 
 
 class QueryManagerSQLA(AbstractQueryManager):
-    pass
+
+    def get_calc_state_changes(self, since_id=None):
+        from sqlalchemy import func
+        from aiida.backends import sqlalchemy as sa
+        from aiida.backends.sqlalchemy.models.node import DbCalcState
+
+        if since_id is None:
+            last_id, = sa.session.query(func.max(DbCalcState.id)).one()
+            return last_id or 0, set()
+
+        last_id, = sa.session.query(func.max(DbCalcState.id)).filter(
+            DbCalcState.id > since_id).one()
+        if last_id is None:
+            return since_id, set()
+
+        states = sa.session.query(DbCalcState.state).filter(
+            DbCalcState.id > since_id, DbCalcState.id <= last_id).distinct()
+        # The state column is a ChoiceType, so each state is a Choice object
+        return last_id, set(s.value for s, in states)
 
@@ -26,3 +26,65 @@ class TestQueryBuilderSQLA(AiidaTestCase):
 
 
 
+
+class TestAttributeIndexes(AiidaTestCase):
+    def test_equality_filters(self):
+        """
+        The equality filters on strings and booleans are also expressed as
+        containments, to use the GIN index: they must give the same results
+        """
+        from aiida.orm import Node
+        from aiida.orm.querybuilder import QueryBuilder
+
+        n1 = Node()
+        n1._set_attr('s', 'x')
+        n1._set_attr('b', True)
+        n1._set_attr('d', {'s': 'x'})
+        n1._set_attr('l', ['x'])
+        n1.store()
+        n2 = Node()
+        n2._set_attr('s', 'y')
+        n2._set_attr('b', False)
+        n2._set_attr('d', {'s': 'y'})
+        n2._set_attr('l', ['y'])
+        n2.store()
+
+        def get_pks(path, value):
+            qb = QueryBuilder()
+            qb.append(Node, project='id', filters={
+                'id': {'in': [n1.pk, n2.pk]}, path: {'==': value}})
+            return set(pk for pk, in qb.all())
+
+        self.assertEqual(get_pks('attributes.s', 'x'), {n1.pk})
+        self.assertEqual(get_pks('attributes.b', True), {n1.pk})
+        self.assertEqual(get_pks('attributes.b', False), {n2.pk})
+        self.assertEqual(get_pks('attributes.d.s', 'y'), {n2.pk})
+        self.assertEqual(get_pks('attributes.l.0', 'x'), {n1.pk})
+
+    def test_path_indexes(self):
+        from aiida.backends.sqlalchemy.indexes import (
+            add_path_index, remove_path_index, get_indexes,
+            get_path_index_name, DEFAULT_INDEXES)
+        from aiida.common.exceptions import (
+            InputValidationError, NotExistent, UniquenessError)
+        from aiida.orm.data import Data
+
+        indexes = dict(get_indexes())
+        for name in DEFAULT_INDEXES:
+            self.assertIn(name, indexes)
+
+        name = add_path_index('attributes.md5', Data)
+        self.assertEqual(name, get_path_index_name('attributes.md5', Data))
+        self.assertIn(name, dict(get_indexes()))
+        with self.assertRaises(UniquenessError):
+            add_path_index('attributes.md5', Data)
+
+        remove_path_index(name)
+        self.assertNotIn(name, dict(get_indexes()))
+        with self.assertRaises(NotExistent):
+            remove_path_index(name)
+
+        with self.assertRaises(InputValidationError):
+            add_path_index('md5')
+        with self.assertRaises(InputValidationError):
+            remove_path_index('ix_db_dbnode_type')
@@ -217,7 +217,17 @@ def loads_json(s):
 def install_tc(session):
     """
     Install the transitive closure table with SqlAlchemy.
+
+    If the DbPath table is disabled (see
+    :func:`aiida.backends.utils.is_dbpath_enabled`), the trigger and the table
+    are dropped instead.
     """
+    from aiida.backends.utils import is_dbpath_enabled
+
+    if not is_dbpath_enabled():
+        uninstall_tc(session)
+        return
+
     links_table_name = "db_dblink"
     links_table_input_field = "input_id"
     links_table_output_field = "output_id"
@@ -231,6 +241,17 @@ def install_tc(session):
                               closure_table_child_field))
 
 
+def uninstall_tc(session):
+    """
+    Drop the trigger updating the transitive closure table, and the table.
+    """
+    session.execute("""
+DROP TRIGGER IF EXISTS autoupdate_tc ON db_dblink;
+DROP FUNCTION IF EXISTS update_tc();
+DROP TABLE IF EXISTS db_dbpath;
+""")
+
+
 def get_pg_tc(links_table_name,
               links_table_input_field,
               links_table_output_field,
@@ -158,3 +158,43 @@ class TestCalcNode(AiidaTestCase):
         # updatable attributes are not copied
         with self.assertRaises(AttributeError):
             b.get_attr('state')
+
+    def test_set_state_bulk(self):
+        """
+        Checks that the state of many calculations can be set at once, with
+        the same checks done by _set_state.
+        """
+        from aiida.orm import JobCalculation, Data, load_node
+        from aiida.common.datastructures import calc_states
+
+        calcs = [JobCalculation(computer=self.computer,
+                                resources={'num_machines': 1,
+                                           'num_mpiprocs_per_machine': 1}
+                                ).store() for _ in range(4)]
+        for c in calcs:
+            c._set_state(calc_states.WITHSCHEDULER)
+        # Already further
+        calcs[1]._set_state(calc_states.RETRIEVING)
+        # Already in the target state
+        calcs[2]._set_state(calc_states.COMPUTED)
+        # Not a calculation
+        data = Data().store()
+
+        pks = [c.pk for c in calcs] + [data.pk]
+        set_pks = JobCalculation._set_state_bulk(pks, calc_states.COMPUTED)
+        self.assertEquals(sorted(set_pks), sorted([calcs[0].pk, calcs[3].pk]))
+
+        for c, state in zip(calcs, [calc_states.COMPUTED,
+                                    calc_states.RETRIEVING,
+                                    calc_states.COMPUTED,
+                                    calc_states.COMPUTED]):
+            c = load_node(c.pk)
+            self.assertEquals(c.get_state(), state)
+            self.assertEquals(c.get_state(from_attribute=True), state)
+
+        # Nothing left to set
+        self.assertEquals(
+            JobCalculation._set_state_bulk(pks, calc_states.COMPUTED), [])
+
+        with self.assertRaises(ValueError):
+            JobCalculation._set_state_bulk(pks, 'NOT_A_STATE')
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the daemon runner
+"""
+from aiida.backends.testbase import AiidaTestCase
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+
+class TestDaemonRunner(AiidaTestCase):
+    """
+    Test that the daemon runner reacts to calculation state changes.
+    """
+
+    def _create_calc(self):
+        from aiida.orm import JobCalculation
+
+        return JobCalculation(computer=self.computer,
+                              resources={
+                                  'num_machines': 1,
+                                  'num_mpiprocs_per_machine': 1}
+                              ).store()
+
+    def test_calc_state_changes(self):
+        from aiida.backends.utils import QueryFactory
+        from aiida.common.datastructures import calc_states
+
+        qmanager = QueryFactory()()
+        last_id, states = qmanager.get_calc_state_changes()
+        self.assertEquals(states, set())
+
+        c = self._create_calc()
+        c._set_state(calc_states.TOSUBMIT)
+        c._set_state(calc_states.SUBMITTING)
+
+        new_last_id, states = qmanager.get_calc_state_changes(since_id=last_id)
+        self.assertGreater(new_last_id, last_id)
+        self.assertEquals(states,
+                          {calc_states.TOSUBMIT, calc_states.SUBMITTING})
+
+        # Nothing changed since the last call
+        self.assertEquals(qmanager.get_calc_state_changes(since_id=new_last_id),
+                          (new_last_id, set()))
+
+    def test_stages_triggered(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.daemon.runner import (DaemonRunner, STAGES, SUBMIT,
+                                         RETRIEVE, PARSE, WORKFLOW,
+                                         TICK_WORK)
+
+        runner = DaemonRunner(
+            fallback_intervals={stage: 3600 for stage in STAGES})
+        # A new runner must run all the stages, as it does not know what
+        # happened before it was created
+        self.assertEquals(runner._pending, set(STAGES))
+
+        runner._collect_state_changes()
+        runner._pending.clear()
+
+        c = self._create_calc()
+        c._set_state(calc_states.TOSUBMIT)
+        runner._collect_state_changes()
+        self.assertEquals(runner._pending, {SUBMIT})
+
+        runner._pending.clear()
+        c._set_state(calc_states.COMPUTED)
+        runner._collect_state_changes()
+        self.assertEquals(runner._pending, {RETRIEVE})
+
+        runner._pending.clear()
+        c._set_state(calc_states.PARSING)
+        runner._collect_state_changes()
+        self.assertEquals(runner._pending, {PARSE})
+
+        runner._pending.clear()
+        c._set_state(calc_states.FINISHED)
+        runner._collect_state_changes()
+        self.assertEquals(runner._pending, {WORKFLOW, TICK_WORK})
+
+        with self.assertRaises(ValueError):
+            runner.notify('unknown_stage')
+
+
+class TestParseCalc(AiidaTestCase):
+    """
+    Test the parsing stage, separate from the retrieval.
+    """
+
+    def _create_parsing_calc(self, parser_name=None):
+        from aiida.orm import JobCalculation
+        from aiida.common.datastructures import calc_states
+
+        c = JobCalculation(computer=self.computer,
+                           resources={
+                               'num_machines': 1,
+                               'num_mpiprocs_per_machine': 1})
+        c.set_parser_name(parser_name)
+        c.store()
+        c._set_state(calc_states.PARSING)
+        return c
+
+    def test_no_parser(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.daemon.execmanager import parse_calc
+
+        # Without a parser, the calculation is successful
+        c = self._create_parsing_calc()
+        self.assertTrue(parse_calc(c))
+        self.assertEquals(c.get_state(), calc_states.FINISHED)
+
+    def test_parsing_failed(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.daemon.execmanager import parse_calc
+
+        # The parser cannot be loaded
+        c = self._create_parsing_calc(parser_name='nonexistent.parser')
+        self.assertFalse(parse_calc(c))
+        self.assertEquals(c.get_state(), calc_states.PARSINGFAILED)
+
+    def test_claimed_parsing(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.daemon.execmanager import _claim_and_parse_calc
+        from aiida.orm.lock import LockManager
+
+        # A calculation being parsed by someone else is skipped
+        c = self._create_parsing_calc()
+        key = 'parse_calc_{}'.format(c.pk)
+        lock = LockManager().aquire(key, owner=key)
+        try:
+            self.assertIsNone(_claim_and_parse_calc(c))
+            self.assertEquals(c.get_state(), calc_states.PARSING)
+        finally:
+            lock.release(owner=key)
+
+        self.assertTrue(_claim_and_parse_calc(c))
+        self.assertEquals(c.get_state(), calc_states.FINISHED)
+        # Once parsed, it is not parsed again
+        self.assertIsNone(_claim_and_parse_calc(c))
+
+
+class TestParserPool(AiidaTestCase):
+    """
+    Test that the locks of the parsers that failed are released.
+    """
+
+    def test_failed_parsers(self):
+        from concurrent.futures import Future
+        from aiida.common.exceptions import LockPresent
+        from aiida.daemon import execmanager
+        from aiida.orm.lock import LockManager
+
+        manager = LockManager()
+        # A parser that failed while holding its lock
+        failed = Future()
+        failed.set_exception(RuntimeError("parser failed"))
+        manager.aquire('parse_calc_-1', owner='parser_1')
+        # A parser that is still running after its lock expired
+        lost = Future()
+        manager.aquire('parse_calc_-2', timeout=-10, owner='parser_2')
+        # A parser that is still running
+        running = Future()
+        manager.aquire('parse_calc_-3', owner='parser_3')
+
+        execmanager._parsing_calcs.update({
+            -1: (failed, 'parser_1'), -2: (lost, 'parser_2'),
+            -3: (running, 'parser_3')})
+        try:
+            execmanager._forget_parsed_calcs()
+            self.assertNotIn(-1, execmanager._parsing_calcs)
+            self.assertNotIn(-2, execmanager._parsing_calcs)
+        finally:
+            execmanager._parsing_calcs.clear()
+
+        for key in ('parse_calc_-1', 'parse_calc_-2'):
+            manager.aquire(key, owner='test').release(owner='test')
+        # The lock of the running parser is kept
+        with self.assertRaises(LockPresent):
+            manager.aquire('parse_calc_-3', owner='test')
+        manager.clear('parse_calc_-3')
+
+
+class TestLockClear(AiidaTestCase):
+    """
+    Test the deletion of the locks left behind, e.g. by a dead runner.
+    """
+
+    def test_clear(self):
+        from aiida.common.exceptions import InternalError, LockPresent
+        from aiida.orm.lock import LockManager
+
+        manager = LockManager()
+        self.assertFalse(manager.clear('test_lock'))
+
+        manager.aquire('test_lock', timeout=3600, owner='test')
+        with self.assertRaises(LockPresent):
+            manager.aquire('test_lock', owner='other')
+        # A valid lock is only deleted if asked explicitly
+        self.assertFalse(manager.clear('test_lock', expired_only=True))
+        self.assertTrue(manager.clear('test_lock'))
+
+        manager.aquire('test_lock', timeout=-10, owner='test')
+        with self.assertRaises(InternalError):
+            manager.aquire('test_lock', owner='other')
+        self.assertTrue(manager.clear('test_lock', expired_only=True))
+        manager.aquire('test_lock', owner='other').release(owner='other')
+
+
+class TestExecManagerWorkers(AiidaTestCase):
+    """
+    Test the dispatching of the daemon stages to the (computer, user) pairs.
+    """
+
+    def test_failing_pair_isolated(self):
+        from collections import namedtuple
+        from aiida.daemon.execmanager import _run_for_computers_users
+
+        FakeComputer = namedtuple('FakeComputer', 'pk name')
+        FakeUser = namedtuple('FakeUser', 'pk email')
+        pairs = [(FakeComputer(i, 'computer{}'.format(i)),
+                  FakeUser(1, 'user@localhost')) for i in range(4)]
+
+        serviced = []
+
+        def service(computer, aiidauser):
+            if computer.pk == 1:
+                raise RuntimeError("unreachable computer")
+            serviced.append(computer.pk)
+
+        _run_for_computers_users('test_stage', service, pairs)
+        self.assertEquals(sorted(serviced), [0, 2, 3])
+
+    def test_busy_pair_skipped(self):
+        """
+        A pair whose worker did not finish within the timeout is skipped by
+        all the stages until the worker finishes.
+        """
+        import threading
+        from collections import namedtuple
+        from aiida.backends import settings
+        from aiida.backends.profile import BACKEND_DJANGO
+        from aiida.daemon import execmanager
+
+        if settings.BACKEND != BACKEND_DJANGO:
+            self.skipTest("The pairs are serviced sequentially with "
+                          "SQLAlchemy")
+
+        FakeComputer = namedtuple('FakeComputer', 'pk name')
+        FakeUser = namedtuple('FakeUser', 'pk email')
+        pairs = [(FakeComputer(i, 'computer{}'.format(i)),
+                  FakeUser(1, 'user@localhost')) for i in range(2)]
+
+        release = threading.Event()
+        serviced = []
+
+        def hang(computer, aiidauser):
+            if computer.pk == 1:
+                release.wait()
+            serviced.append(computer.pk)
+
+        old_timeout = execmanager.DAEMON_WORKER_TIMEOUT
+        execmanager.DAEMON_WORKER_TIMEOUT = 0.5
+        try:
+            execmanager._run_for_computers_users('stage1', hang, pairs)
+            self.assertEquals(serviced, [0])
+            # Computer 1 is still busy, also for the other stages
+            execmanager._run_for_computers_users('stage2', hang, pairs)
+            self.assertEquals(serviced, [0, 0])
+        finally:
+            execmanager.DAEMON_WORKER_TIMEOUT = old_timeout
+            release.set()
+
+        execmanager._running_workers[(1, 1)][1].result()
+        execmanager._run_for_computers_users('stage2', hang, pairs)
+        self.assertEquals(sorted(serviced), [0, 0, 0, 1, 1])
+
+
+class TestTransportPool(AiidaTestCase):
+    """
+    Test the reuse of the transports across daemon stages.
+    """
+
+    class _FakeAuthInfo(object):
+        def __init__(self, id):
+            from collections import namedtuple
+
+            FakeComputer = namedtuple('FakeComputer',
+                                      'transport_type hostname')
+            self.id = id
+            self.dbcomputer = FakeComputer('local', 'localhost')
+            self.opened = []
+
+        def get_auth_params(self):
+            return {}
+
+        def get_transport(self):
+            from aiida.transport.plugins.local import LocalTransport
+
+            t = LocalTransport()
+            self.opened.append(t)
+            return t
+
+    def test_reuse_and_reconnect(self):
+        from aiida.transport.pool import TransportPool
+
+        pool = TransportPool(max_idle=3600)
+        authinfo = self._FakeAuthInfo(1)
+
+        with pool.borrow(authinfo) as t1:
+            self.assertTrue(t1.is_open)
+        with pool.borrow(authinfo) as t2:
+            self.assertIs(t1, t2)
+            # While borrowed, a separate transport is used
+            with pool.borrow(authinfo) as t3:
+                self.assertIsNot(t2, t3)
+            self.assertFalse(t3.is_open)
+        self.assertEquals(len(authinfo.opened), 2)
+
+        # A transport closed behind the back of the pool is reopened
+        t1.close()
+        with pool.borrow(authinfo) as t4:
+            self.assertTrue(t4.is_open)
+            self.assertIsNot(t1, t4)
+
+        pool.close_all()
+        self.assertFalse(t4.is_open)
+
+    def test_evict_idle(self):
+        from aiida.transport.pool import TransportPool
+
+        pool = TransportPool(max_idle=0)
+        authinfo = self._FakeAuthInfo(1)
+
+        with pool.borrow(authinfo) as t:
+            pass
+        self.assertTrue(t.is_open)
+        pool.evict_idle()
+        self.assertFalse(t.is_open)
+
+
+class TestRetrieveWithTar(AiidaTestCase):
+    """
+    Test the retrieval of the files of a calculation through a tar stream.
+    """
+
+    def test_retrieve_with_tar(self):
+        import os
+        import shutil
+        import tempfile
+        from aiida.daemon.execmanager import _retrieve_with_tar
+        from aiida.transport.plugins.local import LocalTransport
+
+        workdir = tempfile.mkdtemp()
+        dest = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(workdir, 'out', 'sub'))
+            for path in ['aiida.out', 'with space.txt',
+                         os.path.join('out', 'a.xml'),
+                         os.path.join('out', 'sub', 'b.dat')]:
+                with open(os.path.join(workdir, path), 'w') as f:
+                    f.write(path)
+
+            retrieve_list = ['aiida.out', 'missing.txt', 'with space.txt',
+                             ['out/*.xml', 'xml', 1], ['out/sub', 'data', 0]]
+            with LocalTransport() as t:
+                _retrieve_with_tar(t, workdir, retrieve_list, dest)
+
+            retrieved = sorted(
+                os.path.relpath(os.path.join(dirpath, filename), dest)
+                for dirpath, _, filenames in os.walk(dest)
+                for filename in filenames)
+            self.assertEquals(retrieved,
+                              ['aiida.out', os.path.join('data', 'b.dat'),
+                               'with space.txt', os.path.join('xml', 'a.xml')])
+            with open(os.path.join(dest, 'data', 'b.dat')) as f:
+                self.assertEquals(f.read(), os.path.join('out', 'sub', 'b.dat'))
+
+            # Absolute paths cannot be retrieved with tar
+            with self.assertRaises(ValueError):
+                with LocalTransport() as t:
+                    _retrieve_with_tar(t, workdir, ['/etc/hostname'], dest)
+        finally:
+            shutil.rmtree(workdir)
+            shutil.rmtree(dest)
+
+    def test_tar_failure(self):
+        import os
+        import shutil
+        import tempfile
+        from aiida.common.exceptions import RemoteOperationError
+        from aiida.daemon.execmanager import _retrieve_with_tar
+        from aiida.transport.plugins.local import LocalTransport
+
+        workdir = tempfile.mkdtemp()
+        dest = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(workdir, 'aiida.out'), 'w') as f:
+                f.write('aiida.out')
+
+            # Many warnings on stderr do not block the command
+            retrieve_list = ['aiida.out'] + ['missing_{:05d}.txt'.format(i)
+                                             for i in range(3000)]
+            with LocalTransport() as t:
+                _retrieve_with_tar(t, workdir, retrieve_list, dest)
+            self.assertEquals(os.listdir(dest), ['aiida.out'])
+
+            # A failed command extracts nothing
+            shutil.rmtree(dest)
+            os.mkdir(dest)
+            with self.assertRaises(RemoteOperationError):
+                with LocalTransport() as t:
+                    _retrieve_with_tar(t, os.path.join(workdir, 'missing'),
+                                       ['aiida.out'], dest)
+            self.assertEquals(os.listdir(dest), [])
+        finally:
+            shutil.rmtree(workdir)
+            shutil.rmtree(dest)
+
+
+class TestSchedulerStatusCache(AiidaTestCase):
+    """
+    Test the reuse of the scheduler query results.
+    """
+
+    def test_min_interval(self):
+        from aiida.scheduler.cache import SchedulerStatusCache
+
+        queried = []
+
+        def query(job_ids):
+            queried.append(sorted(job_ids))
+            # Job '2' has finished, so it is not found
+            return {job_id: 'info{}'.format(job_id) for job_id in job_ids
+                    if job_id != '2'}
+
+        cache = SchedulerStatusCache(min_interval=3600)
+        self.assertEquals(cache.get_jobs('computer', ['1', '2'], query),
+                          {'1': 'info1'})
+        # Another user with jobs on the same computer: only the new job is
+        # queried
+        self.assertEquals(cache.get_jobs('computer', ['1', '3'], query),
+                          {'1': 'info1', '3': 'info3'})
+        # Everything is known already
+        self.assertEquals(cache.get_jobs('computer', ['2', '3'], query),
+                          {'3': 'info3'})
+        self.assertEquals(queried, [['1', '2'], ['3']])
+
+        # Different keys do not share the results
+        cache.get_jobs('other_computer', ['1'], query)
+        self.assertEquals(queried[-1], ['1'])
+
+        # With a zero interval, the scheduler is always queried
+        cache.get_jobs('computer', ['1'], query, min_interval=0)
+        self.assertEquals(len(queried), 4)
+
+    def test_slow_query(self):
+        """
+        The jobs cached before a query are still returned after it, even if
+        the query takes longer than the minimum interval.
+        """
+        import time
+        from aiida.scheduler.cache import SchedulerStatusCache
+
+        def query(job_ids):
+            return {job_id: 'info{}'.format(job_id) for job_id in job_ids}
+
+        def slow_query(job_ids):
+            time.sleep(0.7)
+            return query(job_ids)
+
+        cache = SchedulerStatusCache(min_interval=1)
+        self.assertEquals(cache.get_jobs('computer', ['1'], query),
+                          {'1': 'info1'})
+        time.sleep(0.5)
+        self.assertEquals(cache.get_jobs('computer', ['1', '2'], slow_query),
+                          {'1': 'info1', '2': 'info2'})
+
+    def test_computer_min_interval(self):
+        self.assertIsNone(self.computer.get_minimum_job_poll_interval())
+        self.computer.set_minimum_job_poll_interval(60)
+        self.assertEquals(self.computer.get_minimum_job_poll_interval(), 60)
+        self.computer.set_minimum_job_poll_interval(None)
+        self.assertIsNone(self.computer.get_minimum_job_poll_interval())
+        with self.assertRaises(TypeError):
+            self.computer.set_minimum_job_poll_interval(-1)
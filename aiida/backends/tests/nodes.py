@@ -71,6 +71,71 @@ class TestTransitiveNoLoops(AiidaTestCase):
         with self.assertRaises(ValueError):  # This would generate a loop
             n1.add_link_from(n4, link_type=LinkType.CREATE)
 
+    def _set_dbpath_enabled(self, enabled):
+        import aiida.backends.utils
+        from aiida.backends import settings
+
+        dbpath_enabled = aiida.backends.utils._dbpath_enabled
+        old_value = dbpath_enabled.pop(settings.AIIDADB_PROFILE, None)
+        dbpath_enabled[settings.AIIDADB_PROFILE] = enabled
+        if old_value is None:
+            self.addCleanup(dbpath_enabled.pop, settings.AIIDADB_PROFILE)
+        else:
+            self.addCleanup(dbpath_enabled.__setitem__,
+                            settings.AIIDADB_PROFILE, old_value)
+
+    def test_without_dbpath(self):
+        """
+        The ancestors and descendants are found walking the links when the
+        DbPath table is disabled, with the same results as with the table.
+        """
+        from aiida.orm.querybuilder import QueryBuilder
+
+        n1 = Node().store()
+        n2 = Node().store()
+        n3 = Node().store()
+        n4 = Node().store()
+        n5 = Node().store()
+
+        n2.add_link_from(n1, link_type=LinkType.CREATE)
+        n3.add_link_from(n2, link_type=LinkType.CREATE)
+        n4.add_link_from(n2, link_type=LinkType.CREATE)
+        n4.add_link_from(n3, link_type=LinkType.INPUT)
+
+        pairs = [(n1.pk, n4.pk), (n4.pk, n1.pk), (n3.pk, n4.pk),
+                 (n4.pk, n3.pk), (n1.pk, n5.pk), (n5.pk, n1.pk)]
+        with_dbpath = [Node._path_exists([pair]) for pair in pairs]
+        self.assertEqual(with_dbpath, [True, False, True, False, False, False])
+
+        def get_ancestors(node, **kwargs):
+            qb = QueryBuilder(**kwargs)
+            qb.append(Node, tag='low_node', filters={'id': node.pk})
+            qb.append(Node, ancestor_of='low_node', project=['id'])
+            return set(_ for [_] in qb.all())
+
+        self.assertEqual(get_ancestors(n4), set([n1.pk, n2.pk, n3.pk]))
+
+        self._set_dbpath_enabled(False)
+
+        self.assertEqual([Node._path_exists([pair]) for pair in pairs],
+                         with_dbpath)
+        self.assertTrue(Node._path_exists(pairs))
+        self.assertFalse(Node._path_exists([(n4.pk, n1.pk), (n5.pk, n1.pk)]))
+        # The QueryBuilder uses recursive queries by default
+        self.assertEqual(get_ancestors(n4), set([n1.pk, n2.pk, n3.pk]))
+        self.assertEqual(get_ancestors(n4), get_ancestors(n4,
+                                                          with_dbpath=True))
+
+        self.assertTrue(n1.has_children)
+        self.assertFalse(n1.has_parents)
+        self.assertTrue(n4.has_parents)
+        self.assertFalse(n4.has_children)
+        self.assertFalse(n5.has_children)
+        self.assertFalse(n5.has_parents)
+
+        with self.assertRaises(ValueError):  # This would generate a loop
+            n1.add_link_from(n4, link_type=LinkType.CREATE)
+
 
 class TestQueryWithAiidaObjects(AiidaTestCase):
     """
@@ -1098,6 +1163,40 @@ class TestNodeBasic(AiidaTestCase):
         retrieved_labels = set(Code.list_for_plugin('plugin_name', labels=True))
         self.assertEqual(retrieved_labels, set([code1.label, code2.label]))
 
+    def test_prefetch_attributes(self):
+        """
+        Test the loading of the attributes of many nodes at once
+        """
+        from aiida.orm.querybuilder import QueryBuilder
+
+        values = {}
+        for i in range(3):
+            n = Node()
+            n._set_attr('index', i)
+            n._set_attr('dict', {'list': [i, 'a'], 'float': 1.5})
+            n.store()
+            values[n.pk] = {'index': i, 'dict': {'list': [i, 'a'],
+                                                 'float': 1.5}}
+        # A node without attributes
+        n = Node().store()
+        values[n.pk] = {}
+        unstored = Node()
+        unstored._set_attr('index', 10)
+
+        nodes = [load_node(pk) for pk in values]
+        self.assertEquals(Node.prefetch_attributes(nodes + [unstored]),
+                          nodes + [unstored])
+        for node in nodes:
+            self.assertEquals(node.get_attrs(), values[node.pk])
+        self.assertEquals(unstored.get_attr('index'), 10)
+
+        qb = QueryBuilder()
+        qb.append(Node, filters={'id': {'in': values.keys()}})
+        results = qb.all(prefetch_attributes=True)
+        self.assertEquals(len(results), len(values))
+        for node, in results:
+            self.assertEquals(node.get_attrs(), values[node.pk])
+
 
 class TestSubNodesAndLinks(AiidaTestCase):
     def test_cachelink(self):
@@ -1293,6 +1392,119 @@ class TestSubNodesAndLinks(AiidaTestCase):
         # are calculations that use as label 'input_cell')
         n5.add_link_from(n3, label='label1')
 
+    def test_add_dblinks(self):
+        n1 = Node().store()
+        n2 = Node().store()
+        n3 = Node().store()
+
+        Node._add_dblinks([(n1, n3, 'label1', LinkType.UNSPECIFIED),
+                           (n2, n3, 'label2', LinkType.UNSPECIFIED)])
+        self.assertEqual(
+            {label: node.pk for label, node in n3.get_inputs(also_labels=True)},
+            {'label1': n1.pk, 'label2': n2.pk})
+
+        with self.assertRaises(ModificationNotAllowed):
+            Node._add_dblinks([(Node(), n3, 'label3', LinkType.UNSPECIFIED)])
+        with self.assertRaises(ValueError):
+            Node._add_dblinks([(n3, n3, 'label3', LinkType.UNSPECIFIED)])
+
+    def test_store_many(self):
+        import tempfile
+        from aiida.common.datastructures import calc_states
+        from aiida.orm import JobCalculation
+
+        parent = Node().store()
+        n1 = Data()
+        n1._set_attr('a', 1)
+        n1._set_attr('b', {'c': [1, 2]})
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('some text')
+            f.flush()
+            n1.add_path(f.name, 'file.txt')
+        n2 = Node()
+        n2.add_link_from(parent, label='parent')
+        n2.add_link_from(n1, label='sibling')
+        # A node with its own store
+        calc = JobCalculation(computer=self.computer,
+                              resources={'num_machines': 1,
+                                         'num_mpiprocs_per_machine': 1})
+        calc.add_link_from(n1, label='input', link_type=LinkType.INPUT)
+
+        self.assertEqual(Node.store_many([n2, calc, n1]), [n2, calc, n1])
+
+        for node in (n1, n2, calc):
+            self.assertTrue(node.is_stored)
+            self.assertIsNotNone(node.pk)
+        self.assertEqual(len(set([n1.pk, n2.pk, calc.pk])), 3)
+
+        n1_loaded = load_node(n1.pk)
+        self.assertEqual(n1_loaded.uuid, n1.uuid)
+        self.assertEqual(n1_loaded.get_attr('a'), 1)
+        self.assertEqual(n1_loaded.get_attr('b'), {'c': [1, 2]})
+        self.assertEqual(n1_loaded.get_folder_list(), ['file.txt'])
+        with open(n1_loaded.get_abs_path('file.txt')) as f:
+            self.assertEqual(f.read(), 'some text')
+        self.assertEqual(
+            {label: node.pk
+             for label, node in load_node(n2.pk).get_inputs(also_labels=True)},
+            {'parent': parent.pk, 'sibling': n1.pk})
+        self.assertEqual(
+            [node.pk for node in load_node(calc.pk).get_inputs()], [n1.pk])
+        # The store of the calculation was called
+        self.assertEqual(calc.get_state(), calc_states.NEW)
+
+        # The attributes cannot be changed anymore
+        with self.assertRaises(ModificationNotAllowed):
+            n1._set_attr('a', 2)
+
+        with self.assertRaises(ModificationNotAllowed):
+            Node.store_many([n1])
+
+    def test_store_many_unstored_parent(self):
+        n1 = Node()
+        n2 = Node()
+        n2.add_link_from(n1, label='parent')
+
+        with self.assertRaises(ModificationNotAllowed):
+            Node.store_many([n2])
+        self.assertFalse(n2.is_stored)
+        self.assertFalse(n1.is_stored)
+
+        Node.store_many([n2, n1])
+        self.assertEqual([node.pk for node in n2.get_inputs()], [n1.pk])
+
+    def test_store_many_rollback(self):
+        from aiida.orm import JobCalculation
+
+        parent = Node().store()
+        n1 = Node()
+        n1.add_link_from(parent, label='parent')
+        # A node with its own store, stored before the links of n1
+        calc = JobCalculation(computer=self.computer,
+                              resources={'num_machines': 1,
+                                         'num_mpiprocs_per_machine': 1})
+
+        def fail(cls, links, with_transaction=True):
+            if list(links):
+                raise ValueError("Failing on purpose")
+
+        add_dblinks = Node.__dict__['_add_dblinks']
+        Node._add_dblinks = classmethod(fail)
+        try:
+            with self.assertRaises(ValueError):
+                Node.store_many([n1, calc])
+        finally:
+            Node._add_dblinks = add_dblinks
+
+        for node in (n1, calc):
+            self.assertFalse(node.is_stored)
+            self.assertIsNone(node.pk)
+
+        # They can be stored afterwards
+        Node.store_many([n1, calc])
+        self.assertEqual([node.pk for node in n1.get_inputs()], [parent.pk])
+        self.assertEqual(load_node(calc.pk).uuid, calc.uuid)
+
     @unittest.skip("Skipping while we solve issue #301")
     def test_links_label_autogenerator(self):
         n1 = Node().store()
@@ -5,7 +5,7 @@ from shutil import rmtree
 
 from plum.wait_ons import checkpoint
 
-from aiida.work.persistence import Persistence
+from aiida.work.persistence import Persistence, DbPersistence
 from aiida.orm.data.base import get_true_node
 import aiida.work.daemon as daemon
 from aiida.work.process import Process
@@ -148,3 +148,19 @@ class TestDaemon(AiidaTestCase):
         self.assertTrue(registry.has_finished(dp_pk))
         self.assertFalse(registry.has_finished(fail_pk))
 
+    def test_tick_leased(self):
+        registry = ProcessRegistry()
+        storage = DbPersistence()
+
+        pk = submit(DummyProcess, _jobs_store=storage)
+        # Leased by another worker: not ticked by this one
+        storage.claim([pk], 'other_worker', 60)
+        self.assertTrue(daemon.tick_workflow_engine(
+            storage, print_exceptions=False, owner='this_worker'))
+        self.assertFalse(registry.has_finished(pk))
+
+        storage.release('other_worker')
+        self.assertFalse(daemon.tick_workflow_engine(
+            storage, print_exceptions=False, owner='this_worker'))
+        self.assertTrue(registry.has_finished(pk))
+
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+import os
+import tempfile
+
+from aiida.backends.testbase import AiidaTestCase
+from aiida.orm.data.base import Int
+from aiida.work import instrumentation
+from aiida.work.run import run
+from aiida.work.test_utils import DummyProcess
+
+
+class TestInstrumentation(AiidaTestCase):
+    def setUp(self):
+        super(TestInstrumentation, self).setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        instrumentation.enable(self.path)
+
+    def tearDown(self):
+        instrumentation.disable()
+        os.remove(self.path)
+        super(TestInstrumentation, self).tearDown()
+
+    def test_nested_phases(self):
+        with instrumentation.phase(instrumentation.TICK):
+            with instrumentation.phase(instrumentation.CHECKPOINT_SAVE):
+                instrumentation.count(instrumentation.CHECKPOINT_BYTES, 10)
+            Int(1).store()
+        instrumentation.flush()
+
+        records = instrumentation.read_records(self.path)
+        self.assertEqual(len(records), 1)
+        phases = records[0]['phases']
+        self.assertIsNone(records[0]['pid'])
+        self.assertEqual(phases['checkpoint_save']['checkpoint_bytes'], 10)
+        # The counts are also attributed to the enclosing phase
+        self.assertEqual(phases['tick']['checkpoint_bytes'], 10)
+        self.assertGreater(phases['tick']['queries'], 0)
+        self.assertGreaterEqual(phases['tick']['time'],
+                                phases['checkpoint_save']['time'])
+
+    def test_process(self):
+        pid = run(DummyProcess, _return_pid=True)[1]
+
+        records = instrumentation.read_records(self.path)
+        self.assertEqual([r['pid'] for r in records], [str(pid)])
+        phases = records[0]['phases']
+        self.assertTrue(records[0]['process_class'].endswith('DummyProcess'))
+        self.assertEqual(phases['on_create']['calls'], 1)
+        # The database record is set up during the creation of the process
+        self.assertEqual(phases['setup_db_record']['calls'], 1)
+        self.assertGreater(phases['setup_db_record']['nodes_stored'], 0)
+
+        summary = instrumentation.summarise(records)
+        self.assertEqual(
+            summary[records[0]['process_class']]['on_create']['calls'], 1)
+
+    def test_daemon_stages(self):
+        from aiida.daemon.execmanager import (
+            submit_jobs, update_jobs, retrieve_jobs, parse_jobs)
+        from aiida.daemon.runner import SUBMIT, UPDATE, RETRIEVE, PARSE
+
+        submit_jobs()
+        update_jobs()
+        retrieve_jobs()
+        parse_jobs(wait=True)
+
+        records = instrumentation.read_records(self.path)
+        # A record of the daemon is written at the end of each stage
+        self.assertEqual([r['pid'] for r in records], [None] * 4)
+        summary = instrumentation.summarise(records)
+        for stage in (SUBMIT, UPDATE, RETRIEVE, PARSE):
+            self.assertEqual(summary[None][stage]['calls'], 1)
+
+    def test_fork(self):
+        recorder = instrumentation._get_recorder()
+        with instrumentation.phase(instrumentation.TICK):
+            # As seen from a forked process
+            recorder.os_pid = -1
+            forked_recorder = instrumentation._get_recorder()
+            self.assertIsNot(forked_recorder, recorder)
+            self.assertEqual(forked_recorder.path, self.path)
+            with instrumentation.phase(instrumentation.TICK):
+                pass
+            instrumentation.flush()
+
+        records = instrumentation.read_records(self.path)
+        # The phase entered before the fork is not recorded
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['phases']['tick']['calls'], 1)
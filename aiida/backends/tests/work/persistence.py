@@ -2,10 +2,25 @@
 import tempfile
 
 import plum.process_monitor
+from plum.persistence.bundle import Bundle
+from plum.process import Process
 from aiida.backends.testbase import AiidaTestCase
-from aiida.work.persistence import Persistence
+from aiida.orm.data.base import Int
+from aiida.work.persistence import (
+    Persistence, DbPersistence, is_ready, get_waiting_on_pks)
 import aiida.work.util as util
 from aiida.work.test_utils import DummyProcess
+from aiida.work.workchain import WorkChain
+
+
+class ContextWorkChain(WorkChain):
+    @classmethod
+    def define(cls, spec):
+        super(ContextWorkChain, cls).define(spec)
+        spec.outline(cls.s1)
+
+    def s1(self):
+        pass
 
 
 class TestProcess(AiidaTestCase):
@@ -33,3 +48,119 @@ class TestProcess(AiidaTestCase):
         self.assertEqual(b, b2)
 
         dp.run_until_complete()
+
+    def test_waiting_on_index(self):
+        dp = DummyProcess.new_instance()
+        self.persistence.save(dp)
+        index = self.persistence.load_all_waiting_on()
+        # Not waiting on anything: ready to run
+        self.assertEqual(index, {str(dp.pid): True})
+        dp.run_until_complete()
+
+    def test_is_ready(self):
+        descriptor = {'all': [{'job': 1}, {'any': [{'process': 2}, True]}]}
+        self.assertEqual(get_waiting_on_pks(descriptor), {1, 2})
+        self.assertTrue(is_ready(descriptor, {1: (True, True)}))
+        self.assertFalse(is_ready(descriptor, {1: (False, False)}))
+        self.assertIsNone(is_ready(descriptor, {}))
+
+        descriptor = {'any': [{'process': 1}, None]}
+        self.assertTrue(is_ready(descriptor, {1: (True, True)}))
+        self.assertIsNone(is_ready(descriptor, {1: (True, False)}))
+        self.assertIsNone(is_ready(None, {}))
+
+
+class TestDbPersistence(AiidaTestCase):
+    def setUp(self):
+        super(TestDbPersistence, self).setUp()
+        self.assertEquals(len(util.ProcessStack.stack()), 0)
+        self.assertEquals(len(plum.process_monitor.MONITOR.get_pids()), 0)
+
+        self.persistence = DbPersistence()
+
+    def tearDown(self):
+        super(TestDbPersistence, self).tearDown()
+        self.assertEquals(len(util.ProcessStack.stack()), 0)
+        self.assertEquals(len(plum.process_monitor.MONITOR.get_pids()), 0)
+
+    def test_save_load(self):
+        dp = DummyProcess.new_instance()
+
+        b = self.persistence.create_bundle(dp)
+        self.persistence.save(dp)
+        b2 = self.persistence.load_checkpoint(dp.pid)
+        self.assertEqual(b, b2)
+        self.assertEqual(self.persistence.load_all_waiting_on(),
+                         {str(dp.pid): True})
+
+        dp.run_until_complete()
+
+    def test_finish(self):
+        dp = DummyProcess.new_instance()
+        self.persistence.persist_process(dp)
+        dp.run_until_complete()
+
+        # Not running any more, but the checkpoint can still be loaded
+        self.assertNotIn(str(dp.pid), self.persistence.load_all_waiting_on())
+        self.persistence.load_checkpoint(dp.pid)
+
+        with self.assertRaises(ValueError):
+            self.persistence.load_checkpoint('not_a_pid')
+
+    def test_lease(self):
+        dp = DummyProcess.new_instance()
+        self.persistence.save(dp)
+        pid = str(dp.pid)
+
+        self.assertEqual(self.persistence.claim([pid], 'a', 60), [pid])
+        # Already leased
+        self.assertEqual(self.persistence.claim([pid], 'b', 60), [])
+        self.persistence.release('a')
+        self.assertEqual(self.persistence.claim([pid], 'b', -1), [pid])
+        # The lease of b has expired, as if b had died
+        self.assertEqual(self.persistence.claim([pid], 'a', 60), [pid])
+        self.persistence.release('a')
+
+        dp.run_until_complete()
+
+    def test_lazy_inputs(self):
+        a, b = Int(1), Int(2)
+        dp = DummyProcess.new_instance(inputs={'a': a, 'b': b})
+        self.persistence.save(dp)
+
+        cp = self.persistence.load_checkpoints([dp.pid])[dp.pid]
+        inputs = cp[Process.BundleKeys.INPUTS.value]
+        self.assertIsInstance(inputs['a'], Int)
+        self.assertEqual(inputs['a'].pk, a.pk)
+        self.assertEqual(inputs['b'].value, 2)
+
+        dp.run_until_complete()
+
+    def test_context_entries(self):
+        wc = ContextWorkChain.new_instance()
+        wc.ctx.a = 1
+        wc.ctx.b = Int(2).store()
+        self.persistence.save(wc)
+        self.assertEqual(
+            set(self.persistence._manager.load_context(wc.pid)), {'a', 'b'})
+
+        cp = self.persistence.load_checkpoint(wc.pid)
+        self.assertEqual(cp['context']['a'], 1)
+        self.assertEqual(cp['context']['b'].pk, wc.ctx.b.pk)
+
+        # Only the changes are written
+        wc.ctx.a = 3
+        del wc.ctx.b
+        self.persistence.save(wc)
+        self.assertEqual(
+            self.persistence._manager.load_context(wc.pid).keys(), ['a'])
+        changes = self.persistence._get_context_changes(
+            wc.pid, Bundle({'a': 3}))
+        self.assertEqual(changes['context'], {})
+        self.assertEqual(changes['deleted_context'], [])
+        changes = self.persistence._get_context_changes(
+            wc.pid, Bundle({'c': 4}))
+        self.assertEqual(changes['context'].keys(), ['c'])
+        self.assertEqual(changes['deleted_context'], ['a'])
+
+        wc.run_until_complete()
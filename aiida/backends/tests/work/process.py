@@ -122,6 +122,46 @@ class TestProcess(AiidaTestCase):
         with self.assertRaises(ValueError):
             DummyProcess.new_instance(inputs={'_label': 5})
 
+    def test_fast_forward(self):
+        inputs = {'a': Int(2), 'b': Int(3)}
+        first = run(FastForwardableProcess, _return_pid=True, **inputs)
+        self.assertEquals(first[0]['sum'].value, 5)
+        first_calc = load_node(pk=first[1])
+        self.assertIsNotNone(first_calc.get_attr(util.PROCESS_HASH_ATTR))
+
+        # Same content in new nodes: the outputs are reused, not recomputed
+        inputs = {'a': Int(2), 'b': Int(3)}
+        second = run(FastForwardableProcess, _return_pid=True, **inputs)
+        self.assertEquals(second[0]['sum'].pk, first[0]['sum'].pk)
+        self.assertEquals(
+            load_node(pk=second[1]).get_attr(util.FAST_FORWARDED_FROM_ATTR),
+            first_calc.pk)
+
+        # Different inputs are computed
+        third = run(FastForwardableProcess, a=Int(2), b=Int(4))
+        self.assertEquals(third['sum'].value, 6)
+        self.assertNotEquals(third['sum'].pk, first[0]['sum'].pk)
+
+    def test_no_fast_forward(self):
+        # Processes are not fast-forwardable by default
+        first = run(DummyProcess, _return_pid=True, a=Int(2))[1]
+        self.assertIsNone(
+            load_node(pk=first).get_attr(util.PROCESS_HASH_ATTR, None))
+
+
+class FastForwardableProcess(Process):
+    @classmethod
+    def define(cls, spec):
+        super(FastForwardableProcess, cls).define(spec)
+        spec.fastforwardable()
+        spec.input('a', valid_type=Int)
+        spec.input('b', valid_type=Int)
+        spec.output('sum', valid_type=Int)
+
+    @override
+    def _run(self, a, b):
+        self.out('sum', Int(a.value + b.value))
+
 
 class TestFunctionProcess(AiidaTestCase):
     def test_fixed_inputs(self):
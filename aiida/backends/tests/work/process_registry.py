@@ -5,7 +5,31 @@ __license__ = "MIT license, see LICENSE.txt file."
 __version__ = "0.7.1"
 __authors__ = "The AiiDA team."
 
+import plum.knowledge_provider
 from aiida.backends.testbase import AiidaTestCase
+from aiida.orm.data.base import Int
+from aiida.work.process_registry import ProcessRegistry, clear_finished_cache
+from aiida.work.run import run
+from aiida.work.test_utils import DummyProcess
+
 
 class TestProcessRegistry(AiidaTestCase):
-    pass
\ No newline at end of file
+    def setUp(self):
+        super(TestProcessRegistry, self).setUp()
+        clear_finished_cache()
+
+    def test_have_finished(self):
+        registry = ProcessRegistry()
+        pids = [run(DummyProcess, _return_pid=True)[1] for _ in range(3)]
+
+        self.assertEqual(registry.have_finished(pids),
+                         {pid: True for pid in pids})
+        for pid in pids:
+            self.assertTrue(registry.has_finished(pid))
+
+        data = Int(1)
+        data.store()
+        with self.assertRaises(plum.knowledge_provider.NotKnown):
+            registry.have_finished(pids + [data.pk])
+        with self.assertRaises(plum.knowledge_provider.NotKnown):
+            registry.has_finished(data.pk)
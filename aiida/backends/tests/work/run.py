@@ -5,10 +5,12 @@ import shutil
 import tempfile
 
 import plum.process_monitor
+from aiida.common.links import LinkType
+from aiida.orm import load_node
 from aiida.orm.data.base import Int, Str
-from aiida.work.run import queue_up
+from aiida.work.run import queue_up, submit_many
 from aiida.work.test_utils import DummyProcess
-from aiida.work.persistence import Persistence
+from aiida.work.persistence import Persistence, DbPersistence
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
 __license__ = "MIT license, see LICENSE.txt file."
@@ -40,4 +42,32 @@ class TestRun(AiidaTestCase):
         dp = DummyProcess.create_from(cp)
         self.assertIsInstance(dp, DummyProcess)
         self.assertEqual(dp.raw_inputs, inputs)
-        dp.run_until_complete()
\ No newline at end of file
+        dp.run_until_complete()
+
+    def test_submit_many(self):
+        for storage in [self.storage, DbPersistence()]:
+            inputs_list = [{'a': Int(i)} for i in range(3)]
+            pids = submit_many(DummyProcess, inputs_list, _jobs_store=storage)
+            self.assertEqual(len(pids), 3)
+
+            for pid, inputs in zip(pids, inputs_list):
+                # The calculations and their inputs were stored together
+                calc = load_node(pid)
+                self.assertEqual(
+                    [node.pk for node in calc.get_inputs(
+                        link_type=LinkType.INPUT)], [inputs['a'].pk])
+                dp = DummyProcess.create_from(storage.load_checkpoint(pid))
+                self.assertEqual(dp.raw_inputs, inputs)
+                dp.run_until_complete()
+
+    def test_submit_many_shared_input(self):
+        shared = Int(1)
+        pids = submit_many(DummyProcess, [{'a': shared}, {'a': shared}],
+                           _jobs_store=self.storage)
+        self.assertTrue(shared.is_stored)
+        for pid in pids:
+            self.assertEqual([node.pk for node in load_node(pid).get_inputs(
+                link_type=LinkType.INPUT)], [shared.pk])
+            dp = DummyProcess.create_from(self.storage.load_checkpoint(pid))
+            dp.run_until_complete()
+
@@ -5,6 +5,7 @@ import inspect
 
 from aiida.backends.testbase import AiidaTestCase
 from plum.engine.ticking import TickingEngine
+from plum.persistence.bundle import Bundle
 import plum.process_monitor
 from aiida.orm.calculation.job.quantumespresso.pw import PwCalculation
 from aiida.work.workchain import WorkChain,\
@@ -116,6 +117,28 @@ class TestContext(AiidaTestCase):
             c['new_attr']
 
 
+    def test_node_references(self):
+        stored = Int(1).store()
+        unstored = Int(2)
+        c = WorkChain.Context()
+        c.stored = stored
+        c.nodes = [stored, 'a']
+        c.unstored = unstored
+
+        saved = Bundle()
+        c.save_instance_state(saved)
+        # The stored nodes are saved by pk
+        self.assertNotIsInstance(saved['stored'], Int)
+        self.assertEqual(saved['nodes'][1], 'a')
+        self.assertIs(saved['unstored'], unstored)
+
+        c = WorkChain.Context.create_from(saved)
+        self.assertIsInstance(c.stored, Int)
+        self.assertEqual(c.stored.pk, stored.pk)
+        self.assertEqual(c.nodes[0].value, 1)
+        self.assertIs(c.unstored, unstored)
+
+
 class TestWorkchain(AiidaTestCase):
     def setUp(self):
         super(TestWorkchain, self).setUp()
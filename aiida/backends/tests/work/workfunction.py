@@ -2,8 +2,10 @@
 
 import plum.process_monitor
 from aiida.backends.testbase import AiidaTestCase
+from aiida.orm import load_node
 from aiida.work.workfunction import workfunction
-from aiida.orm.data.base import get_true_node
+from aiida.common.links import LinkType
+from aiida.orm.data.base import get_true_node, Int
 from aiida.work.run import async, run
 import aiida.work.util as util
 
@@ -23,6 +25,11 @@ def return_input(inp):
     return {'result': inp}
 
 
+@workfunction
+def split(inp):
+    return {'a': Int(inp.value), 'b': Int(inp.value + 1), 'inp': inp}
+
+
 class TestWf(AiidaTestCase):
     def setUp(self):
         super(TestWf, self).setUp()
@@ -45,3 +52,18 @@ class TestWf(AiidaTestCase):
     def test_run(self):
         self.assertTrue(run(simple_wf)['result'])
         self.assertTrue(run(return_input, get_true_node())['result'])
+
+    def test_output_links(self):
+        inp = Int(1).store()
+        outputs, pid = split(inp, _return_pid=True)
+        calc = load_node(pid)
+
+        returned = calc.get_outputs(also_labels=True,
+                                    link_type=LinkType.RETURN)
+        self.assertEqual(sorted((label, node.pk) for label, node in returned),
+                         sorted((label, node.pk)
+                                for label, node in outputs.iteritems()))
+        # The input was not created by the workfunction
+        created = calc.get_outputs(also_labels=True,
+                                   link_type=LinkType.CREATE)
+        self.assertEqual(sorted(label for label, _ in created), ['a', 'b'])
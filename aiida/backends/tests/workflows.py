@@ -104,3 +104,79 @@ class TestWorkflowBasic(AiidaTestCase):
         # We ask all the running workflows. We should get zero results.
         wfqs = get_workflow_list(all_states=False, user=dbuser)
         self.assertTrue(len(wfqs) == 0, "We expect zero workflows")
+
+
+class TestWorkflowManager(AiidaTestCase):
+    """
+    Tests for the daemon stepping of the workflows.
+    """
+
+    def _create_calcs(self, states):
+        from aiida.orm import JobCalculation
+
+        calcs = []
+        for state in states:
+            calc = JobCalculation(computer=self.computer,
+                                  resources={'num_machines': 1,
+                                             'num_mpiprocs_per_machine': 1}
+                                  ).store()
+            if state is not None:
+                calc._set_state(state)
+            calcs.append(calc)
+        return calcs
+
+    def _start_workflow(self, calcs, sub_workflows):
+        from aiida.workflows.test import WorkflowTestSteps
+
+        wf = WorkflowTestSteps()
+        wf.set_params({'calc_pks': [c.pk for c in calcs],
+                       'sub_workflow_pks': [w.pk for w in sub_workflows]})
+        wf.start()
+        return wf
+
+    def test_running_steps_with_states(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.orm.implementation import get_all_running_steps_with_states
+
+        calcs = self._create_calcs([None, calc_states.TOSUBMIT,
+                                    calc_states.FINISHED])
+        sub_wf = WorkflowTestEmpty()
+        sub_wf.store()
+        sub_wf.set_state(wf_states.SLEEP)
+        wf = self._start_workflow(calcs, [sub_wf])
+
+        steps = [(s, c, w) for s, c, w in get_all_running_steps_with_states()
+                 if s.parent_id == wf.pk]
+        self.assertEqual(len(steps), 1)
+        step, calc_states_by_pk, sub_wf_states_by_pk = steps[0]
+        self.assertEqual(step.name, 'start')
+        self.assertEqual(calc_states_by_pk, {calcs[0].pk: None,
+                                             calcs[1].pk: calc_states.TOSUBMIT,
+                                             calcs[2].pk: calc_states.FINISHED})
+        self.assertEqual(sub_wf_states_by_pk, {sub_wf.pk: wf_states.SLEEP})
+
+        # The states are the same as the ones of the single calculations
+        for calc in calcs:
+            self.assertEqual(calc_states_by_pk[calc.pk], calc.get_state())
+
+    def test_execute_steps(self):
+        from aiida.common.datastructures import calc_states
+        from aiida.daemon.workflowmanager import execute_steps
+
+        calcs = self._create_calcs([calc_states.FINISHED, calc_states.FAILED])
+        sub_wf = WorkflowTestEmpty()
+        sub_wf.store()
+        sub_wf.set_state(wf_states.FINISHED)
+        wf = self._start_workflow(calcs, [sub_wf])
+        waiting_calcs = self._create_calcs([calc_states.FINISHED,
+                                            calc_states.WITHSCHEDULER])
+        waiting = self._start_workflow(waiting_calcs, [])
+
+        execute_steps()
+
+        # All the calculations and sub-workflows of the step are done
+        self.assertEqual(wf.get_step('start').state, wf_states.FINISHED)
+        self.assertEqual(wf.get_state(), wf_states.FINISHED)
+        # A calculation is still running
+        self.assertEqual(waiting.get_step('start').state, wf_states.RUNNING)
+        self.assertEqual(waiting.get_state(), wf_states.RUNNING)
@@ -283,3 +283,33 @@ def get_current_profile():
         return None
 
 
+
+
+# The values of the USE_DBPATH setting, for each profile
+_dbpath_enabled = {}
+
+
+def is_dbpath_enabled():
+    """
+    Return whether the DbPath table (the transitive closure of the links,
+    kept up to date by a trigger on the links table) is used, as set with the
+    USE_DBPATH setting of the profile (True by default).
+
+    If not, the trigger and the table are not installed, and the ancestors
+    and descendants of the nodes are found walking the links with recursive
+    queries.
+    """
+    from aiida.common.setup import get_profile_config
+
+    profile = settings.AIIDADB_PROFILE
+    try:
+        return _dbpath_enabled[profile]
+    except KeyError:
+        pass
+
+    try:
+        enabled = get_profile_config(profile).get('USE_DBPATH', True)
+    except ConfigurationError:
+        enabled = True
+    _dbpath_enabled[profile] = enabled
+    return enabled
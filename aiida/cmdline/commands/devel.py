@@ -408,8 +408,10 @@ class Devel(VerdiCommandWithSubcommands):
         from aiida.backends.utils import get_automatic_user
 
         q_object = Q(user=get_automatic_user())
-        q_object.add(Q(parents__isnull=True), Q.AND)
-        q_object.add(Q(children__isnull=True), Q.AND)
+        # Without direct inputs and outputs, a node has no parents and
+        # children at all
+        q_object.add(Q(inputs__isnull=True), Q.AND)
+        q_object.add(Q(outputs__isnull=True), Q.AND)
 
         node_list = Node.query(q_object).distinct().order_by('ctime')
         print "ID\tclass"
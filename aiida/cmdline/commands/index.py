@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+This allows to manage the indexes on the attributes and extras of the nodes
+from command line.
+"""
+import sys
+
+from aiida.cmdline.baseclass import VerdiCommandWithSubcommands
+from aiida.backends.utils import load_dbenv, is_dbenv_loaded
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+
+class Index(VerdiCommandWithSubcommands):
+    """
+    Manage the indexes on the attributes and extras of the nodes
+    """
+
+    def __init__(self):
+        """
+        A dictionary with valid commands and functions to be called.
+        """
+        self.valid_subcommands = {
+            'list': (self.index_list, self.complete_none),
+            'add': (self.index_add, self.complete_none),
+            'remove': (self.index_remove, self.complete_none),
+            'install': (self.index_install, self.complete_none),
+        }
+
+    def _load_sqla_dbenv(self):
+        """
+        Load the DB environment, and exit if the backend is not SQLAlchemy:
+        with Django, the attributes are stored in the DbAttribute table,
+        whose indexes are managed by the migrations.
+        """
+        from aiida.backends import settings
+        from aiida.backends.profile import BACKEND_SQLA
+
+        if not is_dbenv_loaded():
+            load_dbenv()
+
+        if settings.BACKEND != BACKEND_SQLA:
+            print >> sys.stderr, ("The indexes on the attributes can only be "
+                                  "managed with the SQLAlchemy backend.")
+            sys.exit(1)
+
+    def index_list(self, *args):
+        """
+        List the indexes of the DbNode table
+        """
+        import argparse
+
+        parser = argparse.ArgumentParser(
+            prog=self.get_full_command_name(),
+            description='List the indexes of the table of the nodes.')
+        parser.parse_args(args)
+
+        self._load_sqla_dbenv()
+        from aiida.backends.sqlalchemy.indexes import get_indexes
+
+        for name, definition in get_indexes():
+            print "* {}".format(name)
+            print "  {}".format(definition)
+
+    def index_add(self, *args):
+        """
+        Add an index on an attribute or extra path
+        """
+        import argparse
+        from aiida.common.exceptions import (InputValidationError,
+                                             UniquenessError)
+
+        parser = argparse.ArgumentParser(
+            prog=self.get_full_command_name(),
+            description='Add an index on the values of an attribute (or '
+                        'extra), used by the queries comparing them with '
+                        'strings.')
+        parser.add_argument('path', type=str,
+                            help="The path of the attribute, as in the "
+                                 "QueryBuilder filters, e.g. attributes.md5 "
+                                 "or extras.project")
+        parser.add_argument('-t', '--type', type=str, default=None,
+                            help="Index only the nodes of this type and of "
+                                 "its subtypes, given as a query type "
+                                 "string (e.g. data.upf. for UpfData). The "
+                                 "index is then only used by the queries "
+                                 "on these nodes.")
+        parser.add_argument('-n', '--name', type=str, default=None,
+                            help="The name of the index (by default, one is "
+                                 "built from the path and the type)")
+        parsed_args = parser.parse_args(args)
+
+        self._load_sqla_dbenv()
+        from aiida.backends.sqlalchemy.indexes import add_path_index
+
+        try:
+            name = add_path_index(parsed_args.path, parsed_args.type,
+                                  name=parsed_args.name)
+        except (InputValidationError, UniquenessError) as e:
+            print >> sys.stderr, e.message
+            sys.exit(1)
+        print "Index {} created".format(name)
+
+    def index_remove(self, *args):
+        """
+        Remove an index added with 'verdi index add'
+        """
+        import argparse
+        from aiida.common.exceptions import InputValidationError, NotExistent
+
+        parser = argparse.ArgumentParser(
+            prog=self.get_full_command_name(),
+            description="Remove an index created with 'verdi index add'.")
+        parser.add_argument('name', type=str, help="The name of the index")
+        parsed_args = parser.parse_args(args)
+
+        self._load_sqla_dbenv()
+        from aiida.backends.sqlalchemy.indexes import remove_path_index
+
+        try:
+            remove_path_index(parsed_args.name)
+        except (InputValidationError, NotExistent) as e:
+            print >> sys.stderr, e.message
+            sys.exit(1)
+        print "Index {} removed".format(parsed_args.name)
+
+    def index_install(self, *args):
+        """
+        Create the default indexes missing in the database
+        """
+        import argparse
+
+        parser = argparse.ArgumentParser(
+            prog=self.get_full_command_name(),
+            description='Create the default (GIN) indexes on the attributes '
+                        'and extras, if missing (e.g. in a database created '
+                        'with a previous version of AiiDA).')
+        parser.parse_args(args)
+
+        self._load_sqla_dbenv()
+        from aiida.backends.sqlalchemy.indexes import install_default_indexes
+
+        created = install_default_indexes()
+        if created:
+            print "Indexes created: {}".format(", ".join(created))
+        else:
+            print "All the default indexes exist already"
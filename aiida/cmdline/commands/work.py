@@ -26,6 +26,7 @@ class Work(VerdiCommandWithSubcommands):
             self.list.__name__: (self.list, self.complete_none),
             self.tree.__name__: (self.tree, self.complete_none),
             self.checkpoint.__name__: (self.checkpoint, self.complete_none),
+            self.stats.__name__: (self.stats, self.complete_none),
         }
 
     def list(self, *args):
@@ -43,6 +44,11 @@ class Work(VerdiCommandWithSubcommands):
         with ctx:
             do_checkpoint.invoke(ctx)
 
+    def stats(self, *args):
+        ctx = do_stats.make_context('stats', sys.argv[3:])
+        with ctx:
+            do_stats.invoke(ctx)
+
 
 @click.command('list', context_settings=CONTEXT_SETTINGS)
 @click.option('-p', '--past-days', type=int,
@@ -123,6 +129,63 @@ def do_checkpoint(pks):
             print("Unable to show checkpoint for calculation '{}'".format(pk))
 
 
+@click.command('stats', context_settings=CONTEXT_SETTINGS)
+@click.option('--by', type=click.Choice(['process_class', 'pid']),
+              default='process_class',
+              help="Group the records by process class or by process")
+@click.option('--limit', type=int, default=50,
+              help="Limit to this many rows, the most time consuming ones")
+@click.option('--json', 'as_json', is_flag=True,
+              help="Dump the totals as JSON, instead of a table")
+@click.option('--file', 'path', type=click.Path(dir_okay=False),
+              help="The file of the records, by default the one where the "
+                   "instrumentation writes")
+@click.option('--clear', is_flag=True,
+              help="Delete the records after reading them")
+def do_stats(by, limit, as_json, path, clear):
+    """
+    Show where the time of the workflow engine and of the daemon stages goes,
+    from the records of the instrumentation (enabled with the
+    WORK_INSTRUMENTATION setting of the profile)
+    """
+    import json
+    import os
+    from aiida.backends.utils import load_dbenv, is_dbenv_loaded
+    if not is_dbenv_loaded():
+        load_dbenv()
+    from aiida.work import instrumentation
+
+    path = path or instrumentation.get_path()
+    summary = instrumentation.summarise(
+        instrumentation.read_records(path), by=by)
+
+    if as_json:
+        print(json.dumps(summary, indent=2, sort_keys=True))
+    else:
+        table = []
+        for group, phases in summary.iteritems():
+            for name, counters in phases.iteritems():
+                table.append([
+                    '<daemon>' if group is None else group,
+                    name,
+                    counters['calls'],
+                    counters['time'],
+                    counters['time'] / counters['calls'],
+                    counters.get(instrumentation.QUERIES, 0),
+                    counters.get(instrumentation.NODES_STORED, 0),
+                    counters.get(instrumentation.CHECKPOINT_BYTES, 0)])
+        table.sort(key=lambda row: row[3], reverse=True)
+        if not table:
+            print("No records found in {}".format(path))
+        else:
+            print(tabulate(table[:limit], floatfmt='.3f', headers=[
+                by, "Phase", "Calls", "Time (s)", "Time/call (s)", "Queries",
+                "Nodes stored", "Checkpoint bytes"]))
+
+    if clear and os.path.isfile(path):
+        os.remove(path)
+
+
 def _build_query(order_by=None, limit=None, past_days=None):
     from aiida.orm.querybuilder import QueryBuilder
     from aiida.orm.calculation import Calculation
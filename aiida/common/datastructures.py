@@ -68,6 +68,26 @@ def sort_states(list_states):
     return [_[1] for _ in list_to_sort[::-1]]
 
 
+def get_states_not_before(state):
+    """
+    Return the states that a calculation cannot have already gone through,
+    if it is to be moved to the given state: the state itself and all the
+    states that come after it.
+
+    :param state: a state string.
+
+    :return: a list of state strings.
+
+    :raise ValueError: if the given state is not a valid state.
+    """
+    try:
+        idx = _sorted_datastates.index(state)
+    except ValueError:
+        raise ValueError("'{}' is not a valid calculation state".format(state))
+
+    return list(_sorted_datastates[idx:])
+
+
 class CalcInfo(DefaultFieldsAttributeDict):
     """
     This object will store the data returned by the calculation plugin and to be
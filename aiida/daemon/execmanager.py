@@ -5,16 +5,23 @@ results. These are general and contain only the main logic; where appropriate,
 the routines make reference to the suitable plugins for all
 plugin-specific operations.
 """
+import functools
+import threading
+import time
+
 from aiida.common.datastructures import calc_states
 from aiida.scheduler.datastructures import job_states
 from aiida.common.exceptions import (
     AuthenticationError,
     ConfigurationError,
+    InternalError,
     ModificationNotAllowed,
 )
 from aiida.common import aiidalogger
 from aiida.common.links import LinkType
+from aiida.daemon.runner import SUBMIT, UPDATE, RETRIEVE, PARSE
 from aiida.orm import load_node
+from aiida.transport.pool import get_transport_pool
 
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
@@ -24,13 +31,226 @@ __authors__ = "The AiiDA team."
 
 execlogger = aiidalogger.getChild('execmanager')
 
+# Default values, can be overridden in the profile configuration with the
+# keys of the same name.
+# Maximum number of (computer, aiidauser) pairs serviced concurrently
+DAEMON_MAX_WORKERS = 8
+# Maximum time (in seconds) a stage waits for the work on each single
+# (computer, aiidauser) pair, counted from when its worker starts (or, for a
+# pair still waiting for a free worker, from the start of the stage); after
+# that, the stage stops waiting for the pair, which is skipped by all the
+# stages until its worker finishes.
+DAEMON_WORKER_TIMEOUT = 600
+# Maximum number of calculations of a (computer, aiidauser) pair submitted
+# together, with a single file transfer and a single remote command for all
+# submit scripts; 1 to submit calculations one by one.
+DAEMON_SUBMIT_BATCH_SIZE = 100
+# Whether calculations submitted in the same batch, and with the same
+# scheduler requirements, are submitted as a single job array (if the
+# scheduler supports it)
+DAEMON_SUBMIT_JOB_ARRAYS = False
+# Whether the retrieved files of a calculation are transferred as a single
+# compressed tar stream (this requires GNU tar on the computer; if it fails,
+# the files are retrieved one by one)
+DAEMON_RETRIEVE_WITH_TAR = True
+# Maximum number of calculations of a (computer, aiidauser) pair whose files
+# are transferred at the same time
+DAEMON_RETRIEVE_CONCURRENCY = 4
+# Number of processes parsing the retrieved calculations in parallel (None
+# for the number of CPUs); 0 to parse them one by one in the daemon process.
+DAEMON_PARSER_PROCESSES = None
+# Maximum time (in seconds) the parsing of a calculation is expected to
+# take: after that, the parser is considered lost, and the lock it holds on
+# the calculation is released so that the calculation is parsed again.
+DAEMON_PARSER_TIMEOUT = 1800
+
+# The folder, within the remote working directory, with a subfolder for the
+# submit script and scheduler output files of each job array
+_JOB_ARRAYS_FOLDER = 'job_arrays'
+_JOB_ARRAY_SCRIPT = '_aiidaarraysubmit.sh'
+
+_executor = None
+# The work in progress, as (stage, future), with (computer pk, user pk) keys:
+# a pair has at most one worker at a time, so that the workers stuck on an
+# unreachable computer cannot take over the whole pool
+_running_workers = {}
+_running_workers_lock = threading.Lock()
+
+_parser_pool = None
+# The calculations being parsed, as (future, owner of the lock taken by the
+# parser), with the calc pk as key
+_parsing_calcs = {}
+
+
+def _get_profile_setting(key, default):
+    from aiida.backends import settings
+    from aiida.common.setup import get_profile_config
+
+    try:
+        return get_profile_config(settings.AIIDADB_PROFILE).get(key, default)
+    except ConfigurationError:
+        return default
+
+
+def _get_executor():
+    """
+    Return the thread pool shared by all the stages (created on first use).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_get_profile_setting(
+            'DAEMON_MAX_WORKERS', DAEMON_MAX_WORKERS))
+    return _executor
+
+
+def _run_in_worker(function, computer, aiidauser, start_times=None):
+    """
+    Run function(computer, aiidauser) in a worker thread, releasing at the
+    end the database connection that was opened by the thread.
+
+    :param start_times: if given, a dictionary where the time at which the
+        worker starts is set, with the (computer pk, aiidauser pk) key
+    """
+    from aiida.backends import settings
+    from aiida.backends.profile import BACKEND_DJANGO
+
+    if start_times is not None:
+        start_times[(computer.pk, aiidauser.pk)] = time.time()
+    try:
+        return function(computer, aiidauser)
+    finally:
+        if settings.BACKEND == BACKEND_DJANGO:
+            from django.db import connection
+            connection.close()
+
+
+def _instrumented_stage(name):
+    """
+    Decorate a stage of the daemon, so that each of its calls is recorded as
+    a phase of the daemon by the work instrumentation (see 'verdi work
+    stats'), when enabled.
+
+    :param name: the name of the phase
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from aiida.work import instrumentation
+            try:
+                with instrumentation.phase(name):
+                    return func(*args, **kwargs)
+            finally:
+                instrumentation.flush()
+        return wrapper
+    return decorator
+
+
+def _log_worker_error(stage, computer, aiidauser, e):
+    execlogger.error("Unexpected error in the {} for aiidauser={} on "
+                     "computer={}, error type is {}, error message: "
+                     "{}".format(stage, aiidauser.email, computer.name,
+                                 e.__class__.__name__, e.message))
+
+
+def _run_for_computers_users(stage, function, computers_users):
+    """
+    Call function(computer, aiidauser) for each of the given pairs.
+
+    With the Django backend, the pairs are serviced concurrently by a bounded
+    pool of threads, so that a slow or unreachable computer does not stall
+    the other ones: the call stops waiting for a pair DAEMON_WORKER_TIMEOUT
+    seconds after its worker started, and a pair whose worker is still busy
+    (from this or a previous call, of any stage) is skipped until the
+    worker finishes.
+    The SQLAlchemy backend uses a single session that cannot be shared among
+    threads, so there the pairs are serviced sequentially.
+
+    :param stage: a string identifying the calling stage (for logging, and to
+        avoid running the same stage twice at the same time on a pair)
+    :param function: the function to call. It is expected to deal itself with
+        (and log) the exceptions that it can recover from.
+    :param computers_users: an iterable of (computer, aiidauser) pairs
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    from aiida.backends import settings
+    from aiida.backends.profile import BACKEND_DJANGO
+
+    if settings.BACKEND != BACKEND_DJANGO:
+        for computer, aiidauser in computers_users:
+            try:
+                function(computer, aiidauser)
+            except Exception as e:
+                _log_worker_error(stage, computer, aiidauser, e)
+        return
+
+    executor = _get_executor()
+    timeout = _get_profile_setting('DAEMON_WORKER_TIMEOUT',
+                                   DAEMON_WORKER_TIMEOUT)
+    stage_start = time.time()
+    start_times = {}
+    futures = {}
+    for computer, aiidauser in computers_users:
+        key = (computer.pk, aiidauser.pk)
+        with _running_workers_lock:
+            previous_stage, previous = _running_workers.get(key, (None, None))
+            if previous is not None and not previous.done():
+                execlogger.warning("({},{}) pair skipped by the {}: still "
+                                   "busy with the {}".format(
+                    aiidauser.email, computer.name, stage, previous_stage))
+                continue
+            future = executor.submit(_run_in_worker, function, computer,
+                                     aiidauser, start_times)
+            _running_workers[key] = (stage, future)
+        futures[future] = (computer, aiidauser)
+
+    def get_deadline(future):
+        computer, aiidauser = futures[future]
+        return start_times.get((computer.pk, aiidauser.pk),
+                               stage_start) + timeout
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(
+            pending, return_when=FIRST_COMPLETED,
+            timeout=max(0, min(get_deadline(future) for future in pending) -
+                        time.time()))
+
+        for future in done:
+            computer, aiidauser = futures[future]
+            key = (computer.pk, aiidauser.pk)
+            with _running_workers_lock:
+                if _running_workers.get(key, (None, None))[1] is future:
+                    del _running_workers[key]
+            e = future.exception()
+            if e is not None:
+                _log_worker_error(stage, computer, aiidauser, e)
+
+        now = time.time()
+        for future in [future for future in pending
+                       if get_deadline(future) <= now]:
+            pending.discard(future)
+            computer, aiidauser = futures[future]
+            execlogger.warning("The {} for aiidauser={} on computer={} did "
+                               "not finish within the timeout, it will keep "
+                               "running in the background".format(
+                stage, aiidauser.email, computer.name))
+
 
 def update_running_calcs_status(authinfo):
     """
     Update the states of calculations in WITHSCHEDULER status belonging
     to user and machine as defined in the 'dbauthinfo' table.
+
+    The scheduler is queried through the scheduler status cache, so that it
+    is not queried more often than the minimum poll interval of the computer
+    and the results are shared among the users of the same computer.
+    Only the calculations whose scheduler state changed are loaded and
+    updated in the database.
     """
-    from aiida.orm import JobCalculation, Computer
+    from aiida.orm import Computer, JobCalculation
+    from aiida.scheduler.cache import get_scheduler_status_cache
     from aiida.scheduler.datastructures import JobInfo
     from aiida.utils.logger import get_dblogger_extra
     from aiida.backends.utils import QueryFactory
@@ -43,32 +263,39 @@ def update_running_calcs_status(authinfo):
         authinfo.aiidauser.email, authinfo.dbcomputer.name))
 
     qmanager = QueryFactory()()
-    calcs_to_inquire = qmanager.query_jobcalculations_by_computer_user_state(
+    # Only the job ids and scheduler states are loaded here, calculations
+    # are loaded below only if their state has to be changed
+    calcs_to_inquire = qmanager.query_job_ids_by_computer_user_state(
         state=calc_states.WITHSCHEDULER,
         computer=authinfo.dbcomputer,
         user=authinfo.aiidauser
     )
 
-    #~ calcs_to_inquire = list(JobCalculation._get_all_with_state(
-        #~ state=calc_states.WITHSCHEDULER,
-        #~ computer=authinfo.dbcomputer,
-        #~ user=authinfo.aiidauser)
-    #~ )
-
-    # NOTE: no further check is done that machine and
-    # aiidauser are correct for each calc in calcs
-    s = Computer(dbcomputer=authinfo.dbcomputer).get_scheduler()
-    t = authinfo.get_transport()
-
     computed = []
 
     # I avoid to open an ssh connection if there are
     # no calcs with state WITHSCHEDULER
-    if len(calcs_to_inquire):
-        jobids_to_inquire = [str(c.get_job_id()) for c in calcs_to_inquire]
+    if not len(calcs_to_inquire):
+        return computed
 
-        # Open connection
-        with t:
+    # NOTE: no further check is done that machine and
+    # aiidauser are correct for each calc in calcs
+    computer = Computer(dbcomputer=authinfo.dbcomputer)
+    s = computer.get_scheduler()
+
+    for pk, jobid, _ in calcs_to_inquire:
+        if jobid is None:
+            execlogger.error("JobCalculation {} is WITHSCHEDULER "
+                             "but no job id was found!".format(pk),
+                             extra=get_dblogger_extra(load_node(pk)))
+    calcs_to_inquire = [(pk, jobid, scheduler_state)
+                        for pk, jobid, scheduler_state in calcs_to_inquire
+                        if jobid is not None]
+    jobids_to_inquire = [str(jobid) for _, jobid, _ in calcs_to_inquire]
+
+    def query_scheduler(jobids):
+        # Reuse the open connection to the computer, if any
+        with get_transport_pool().borrow(authinfo) as t:
             s.set_transport(t)
             # TODO: Check if we are ok with filtering by job (to make this work,
             # I had to remove the check on the retval for getJobs,
@@ -80,113 +307,123 @@ def update_running_calcs_status(authinfo):
             # following ones, and set a counter; set calculations to
             # UNKNOWN after a while?
             if s.get_feature('can_query_by_user'):
-                found_jobs = s.getJobs(user="$USER", as_dict=True)
+                return s.getJobs(user="$USER", as_dict=True)
             else:
-                found_jobs = s.getJobs(jobs=jobids_to_inquire, as_dict=True)
+                return s.getJobs(jobs=jobids, as_dict=True)
 
-            # I update the status of jobs
-
-            for c in calcs_to_inquire:
-                try:
-                    logger_extra = get_dblogger_extra(c)
-                    t._set_logger_extra(logger_extra)
+    if s.get_feature('can_query_by_user'):
+        # The jobs of "$USER", i.e. of the remote account: shared only by
+        # the AiiDA users logging in with the same account
+        cache_key = (computer.pk, authinfo.get_auth_params().get('username'))
+    else:
+        # Job ids are unique on a computer, whoever queries them
+        cache_key = (computer.pk,)
+    found_jobs = get_scheduler_status_cache().get_jobs(
+        cache_key, jobids_to_inquire, query_scheduler,
+        min_interval=computer.get_minimum_job_poll_interval())
 
-                    jobid = c.get_job_id()
-                    if jobid is None:
-                        execlogger.error("JobCalculation {} is WITHSCHEDULER "
-                                         "but no job id was found!".format(
-                            c.pk), extra=logger_extra)
-                        continue
+    # I update the status of jobs
 
-                    # I check if the calculation to be checked (c)
-                    # is in the output of qstat
-                    if jobid in found_jobs:
-                        # jobinfo: the information returned by
-                        # qstat for this job
-                        jobinfo = found_jobs[jobid]
-                        execlogger.debug("Inquirying calculation {} (jobid "
-                                         "{}): it has job_state={}".format(
-                            c.pk, jobid, jobinfo.job_state), extra=logger_extra)
-                        # For the moment, FAILED is not defined
-                        if jobinfo.job_state in [job_states.DONE]:  # , job_states.FAILED]:
-                            computed.append(c)
-                            try:
-                                c._set_state(calc_states.COMPUTED)
-                            except ModificationNotAllowed:
-                                # Someone already set it, just skip
-                                pass
-
-                        ## Do not set the WITHSCHEDULER state multiple times,
-                        ## this would raise a ModificationNotAllowed
-                        # else:
-                        # c._set_state(calc_states.WITHSCHEDULER)
-
-                        c._set_scheduler_state(jobinfo.job_state)
-
-                        c._set_last_jobinfo(jobinfo)
-                    else:
-                        execlogger.debug("Inquirying calculation {} (jobid "
-                                         "{}): not found, assuming "
-                                         "job_state={}".format(
-                            c.pk, jobid, job_states.DONE), extra=logger_extra)
-
-                        # calculation c is not found in the output of qstat
-                        computed.append(c)
-                        c._set_scheduler_state(job_states.DONE)
-                except Exception as e:
-                    # TODO: implement a counter, after N retrials
-                    # set it to a status that
-                    # requires the user intervention
-                    execlogger.warning(
-                        "There was an exception for "
-                        "calculation {} ({}): {}".format(
-                            c.pk, e.__class__.__name__, e.message
-                        ), extra=logger_extra)
+    for pk, jobid, scheduler_state in calcs_to_inquire:
+        logger_extra = None
+        try:
+            # I check if the calculation to be checked (c)
+            # is in the output of qstat
+            if jobid in found_jobs:
+                # jobinfo: the information returned by
+                # qstat for this job
+                jobinfo = found_jobs[jobid]
+                if (jobinfo.job_state not in [job_states.DONE] and
+                        unicode(jobinfo.job_state) == scheduler_state):
+                    # Nothing changed since the last check
                     continue
 
-            for c in computed:
+                c = load_node(pk)
+                logger_extra = get_dblogger_extra(c)
+                execlogger.debug("Inquirying calculation {} (jobid "
+                                 "{}): it has job_state={}".format(
+                    c.pk, jobid, jobinfo.job_state), extra=logger_extra)
+                # For the moment, FAILED is not defined
+                if jobinfo.job_state in [job_states.DONE]:  # , job_states.FAILED]:
+                    computed.append(c)
+
+                ## Do not set the WITHSCHEDULER state multiple times,
+                ## this would raise a ModificationNotAllowed
+                # else:
+                # c._set_state(calc_states.WITHSCHEDULER)
+
+                c._set_scheduler_state(jobinfo.job_state)
+
+                c._set_last_jobinfo(jobinfo)
+            else:
+                c = load_node(pk)
+                logger_extra = get_dblogger_extra(c)
+                execlogger.debug("Inquirying calculation {} (jobid "
+                                 "{}): not found, assuming "
+                                 "job_state={}".format(
+                    c.pk, jobid, job_states.DONE), extra=logger_extra)
+
+                # calculation c is not found in the output of qstat
+                computed.append(c)
+                c._set_scheduler_state(job_states.DONE)
+        except Exception as e:
+            # TODO: implement a counter, after N retrials
+            # set it to a status that
+            # requires the user intervention
+            execlogger.warning(
+                "There was an exception for "
+                "calculation {} ({}): {}".format(
+                    pk, e.__class__.__name__, e.message
+                ), extra=logger_extra)
+            continue
+
+    if not computed:
+        return computed
+
+    # Reuse the open connection to the computer, if any
+    with get_transport_pool().borrow(authinfo) as t:
+        s.set_transport(t)
+        for c in computed:
+            try:
+                logger_extra = get_dblogger_extra(c)
                 try:
-                    logger_extra = get_dblogger_extra(c)
-                    try:
-                        detailed_jobinfo = s.get_detailed_jobinfo(
-                            jobid=c.get_job_id())
-                    except NotImplementedError:
-                        detailed_jobinfo = (
-                            u"AiiDA MESSAGE: This scheduler does not implement "
-                            u"the routine get_detailed_jobinfo to retrieve "
-                            u"the information on "
-                            u"a job after it has finished.")
-                    last_jobinfo = c._get_last_jobinfo()
-                    if last_jobinfo is None:
-                        last_jobinfo = JobInfo()
-                        last_jobinfo.job_id = c.get_job_id()
-                        last_jobinfo.job_state = job_states.DONE
-                    last_jobinfo.detailedJobinfo = detailed_jobinfo
-                    c._set_last_jobinfo(last_jobinfo)
-                except Exception as e:
-                    execlogger.warning("There was an exception while "
-                                       "retrieving the detailed jobinfo "
-                                       "for calculation {} ({}): {}".format(
-                        c.pk, e.__class__.__name__, e.message),
-                                       extra=logger_extra)
-                    continue
-                finally:
-                    # Set the state to COMPUTED as the very last thing
-                    # of this routine; no further change should be done after
-                    # this, so that in general the retriever can just
-                    # poll for this state, if we want to.
-                    try:
-                        c._set_state(calc_states.COMPUTED)
-                    except ModificationNotAllowed:
-                        # Someone already set it, just skip
-                        pass
+                    detailed_jobinfo = s.get_detailed_jobinfo(
+                        jobid=c.get_job_id())
+                except NotImplementedError:
+                    detailed_jobinfo = (
+                        u"AiiDA MESSAGE: This scheduler does not implement "
+                        u"the routine get_detailed_jobinfo to retrieve "
+                        u"the information on "
+                        u"a job after it has finished.")
+                last_jobinfo = c._get_last_jobinfo()
+                if last_jobinfo is None:
+                    last_jobinfo = JobInfo()
+                    last_jobinfo.job_id = c.get_job_id()
+                    last_jobinfo.job_state = job_states.DONE
+                last_jobinfo.detailedJobinfo = detailed_jobinfo
+                c._set_last_jobinfo(last_jobinfo)
+            except Exception as e:
+                execlogger.warning("There was an exception while "
+                                   "retrieving the detailed jobinfo "
+                                   "for calculation {} ({}): {}".format(
+                    c.pk, e.__class__.__name__, e.message),
+                                   extra=logger_extra)
+                continue
+
+    # Set the state to COMPUTED as the very last thing
+    # of this routine; no further change should be done after
+    # this, so that in general the retriever can just
+    # poll for this state, if we want to.
+    # Calculations for which someone already set it are just skipped.
+    JobCalculation._set_state_bulk([c.pk for c in computed],
+                                   calc_states.COMPUTED)
 
     return computed
 
 
+@_instrumented_stage(RETRIEVE)
 def retrieve_jobs():
-    from aiida.orm import JobCalculation, Computer
-    from aiida.backends.utils import get_authinfo, QueryFactory
+    from aiida.backends.utils import QueryFactory
 
     qmanager = QueryFactory()()
     # I create a unique set of pairs (computer, aiidauser)
@@ -204,31 +441,35 @@ def retrieve_jobs():
             #~ only_enabled=True)
     #~ )
 
-    for computer, aiidauser in computers_users_to_check:
-        execlogger.debug("({},{}) pair to check".format(
-            aiidauser.email, computer.name))
-        try:
-            authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
-            retrieve_computed_for_authinfo(authinfo)
-        except Exception as e:
-            msg = ("Error while retrieving calculation status for "
-                   "aiidauser={} on computer={}, "
-                   "error type is {}, error message: {}".format(
-                aiidauser.email,
-                computer.name,
-                e.__class__.__name__, e.message))
-            execlogger.error(msg)
-            # Continue with next computer
-            continue
+    _run_for_computers_users('retriever', _retrieve_jobs_for_computer_user,
+                             computers_users_to_check)
+
+
+def _retrieve_jobs_for_computer_user(computer, aiidauser):
+    from aiida.backends.utils import get_authinfo
+
+    execlogger.debug("({},{}) pair to check".format(
+        aiidauser.email, computer.name))
+    try:
+        authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
+        retrieve_computed_for_authinfo(authinfo)
+    except Exception as e:
+        msg = ("Error while retrieving calculation status for "
+               "aiidauser={} on computer={}, "
+               "error type is {}, error message: {}".format(
+            aiidauser.email,
+            computer.name,
+            e.__class__.__name__, e.message))
+        execlogger.error(msg)
 
 
 # in daemon
+@_instrumented_stage(UPDATE)
 def update_jobs():
     """
     calls an update for each set of pairs (machine, aiidauser)
     """
-    from aiida.orm import JobCalculation, Computer, User
-    from aiida.backends.utils import get_authinfo, QueryFactory
+    from aiida.backends.utils import QueryFactory
 
     qmanager = QueryFactory()()
     # I create a unique set of pairs (computer, aiidauser)
@@ -238,34 +479,35 @@ def update_jobs():
             only_enabled=True
         )
 
-    for computer, aiidauser in computers_users_to_check:
+    _run_for_computers_users('updater', _update_jobs_for_computer_user,
+                             computers_users_to_check)
 
-        execlogger.debug("({},{}) pair to check".format(
-            aiidauser.email, computer.name))
 
-        try:
-            authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
-            computed_calcs = update_running_calcs_status(authinfo)
-        except Exception as e:
-            msg = ("Error while updating calculation status "
-                   "for aiidauser={} on computer={}, "
-                   "error type is {}, error message: {}".format(
-                aiidauser.email,
-                computer.name,
-                e.__class__.__name__, e.message))
-            execlogger.error(msg)
-            # Continue with next computer
-            continue
+def _update_jobs_for_computer_user(computer, aiidauser):
+    from aiida.backends.utils import get_authinfo
+
+    execlogger.debug("({},{}) pair to check".format(
+        aiidauser.email, computer.name))
+
+    try:
+        authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
+        update_running_calcs_status(authinfo)
+    except Exception as e:
+        msg = ("Error while updating calculation status "
+               "for aiidauser={} on computer={}, "
+               "error type is {}, error message: {}".format(
+            aiidauser.email,
+            computer.name,
+            e.__class__.__name__, e.message))
+        execlogger.error(msg)
 
 
+@_instrumented_stage(SUBMIT)
 def submit_jobs():
     """
     Submit all jobs in the TOSUBMIT state.
     """
-    from aiida.orm import JobCalculation, Computer, User
-    from aiida.utils.logger import get_dblogger_extra
-    from aiida.backends.utils import get_authinfo, QueryFactory
-
+    from aiida.backends.utils import QueryFactory
 
     qmanager = QueryFactory()()
     # I create a unique set of pairs (computer, aiidauser)
@@ -275,55 +517,57 @@ def submit_jobs():
             only_enabled=True
         )
 
-    for computer, aiidauser in computers_users_to_check:
+    _run_for_computers_users('submitter', _submit_jobs_for_computer_user,
+                             computers_users_to_check)
+
+
+def _submit_jobs_for_computer_user(computer, aiidauser):
+    from aiida.orm import JobCalculation
+    from aiida.utils.logger import get_dblogger_extra
+    from aiida.backends.utils import get_authinfo, QueryFactory
 
-        execlogger.debug("({},{}) pair to submit".format(
-            aiidauser.email, computer.name))
+    execlogger.debug("({},{}) pair to submit".format(
+        aiidauser.email, computer.name))
 
+    try:
         try:
-            try:
-                authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
-            except AuthenticationError:
-                # TODO!!
-                # Put each calculation in the SUBMISSIONFAILED state because
-                # I do not have AuthInfo to submit them
-                calcs_to_inquire = qmanager.query_jobcalculations_by_computer_user_state(
-                        state=calc_states.TOSUBMIT,
-                        computer=computer, user=aiidauser
-                    )
-                #~ calcs_to_inquire = JobCalculation._get_all_with_state(
-                    #~ state=calc_states.TOSUBMIT,
-                    #~ computer=computer, user=aiidauser)
-                for calc in calcs_to_inquire:
-                    try:
-                        calc._set_state(calc_states.SUBMISSIONFAILED)
-                    except ModificationNotAllowed:
-                        # Someone already set it, just skip
-                        pass
-                    logger_extra = get_dblogger_extra(calc)
-                    execlogger.error("Submission of calc {} failed, "
-                                     "computer pk= {} ({}) is not configured "
-                                     "for aiidauser {}".format(
-                        calc.pk, computer.pk, computer.get_name(),
-                        aiidauser.email),
-                                     extra=logger_extra)
-                # Go to the next (dbcomputer,aiidauser) pair
-                continue
+            authinfo = get_authinfo(computer.dbcomputer, aiidauser._dbuser)
+        except AuthenticationError:
+            # TODO!!
+            # Put each calculation in the SUBMISSIONFAILED state because
+            # I do not have AuthInfo to submit them
+            qmanager = QueryFactory()()
+            calcs_to_inquire = qmanager.query_jobcalculations_by_computer_user_state(
+                    state=calc_states.TOSUBMIT,
+                    computer=computer, user=aiidauser
+                )
+            # Calculations for which someone already set it are just skipped
+            JobCalculation._set_state_bulk(
+                [calc.pk for calc in calcs_to_inquire],
+                calc_states.SUBMISSIONFAILED)
+            for calc in calcs_to_inquire:
+                logger_extra = get_dblogger_extra(calc)
+                execlogger.error("Submission of calc {} failed, "
+                                 "computer pk= {} ({}) is not configured "
+                                 "for aiidauser {}".format(
+                    calc.pk, computer.pk, computer.get_name(),
+                    aiidauser.email),
+                                 extra=logger_extra)
+            # Nothing else to do for this (dbcomputer,aiidauser) pair
+            return
 
-            submitted_calcs = submit_jobs_with_authinfo(authinfo)
-        except Exception as e:
-            import traceback
+        submit_jobs_with_authinfo(authinfo)
+    except Exception as e:
+        import traceback
 
-            msg = ("Error while submitting jobs "
-                   "for aiidauser={} on computer={}, "
-                   "error type is {}, traceback: {}".format(
-                aiidauser.email,
-                computer.name,
-                e.__class__.__name__, traceback.format_exc()))
-            print msg
-            execlogger.error(msg)
-            # Continue with next computer
-            continue
+        msg = ("Error while submitting jobs "
+               "for aiidauser={} on computer={}, "
+               "error type is {}, traceback: {}".format(
+            aiidauser.email,
+            computer.name,
+            e.__class__.__name__, traceback.format_exc()))
+        print msg
+        execlogger.error(msg)
 
 
 def submit_jobs_with_authinfo(authinfo):
@@ -359,7 +603,26 @@ def submit_jobs_with_authinfo(authinfo):
         # Open connection
         try:
             # I do it here so that the transport is opened only once per computer
-            with authinfo.get_transport() as t:
+            with get_transport_pool().borrow(authinfo) as t:
+                batch_size = _get_profile_setting('DAEMON_SUBMIT_BATCH_SIZE',
+                                                  DAEMON_SUBMIT_BATCH_SIZE)
+                if batch_size > 1 and len(calcs_to_inquire) > 1:
+                    calcs = list(calcs_to_inquire)
+                    for i in range(0, len(calcs), batch_size):
+                        try:
+                            submit_calcs_batch(calcs[i:i + batch_size],
+                                               authinfo=authinfo, transport=t)
+                        except Exception as e:
+                            # The calculations of the batch that did not get
+                            # a job id have already been set to
+                            # SUBMISSIONFAILED: proceed to the next batch
+                            execlogger.warning(
+                                "There was an exception while submitting a "
+                                "batch of {} calculations ({}): {}".format(
+                                    len(calcs[i:i + batch_size]),
+                                    e.__class__.__name__, e.message))
+                    return
+
                 for c in calcs_to_inquire:
                     logger_extra = get_dblogger_extra(c)
                     t._set_logger_extra(logger_extra)
@@ -383,6 +646,10 @@ def submit_jobs_with_authinfo(authinfo):
             from aiida.utils.logger import get_dblogger_extra
 
             for calc in calcs_to_inquire:
+                # The calculations that got a job id are on the scheduler:
+                # they must be followed as usual
+                if calc.get_job_id() is not None:
+                    continue
                 logger_extra = get_dblogger_extra(calc)
                 try:
                     calc._set_state(calc_states.SUBMISSIONFAILED)
@@ -397,6 +664,216 @@ def submit_jobs_with_authinfo(authinfo):
             raise
 
 
+def _set_submitting(calc):
+    """
+    Check that the calculation can be submitted, and set its state to
+    SUBMITTING.
+
+    :raise ValueError: if the calculation cannot be submitted.
+    """
+    if calc._has_cached_links():
+        raise ValueError("Cannot submit calculation {} because it has "
+                         "cached input links! If you "
+                         "just want to test the submission, use the "
+                         "test_submit() method, otherwise store all links"
+                         "first".format(calc.pk))
+
+    # Double check, in the case the calculation was 'killed' (and therefore
+    # put in the 'FAILED' state) in the meantime
+    # Do it as near as possible to the state change below (it would be
+    # even better to do it with some sort of transaction)
+    if calc.get_state() != calc_states.TOSUBMIT:
+        raise ValueError("Can only submit calculations with state=TOSUBMIT! "
+                         "(state of calc {} is {} instead)".format(calc.pk,
+                                                                   calc.get_state()))
+    # I start to submit the calculation: I set the state
+    try:
+        calc._set_state(calc_states.SUBMITTING)
+    except ModificationNotAllowed:
+        raise ValueError("The calculation has already been submitted by "
+                         "someone else!")
+
+
+def _set_submission_failed(calc, logger_extra, error=None):
+    """
+    Set the state of a calculation whose submission failed, and log the
+    error (by default, the traceback of the exception being handled).
+    """
+    import traceback
+
+    try:
+        calc._set_state(calc_states.SUBMISSIONFAILED)
+    except ModificationNotAllowed:
+        # Someone already set it, just skip
+        pass
+
+    if error is None:
+        error = "Traceback: {}".format(traceback.format_exc())
+    execlogger.error("Submission of calc {} failed, check also the "
+                     "log file! {}".format(calc.pk, error),
+                     extra=logger_extra)
+
+
+def _presubmit_calc(calc, computer, folder):
+    """
+    Prepare in the given local folder all the files of the calculation, and
+    store them in the repository as raw input.
+
+    :return: a tuple (calcinfo, script_filename, input_codes)
+    """
+    from aiida.orm import Code
+    from aiida.common.exceptions import InputValidationError
+
+    calcinfo, script_filename = calc._presubmit(
+        folder, use_unstored_links=False)
+
+    codes_info = calcinfo.codes_info
+    input_codes = [load_node(_.code_uuid, parent_class=Code)
+                   for _ in codes_info ]
+
+    for code in input_codes:
+        if not code.can_run_on(computer):
+            raise InputValidationError(
+                "The selected code {} for calculation "
+                "{} cannot run on computer {}".
+                format(code.pk, calc.pk, computer.name))
+
+    # After this call, no modifications to the folder should be done
+    calc._store_raw_input_folder(folder.abspath)
+
+    return calcinfo, script_filename, input_codes
+
+
+def _chdir_remote_working_directory(t, authinfo, computer, log_prefix):
+    """
+    Go in the remote working directory of the authinfo, creating it if
+    needed.
+
+    :param log_prefix: a string prepended to the log and error messages
+    :return: the absolute path of the remote working directory
+    """
+    # NOTE: some logic is partially replicated in the 'test_submit'
+    # method of JobCalculation. If major logic changes are done
+    # here, make sure to update also the test_submit routine
+    remote_user = t.whoami()
+    # TODO Doc: {username} field
+    # TODO: if something is changed here, fix also 'verdi computer test'
+    remote_working_directory = authinfo.get_workdir().format(
+        username=remote_user)
+    if not remote_working_directory.strip():
+        raise ConfigurationError(
+            "{} "
+            "No remote_working_directory configured for computer "
+            "'{}'".format(log_prefix, computer.name))
+
+    # If it already exists, no exception is raised
+    try:
+        t.chdir(remote_working_directory)
+    except IOError:
+        execlogger.debug(
+            "{} "
+            "Unable to chdir in {}, trying to create it".
+            format(log_prefix, remote_working_directory))
+        try:
+            t.makedirs(remote_working_directory)
+            t.chdir(remote_working_directory)
+        except (IOError, OSError) as e:
+            raise ConfigurationError(
+                "{} "
+                "Unable to create the remote directory {} on "
+                "computer '{}': {}".
+                format(log_prefix, remote_working_directory, computer.name,
+                       e.message))
+
+    return t.getcwd()
+
+
+def _copy_remote_resources(calc, calcinfo, computer, t, logger_extra):
+    """
+    Copy and symlink the remote files requested by the calculation plugin,
+    in the current directory of the transport (the calculation folder).
+    """
+    remote_copy_list = calcinfo.remote_copy_list
+    remote_symlink_list = calcinfo.remote_symlink_list
+
+    if remote_copy_list is not None:
+        for (remote_computer_uuid, remote_abs_path,
+             dest_rel_path) in remote_copy_list:
+            if remote_computer_uuid == computer.uuid:
+                execlogger.debug("[submission of calc {}] "
+                                 "copying {} remotely, directly on the machine "
+                                 "{}".format(calc.pk, dest_rel_path, computer.name))
+                try:
+                    t.copy(remote_abs_path, dest_rel_path)
+                except (IOError, OSError):
+                    execlogger.warning("[submission of calc {}] "
+                                       "Unable to copy remote resource from {} to {}! "
+                                       "Stopping.".format(calc.pk,
+                                                          remote_abs_path, dest_rel_path),
+                                       extra=logger_extra)
+                    raise
+            else:
+                # TODO: implement copy between two different
+                # machines!
+                raise NotImplementedError(
+                    "[presubmission of calc {}] "
+                    "Remote copy between two different machines is "
+                    "not implemented yet".format(calc.pk))
+
+    if remote_symlink_list is not None:
+        for (remote_computer_uuid, remote_abs_path,
+             dest_rel_path) in remote_symlink_list:
+            if remote_computer_uuid == computer.uuid:
+                execlogger.debug("[submission of calc {}] "
+                                 "copying {} remotely, directly on the machine "
+                                 "{}".format(calc.pk, dest_rel_path, computer.name))
+                try:
+                    t.symlink(remote_abs_path, dest_rel_path)
+                except (IOError, OSError):
+                    execlogger.warning("[submission of calc {}] "
+                                       "Unable to create remote symlink from {} to {}! "
+                                       "Stopping.".format(calc.pk,
+                                                          remote_abs_path, dest_rel_path),
+                                       extra=logger_extra)
+                    raise
+            else:
+                raise IOError("It is not possible to create a symlink "
+                              "between two different machines for "
+                              "calculation {}".format(calc.pk))
+
+
+def _store_remote_folder(calc, computer, workdir):
+    """
+    Create and store the RemoteData pointing to the remote calculation folder.
+    """
+    from aiida.orm.data.remote import RemoteData
+
+    remotedata = RemoteData(computer=computer,
+                            remote_path=workdir)
+    remotedata.add_link_from(calc, label='remote_folder',
+                             link_type=LinkType.CREATE)
+    remotedata.store()
+
+
+def _set_submitted(calc, computer, job_id, logger_extra):
+    calc._set_job_id(job_id)
+    # This should always be possible, because we should be
+    # the only ones submitting this calculations,
+    # so I do not check the ModificationNotAllowed
+    calc._set_state(calc_states.WITHSCHEDULER)
+    ## I do not set the state to queued; in this way, if the
+    ## daemon is down, the user sees '(unknown)' as last state
+    ## and understands that the daemon is not running.
+    # if job_tmpl.submit_as_hold:
+    #    calc._set_scheduler_state(job_states.QUEUED_HELD)
+    #else:
+    #    calc._set_scheduler_state(job_states.QUEUED)
+
+    execlogger.debug("submitted calculation {} on {} with "
+                     "jobid {}".format(calc.pk, computer.name, job_id),
+                     extra=logger_extra)
+
+
 def submit_calc(calc, authinfo, transport=None):
     """
     Submit a calculation
@@ -414,11 +891,8 @@ def submit_calc(calc, authinfo, transport=None):
         are done on the consistency of the given transport with the transport
         of the computer defined in the authinfo.
     """
-    from aiida.orm import Code, Computer
+    from aiida.orm import Computer
     from aiida.common.folders import SandboxFolder
-    from aiida.common.exceptions import (
-        InputValidationError)
-    from aiida.orm.data.remote import RemoteData
     from aiida.utils.logger import get_dblogger_extra
 
     if not authinfo.enabled:
@@ -435,27 +909,7 @@ def submit_calc(calc, authinfo, transport=None):
 
     t._set_logger_extra(logger_extra)
 
-    if calc._has_cached_links():
-        raise ValueError("Cannot submit calculation {} because it has "
-                         "cached input links! If you "
-                         "just want to test the submission, use the "
-                         "test_submit() method, otherwise store all links"
-                         "first".format(calc.pk))
-
-    # Double check, in the case the calculation was 'killed' (and therefore
-    # put in the 'FAILED' state) in the meantime
-    # Do it as near as possible to the state change below (it would be
-    # even better to do it with some sort of transaction)
-    if calc.get_state() != calc_states.TOSUBMIT:
-        raise ValueError("Can only submit calculations with state=TOSUBMIT! "
-                         "(state of calc {} is {} instead)".format(calc.pk,
-                                                                   calc.get_state()))
-    # I start to submit the calculation: I set the state
-    try:
-        calc._set_state(calc_states.SUBMITTING)
-    except ModificationNotAllowed:
-        raise ValueError("The calculation has already been submitted by "
-                         "someone else!")
+    _set_submitting(calc)
 
     try:
         if must_open_t:
@@ -467,56 +921,12 @@ def submit_calc(calc, authinfo, transport=None):
         computer = calc.get_computer()
 
         with SandboxFolder() as folder:
-            calcinfo, script_filename = calc._presubmit(
-                folder, use_unstored_links=False)
+            calcinfo, script_filename, input_codes = _presubmit_calc(
+                calc, computer, folder)
 
-            codes_info = calcinfo.codes_info
-            input_codes = [load_node(_.code_uuid, parent_class=Code)
-                           for _ in codes_info ]
-
-            for code in input_codes:
-                if not code.can_run_on(computer):
-                    raise InputValidationError(
-                        "The selected code {} for calculation "
-                        "{} cannot run on computer {}".
-                        format(code.pk, calc.pk, computer.name))
-
-            # After this call, no modifications to the folder should be done
-            calc._store_raw_input_folder(folder.abspath)
-
-            # NOTE: some logic is partially replicated in the 'test_submit'
-            # method of JobCalculation. If major logic changes are done
-            # here, make sure to update also the test_submit routine
-            remote_user = t.whoami()
-            # TODO Doc: {username} field
-            # TODO: if something is changed here, fix also 'verdi computer test'
-            remote_working_directory = authinfo.get_workdir().format(
-                username=remote_user)
-            if not remote_working_directory.strip():
-                raise ConfigurationError(
-                    "[submission of calc {}] "
-                    "No remote_working_directory configured for computer "
-                    "'{}'".format(calc.pk, computer.name))
-
-            # If it already exists, no exception is raised
-            try:
-                t.chdir(remote_working_directory)
-            except IOError:
-                execlogger.debug(
-                    "[submission of calc {}] "
-                    "Unable to chdir in {}, trying to create it".
-                    format(calc.pk, remote_working_directory),
-                    extra=logger_extra)
-                try:
-                    t.makedirs(remote_working_directory)
-                    t.chdir(remote_working_directory)
-                except (IOError, OSError) as e:
-                    raise ConfigurationError(
-                        "[submission of calc {}] "
-                        "Unable to create the remote directory {} on "
-                        "computer '{}': {}".
-                        format(calc.pk, remote_working_directory, computer.name,
-                               e.message))
+            _chdir_remote_working_directory(
+                t, authinfo, computer,
+                log_prefix="[submission of calc {}]".format(calc.pk))
             # Store remotely with sharding (here is where we choose
             # the folder structure of remote jobs; then I store this
             # in the calculation properties using _set_remote_dir
@@ -556,8 +966,6 @@ def submit_calc(calc, authinfo, transport=None):
             # NOTE: validation of these lists are done
             # inside calc._presubmit()
             local_copy_list = calcinfo.local_copy_list
-            remote_copy_list = calcinfo.remote_copy_list
-            remote_symlink_list = calcinfo.remote_symlink_list
 
             if local_copy_list is not None:
                 for src_abs_path, dest_rel_path in local_copy_list:
@@ -567,88 +975,15 @@ def submit_calc(calc, authinfo, transport=None):
                                      extra=logger_extra)
                     t.put(src_abs_path, dest_rel_path)
 
-            if remote_copy_list is not None:
-                for (remote_computer_uuid, remote_abs_path,
-                     dest_rel_path) in remote_copy_list:
-                    if remote_computer_uuid == computer.uuid:
-                        execlogger.debug("[submission of calc {}] "
-                                         "copying {} remotely, directly on the machine "
-                                         "{}".format(calc.pk, dest_rel_path, computer.name))
-                        try:
-                            t.copy(remote_abs_path, dest_rel_path)
-                        except (IOError, OSError):
-                            execlogger.warning("[submission of calc {}] "
-                                               "Unable to copy remote resource from {} to {}! "
-                                               "Stopping.".format(calc.pk,
-                                                                  remote_abs_path, dest_rel_path),
-                                               extra=logger_extra)
-                            raise
-                    else:
-                        # TODO: implement copy between two different
-                        # machines!
-                        raise NotImplementedError(
-                            "[presubmission of calc {}] "
-                            "Remote copy between two different machines is "
-                            "not implemented yet".format(calc.pk))
-
-            if remote_symlink_list is not None:
-                for (remote_computer_uuid, remote_abs_path,
-                     dest_rel_path) in remote_symlink_list:
-                    if remote_computer_uuid == computer.uuid:
-                        execlogger.debug("[submission of calc {}] "
-                                         "copying {} remotely, directly on the machine "
-                                         "{}".format(calc.pk, dest_rel_path, computer.name))
-                        try:
-                            t.symlink(remote_abs_path, dest_rel_path)
-                        except (IOError, OSError):
-                            execlogger.warning("[submission of calc {}] "
-                                               "Unable to create remote symlink from {} to {}! "
-                                               "Stopping.".format(calc.pk,
-                                                                  remote_abs_path, dest_rel_path),
-                                               extra=logger_extra)
-                            raise
-                    else:
-                        raise IOError("It is not possible to create a symlink "
-                                      "between two different machines for "
-                                      "calculation {}".format(calc.pk))
-
-            remotedata = RemoteData(computer=computer,
-                                    remote_path=workdir)
-            remotedata.add_link_from(calc, label='remote_folder',
-                                     link_type=LinkType.CREATE)
-            remotedata.store()
+            _copy_remote_resources(calc, calcinfo, computer, t, logger_extra)
 
-            job_id = s.submit_from_script(t.getcwd(), script_filename)
-            calc._set_job_id(job_id)
-            # This should always be possible, because we should be
-            # the only ones submitting this calculations,
-            # so I do not check the ModificationNotAllowed
-            calc._set_state(calc_states.WITHSCHEDULER)
-            ## I do not set the state to queued; in this way, if the
-            ## daemon is down, the user sees '(unknown)' as last state
-            ## and understands that the daemon is not running.
-            # if job_tmpl.submit_as_hold:
-            #    calc._set_scheduler_state(job_states.QUEUED_HELD)
-            #else:
-            #    calc._set_scheduler_state(job_states.QUEUED)
-
-            execlogger.debug("submitted calculation {} on {} with "
-                             "jobid {}".format(calc.pk, computer.name, job_id),
-                             extra=logger_extra)
-
-    except Exception as e:
-        import traceback
+            _store_remote_folder(calc, computer, workdir)
 
-        try:
-            calc._set_state(calc_states.SUBMISSIONFAILED)
-        except ModificationNotAllowed:
-            # Someone already set it, just skip
-            pass
+            job_id = s.submit_from_script(t.getcwd(), script_filename)
+            _set_submitted(calc, computer, job_id, logger_extra)
 
-        execlogger.error("Submission of calc {} failed, check also the "
-                         "log file! Traceback: {}".format(calc.pk,
-                                                          traceback.format_exc()),
-                         extra=logger_extra)
+    except Exception:
+        _set_submission_failed(calc, logger_extra)
         raise
     finally:
         # close the transport, but only if it was opened within this function
@@ -656,16 +991,484 @@ def submit_calc(calc, authinfo, transport=None):
             t.close()
 
 
-def retrieve_computed_for_authinfo(authinfo):
-    from aiida.orm import JobCalculation
+def _add_calc_to_tarball(tar, calc_path, folder, calcinfo, input_codes):
+    """
+    Add to an open tarfile all the local files of a calculation, in the same
+    order in which submit_calc copies them (so that later files overwrite
+    earlier ones in the same way when the tarball is extracted).
+
+    :param calc_path: the path of the calculation folder within the tarball
+    """
+    import os
+
+    for code in input_codes:
+        if code.is_local():
+            for f in code.get_folder_list():
+                tar.add(code.get_abs_path(f), os.path.join(calc_path, f))
+            executable = code.get_local_executable()
+            tarinfo = tar.gettarinfo(code.get_abs_path(executable),
+                                     os.path.join(calc_path, executable))
+            tarinfo.mode = 0755  # rwxr-xr-x
+            with open(code.get_abs_path(executable), 'rb') as f:
+                tar.addfile(tarinfo, f)
+
+    for f in folder.get_content_list():
+        tar.add(folder.get_abs_path(f), os.path.join(calc_path, f))
+
+    if calcinfo.local_copy_list is not None:
+        for src_abs_path, dest_rel_path in calcinfo.local_copy_list:
+            tar.add(src_abs_path, os.path.join(calc_path, dest_rel_path))
+
+
+def _load_job_template(folder, scheduler):
+    """
+    Load the JobTemplate stored by JobCalculation._presubmit in the given
+    folder.
+
+    :return: the JobTemplate, or None if it could not be loaded.
+    """
+    import json
+    from aiida.scheduler.datastructures import JobTemplate
+
+    try:
+        with open(folder.get_subfolder('.aiida').get_abs_path(
+                'job_tmpl.json')) as f:
+            job_tmpl = JobTemplate(json.load(f))
+        job_tmpl.job_resource = scheduler.create_job_resource(
+            **{k: v for k, v in job_tmpl.job_resource.iteritems()
+               if v is not None})
+    except Exception as e:
+        execlogger.debug("Unable to load the job template from {}: "
+                         "{}".format(folder.abspath, e))
+        return None
+    return job_tmpl
+
+
+def _get_job_array_template(job_tmpl):
+    """
+    Return the template of a job array whose tasks have the requirements of
+    job_tmpl.
+    """
+    array_tmpl = job_tmpl.copy()
+    array_tmpl.job_name = 'aiida-array'
+    return array_tmpl
+
+
+def _submit_job_array(scheduler, computer, array_tmpl, script_filename,
+                      group, array_directory):
+    """
+    Submit a group of calculations as the tasks of a job array.
+
+    :param array_tmpl: the JobTemplate of the array
+    :param script_filename: the submit script of each calculation
+    :param group: a list of (calc, workdir, logger_extra) tuples
+    :param array_directory: the remote directory where the submit script
+        of the array is created, and that is used by the scheduler for the
+        output files of the array
+    """
+    import os
+    import tempfile
+
+    t = scheduler.transport
+    array_script = scheduler.get_array_submit_script(
+        array_tmpl, [workdir for _, workdir, _ in group], script_filename)
+
+    t.makedirs(array_directory)
+    t.chdir(array_directory)
+    handle, script_path = tempfile.mkstemp(suffix='.sh')
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write(array_script)
+        t.put(script_path, _JOB_ARRAY_SCRIPT)
+    finally:
+        os.remove(script_path)
+
+    job_ids = scheduler.submit_array(array_directory, _JOB_ARRAY_SCRIPT,
+                                     len(group))
+    for (calc, _, logger_extra), job_id in zip(group, job_ids):
+        _set_submitted(calc, computer, job_id, logger_extra)
+
+
+def submit_calcs_batch(calcs, authinfo, transport):
+    """
+    Submit many calculations on the same computer in a single batch.
+
+    Rather than copying the files of each calculation one by one, the files
+    of all calculations are put in a single compressed tarball, that is
+    copied and extracted remotely with a single command; then, all submit
+    scripts are submitted with a single command.
+    Calculations whose submission fails are set to SUBMISSIONFAILED without
+    affecting the others.
+
+    If DAEMON_SUBMIT_JOB_ARRAYS is set in the profile and the scheduler
+    supports job arrays, calculations with the same scheduler requirements
+    are submitted as the tasks of a single job array.
+
+    :param calcs: a list of JobCalculation instances, in the TOSUBMIT state,
+        all to be submitted with the given authinfo.
+    :param authinfo: the authinfo for these calculations.
+    :param transport: an already opened transport, for the computer of the
+        authinfo.
+    """
+    import os
+    import tarfile
+    import tempfile
+    import uuid
+    from aiida.orm import Computer
     from aiida.common.folders import SandboxFolder
-    from aiida.orm.data.folder import FolderData
+    from aiida.common.utils import escape_for_bash
     from aiida.utils.logger import get_dblogger_extra
-    from aiida.orm import DataFactory
 
-    from aiida.backends.utils import QueryFactory
+    if not authinfo.enabled:
+        return
+
+    t = transport
+    computer = Computer(dbcomputer=authinfo.dbcomputer)
+    s = computer.get_scheduler()
+    s.set_transport(t)
+
+    remote_working_directory = _chdir_remote_working_directory(
+        t, authinfo, computer, log_prefix="[batch submission]")
+
+    use_job_arrays = _get_profile_setting('DAEMON_SUBMIT_JOB_ARRAYS',
+                                          DAEMON_SUBMIT_JOB_ARRAYS)
+    try:
+        use_job_arrays = use_job_arrays and s.get_feature('can_submit_array')
+    except NotImplementedError:
+        use_job_arrays = False
+
+    # Tuples (calc, calcinfo, script_filename, workdir, job_tmpl,
+    # logger_extra) of the calculations that are being submitted; job_tmpl
+    # is None if the calculation cannot be part of a job array
+    staged = []
+
+    handle, tarball_path = tempfile.mkstemp(suffix='.tar.gz')
+    os.close(handle)
+    try:
+        tar = tarfile.open(tarball_path, 'w:gz')
+        try:
+            for calc in calcs:
+                logger_extra = get_dblogger_extra(calc)
+                try:
+                    _set_submitting(calc)
+                except ValueError as e:
+                    execlogger.warning("There was an exception for "
+                                       "calculation {} ({}): {}".format(
+                        calc.pk, e.__class__.__name__, e.message))
+                    continue
 
+                try:
+                    with SandboxFolder() as folder:
+                        calcinfo, script_filename, input_codes = \
+                            _presubmit_calc(calc, computer, folder)
+                        # Same sharding as in submit_calc
+                        calc_path = os.path.join(calcinfo.uuid[:2],
+                                                 calcinfo.uuid[2:4],
+                                                 calcinfo.uuid[4:])
+                        _add_calc_to_tarball(tar, calc_path, folder,
+                                             calcinfo, input_codes)
+                        job_tmpl = (_load_job_template(folder, s)
+                                    if use_job_arrays else None)
+                    workdir = os.path.join(remote_working_directory,
+                                           calc_path)
+                    calc._set_remote_workdir(workdir)
+                except Exception:
+                    _set_submission_failed(calc, logger_extra)
+                    continue
+
+                staged.append((calc, calcinfo, script_filename, workdir,
+                               job_tmpl, logger_extra))
+        finally:
+            tar.close()
+
+        if not staged:
+            return
+
+        try:
+            remote_tarball = 'aiida_submission_{}.tar.gz'.format(
+                uuid.uuid4())
+            t.put(tarball_path, remote_tarball)
+            retval, stdout, stderr = t.exec_command_wait(
+                "tar -xzf {0} && rm -f {0}".format(
+                    escape_for_bash(remote_tarball)))
+            if retval != 0:
+                raise IOError("Unable to extract the tarball {} in {}: "
+                              "retval={}\nstdout={}\nstderr={}".format(
+                    remote_tarball, remote_working_directory, retval,
+                    stdout, stderr))
+        except Exception:
+            for calc, _, _, _, _, logger_extra in staged:
+                _set_submission_failed(calc, logger_extra)
+            raise
+    finally:
+        os.remove(tarball_path)
+
+    to_submit = []
+    # Calculations to be submitted as a job array, grouped by the submit
+    # script of the array (without tasks), so that each group contains
+    # calculations with the same scheduler requirements
+    array_groups = {}
+    for (calc, calcinfo, script_filename, workdir, job_tmpl,
+         logger_extra) in staged:
+        try:
+            t.chdir(workdir)
+            _copy_remote_resources(calc, calcinfo, computer, t, logger_extra)
+            _store_remote_folder(calc, computer, workdir)
+        except Exception:
+            _set_submission_failed(calc, logger_extra)
+            continue
+        if job_tmpl is not None:
+            array_tmpl = _get_job_array_template(job_tmpl)
+            key = s.get_array_submit_script(array_tmpl, [], script_filename)
+            array_groups.setdefault(key, (array_tmpl, script_filename, []))[
+                2].append((calc, workdir, logger_extra))
+        else:
+            to_submit.append((calc, script_filename, workdir, logger_extra))
+
+    for array_tmpl, script_filename, group in array_groups.itervalues():
+        if len(group) < 2:
+            calc, workdir, logger_extra = group[0]
+            to_submit.append((calc, script_filename, workdir, logger_extra))
+            continue
+        array_directory = os.path.join(remote_working_directory,
+                                       _JOB_ARRAYS_FOLDER, str(uuid.uuid4()))
+        try:
+            _submit_job_array(s, computer, array_tmpl, script_filename,
+                              group, array_directory)
+        except Exception:
+            for calc, _, logger_extra in group:
+                _set_submission_failed(calc, logger_extra)
+
+    try:
+        results = s.submit_many_from_scripts(
+            [(workdir, script_filename)
+             for _, script_filename, workdir, _ in to_submit])
+    except Exception:
+        for calc, _, _, logger_extra in to_submit:
+            _set_submission_failed(calc, logger_extra)
+        raise
+
+    # Only the calculations without a job id are failed: the others are on
+    # the scheduler, even if the output of some submissions was lost
+    for (calc, _, _, logger_extra), (job_id, error) in zip(to_submit,
+                                                           results):
+        if error is None:
+            _set_submitted(calc, computer, job_id, logger_extra)
+        else:
+            _set_submission_failed(calc, logger_extra,
+                                   error="Scheduler error: {}".format(error))
+
+
+def _escape_glob_for_bash(pattern):
+    """
+    Escape a path for bash, except for the glob characters, so that the
+    remote shell expands the patterns.
+    """
+    from aiida.common.utils import escape_for_bash
+
+    return ''.join(c if c.isalnum() or c in '*?[]/._-' else escape_for_bash(c)
+                   for c in pattern)
+
+
+def _get_tar_retrieve_targets(retrieve_list):
+    """
+    Return, for each item of the retrieve list, a tuple (pattern_components,
+    local_name, depth) used to decide where each file of the tar stream goes,
+    replicating the logic of the file-by-file retrieval: local_name is None
+    for plain strings (the file keeps its name), and depth is the number of
+    trailing components of the remote path appended to local_name otherwise.
+
+    :raise ValueError: if the retrieve list contains paths that cannot be
+        retrieved through tar (absolute paths, or paths containing '..').
+    """
+    import os
+
+    targets = []
+    for item in retrieve_list:
+        if isinstance(item, list):
+            remote_name, local_name, depth = item
+        else:
+            remote_name, local_name, depth = item, None, None
+        if os.path.isabs(remote_name):
+            raise ValueError("Absolute path {} in the retrieve "
+                             "list".format(remote_name))
+        components = [c for c in remote_name.split('/') if c not in ('', '.')]
+        if '..' in components or not components:
+            raise ValueError("Invalid path {} in the retrieve "
+                             "list".format(remote_name))
+        targets.append((components, local_name, depth))
+    return targets
+
+
+def _get_tar_member_destinations(member_name, targets):
+    """
+    Return the local paths (relative to the folder of the retrieved files)
+    where a member of the tar stream has to be written.
+    """
+    import os
+    from fnmatch import fnmatchcase
+
+    member_components = [c for c in member_name.split('/')
+                         if c not in ('', '.')]
+    destinations = []
+    for pattern_components, local_name, depth in targets:
+        num_components = len(pattern_components)
+        if len(member_components) < num_components:
+            continue
+        if not all(fnmatchcase(m, p) for m, p in zip(
+                member_components, pattern_components)):
+            continue
+        matched = member_components[:num_components]
+        rest = member_components[num_components:]
+        if local_name is None:
+            destination = [matched[-1]]
+        else:
+            destination = [local_name] + (matched[-depth:] if depth > 0
+                                          else [])
+        destination = os.path.normpath(os.path.join(*(destination + rest)))
+        if os.path.isabs(destination) or destination.startswith(os.pardir):
+            continue
+        if destination not in destinations:
+            destinations.append(destination)
+    return destinations
+
+
+def _get_exit_status(proc):
+    """
+    Wait for a command started with transport._exec_command_internal and
+    return its exit status.
+
+    :param proc: the subprocess.Popen object of the local transport, or the
+        paramiko Channel of the ssh transport
+    """
+    if hasattr(proc, 'recv_exit_status'):
+        return proc.recv_exit_status()
+    return proc.wait()
+
+
+def _retrieve_with_tar(transport, workdir, retrieve_list, folder_abspath):
+    """
+    Retrieve the files of the retrieve list from workdir with a single
+    remote tar command, whose compressed output is stored in a temporary
+    file and extracted in folder_abspath once the command succeeded.
+
+    Missing files are ignored, as in the file-by-file retrieval. It does
+    not access the database, so it can run in a separate thread.
+
+    :raise ValueError: if the retrieve list cannot be retrieved with tar
+    :raise RemoteOperationError: if the tar command fails (nothing is
+        extracted then)
+    :raise tarfile.TarError: if the stream is not a valid tar archive
+    """
     import os
+    import shutil
+    import tarfile
+    import tempfile
+    from aiida.common.exceptions import RemoteOperationError
+    from aiida.common.utils import escape_for_bash
+
+    targets = _get_tar_retrieve_targets(retrieve_list)
+
+    # GNU tar: dereference symlinks (as the SFTP get does) and do not stop
+    # for missing files or patterns not matching any file
+    command = "cd {} && tar --ignore-failed-read -chzf - -- {}".format(
+        escape_for_bash(workdir),
+        " ".join(_escape_glob_for_bash("/".join(components))
+                 for components, _, _ in targets))
+    stdin, stdout, stderr, proc = transport._exec_command_internal(command)
+    stdin.close()
+
+    # stderr is drained while stdout is read: otherwise tar blocks as soon
+    # as the stderr pipe is full, and stdout is never closed
+    stderr_chunks = []
+    stderr_reader = threading.Thread(
+        target=lambda: stderr_chunks.append(stderr.read()))
+    stderr_reader.daemon = True
+    stderr_reader.start()
+
+    with tempfile.TemporaryFile() as archive:
+        shutil.copyfileobj(stdout, archive)
+        stderr_reader.join()
+        warnings = "".join(stderr_chunks)
+        retval = _get_exit_status(proc)
+        if retval != 0:
+            raise RemoteOperationError(
+                "tar exited with status {}: {}".format(retval,
+                                                       warnings.strip()))
+        if warnings.strip():
+            execlogger.debug("Warnings while retrieving files from {}: "
+                             "{}".format(workdir, warnings))
+
+        archive.seek(0)
+        with tarfile.open(fileobj=archive, mode='r|gz') as tar:
+            for member in tar:
+                destinations = _get_tar_member_destinations(member.name,
+                                                            targets)
+                if not destinations:
+                    continue
+                abs_destinations = [os.path.join(folder_abspath, d)
+                                    for d in destinations]
+                if member.isdir():
+                    for destination in abs_destinations:
+                        if not os.path.isdir(destination):
+                            os.makedirs(destination)
+                elif member.isfile():
+                    for destination in abs_destinations:
+                        if not os.path.isdir(os.path.dirname(destination)):
+                            os.makedirs(os.path.dirname(destination))
+                    source = tar.extractfile(member)
+                    with open(abs_destinations[0], 'wb') as f:
+                        shutil.copyfileobj(source, f)
+                    for destination in abs_destinations[1:]:
+                        shutil.copyfile(abs_destinations[0], destination)
+
+
+def _retrieve_calcs_with_tar(transport, to_retrieve):
+    """
+    Retrieve, for many calculations, the files of their retrieve lists
+    through tar streams, transferring the files of up to
+    DAEMON_RETRIEVE_CONCURRENCY calculations at the same time.
+
+    :param to_retrieve: a list of (calc, workdir, retrieve_list,
+        folder_abspath) tuples
+    :return: the set of pks of the calculations whose files were retrieved;
+        the others have to be retrieved file by file.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not to_retrieve:
+        return set()
+
+    # The transport logger is set for a specific calculation
+    transport._set_logger_extra(None)
+
+    max_workers = max(1, _get_profile_setting('DAEMON_RETRIEVE_CONCURRENCY',
+                                              DAEMON_RETRIEVE_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(calc, executor.submit(_retrieve_with_tar, transport,
+                                          workdir, retrieve_list,
+                                          folder_abspath))
+                   for calc, workdir, retrieve_list, folder_abspath
+                   in to_retrieve]
+
+    retrieved_pks = set()
+    for calc, future in futures:
+        e = future.exception()
+        if e is None:
+            retrieved_pks.add(calc.pk)
+        else:
+            execlogger.warning("[retrieval of calc {}] Unable to retrieve "
+                               "the files with tar, retrieving them one by "
+                               "one ({}: {})".format(
+                calc.pk, e.__class__.__name__, e))
+    return retrieved_pks
+
+
+def retrieve_computed_for_authinfo(authinfo):
+    from aiida.orm import JobCalculation
+    from aiida.utils.logger import get_dblogger_extra
+
+    from aiida.backends.utils import QueryFactory
 
     if not authinfo.enabled:
         return
@@ -684,193 +1487,502 @@ def retrieve_computed_for_authinfo(authinfo):
     # calcs with state not COMPUTED
     if len(calcs_to_retrieve):
 
-        # Open connection
-        with authinfo.get_transport() as t:
-            for calc in calcs_to_retrieve:
-                logger_extra = get_dblogger_extra(calc)
-                t._set_logger_extra(logger_extra)
+        # Reuse the open connection to the computer, if any
+        with get_transport_pool().borrow(authinfo) as t:
+            retrieving_pks = set(JobCalculation._set_state_bulk(
+                [calc.pk for calc in calcs_to_retrieve],
+                calc_states.RETRIEVING))
+            # No one else retrieves the calculations that are now in the
+            # RETRIEVING state: the ones not dealt with when this function
+            # stops are set to RETRIEVALFAILED
+            not_done = {calc.pk: calc for calc in calcs_to_retrieve
+                        if calc.pk in retrieving_pks}
+            try:
+                _retrieve_calcs(t, calcs_to_retrieve, retrieving_pks,
+                                not_done, retrieved)
+            finally:
+                for calc in not_done.itervalues():
+                    execlogger.error("The retrieval of calc {} was "
+                                     "interrupted".format(calc.pk),
+                                     extra=get_dblogger_extra(calc))
+                    try:
+                        calc._set_state(calc_states.RETRIEVALFAILED)
+                    except ModificationNotAllowed:
+                        pass
 
-                try:
-                    calc._set_state(calc_states.RETRIEVING)
-                except ModificationNotAllowed:
-                    # Someone else has already started to retrieve it,
-                    # just log and continue
-                    execlogger.debug("Attempting to retrieve more than once "
-                                     "calculation {}: skipping!".format(calc.pk),
-                                     extra=logger_extra)
-                    continue  # with the next calculation to retrieve
-                try:
-                    execlogger.debug("Retrieving calc {}".format(calc.pk),
-                                     extra=logger_extra)
-                    workdir = calc._get_remote_workdir()
-                    retrieve_list = calc._get_retrieve_list()
-                    retrieve_singlefile_list = calc._get_retrieve_singlefile_list()
-                    execlogger.debug("[retrieval of calc {}] "
-                                     "chdir {}".format(calc.pk, workdir),
-                                     extra=logger_extra)
-                    t.chdir(workdir)
+    return retrieved
 
-                    retrieved_files = FolderData()
-                    retrieved_files.add_link_from(
-                        calc, label=calc._get_linkname_retrieved(),
-                        link_type=LinkType.CREATE)
 
-                    # First, retrieve the files of folderdata
-                    with SandboxFolder() as folder:
-                        for item in retrieve_list:
-                            # I have two possibilities:
-                            # * item is a string
-                            # * or is a list
-                            # then I have other two possibilities:
-                            # * there are file patterns
-                            # * or not
-                            # First decide the name of the files
-                            if isinstance(item, list):
-                                tmp_rname, tmp_lname, depth = item
-                                # if there are more than one file I do something differently
-                                if t.has_magic(tmp_rname):
-                                    remote_names = t.glob(tmp_rname)
-                                    local_names = []
-                                    for rem in remote_names:
-                                        to_append = rem.split(os.path.sep)[-depth:] if depth > 0 else []
-                                        local_names.append(os.path.sep.join([tmp_lname] + to_append))
-                                else:
-                                    remote_names = [tmp_rname]
-                                    to_append = remote_names.split(os.path.sep)[-depth:] if depth > 0 else []
-                                    local_names = [os.path.sep.join([tmp_lname] + to_append)]
-                                if depth > 1:  # create directories in the folder, if needed
-                                    for this_local_file in local_names:
-                                        new_folder = os.path.join(
-                                            folder.abspath,
-                                            os.path.split(this_local_file)[0])
-                                        if not os.path.exists(new_folder):
-                                            os.makedirs(new_folder)
-                            else:  # it is a string
-                                if t.has_magic(item):
-                                    remote_names = t.glob(item)
-                                    local_names = [os.path.split(rem)[1] for rem in remote_names]
-                                else:
-                                    remote_names = [item]
-                                    local_names = [os.path.split(item)[1]]
-
-                            for rem, loc in zip(remote_names, local_names):
-                                execlogger.debug("[retrieval of calc {}] "
-                                                 "Trying to retrieve remote item '{}'".format(
-                                    calc.pk, rem),
-                                                 extra=logger_extra)
-                                t.get(rem,
-                                      os.path.join(folder.abspath, loc),
-                                      ignore_nonexisting=True)
-
-                        # Here I retrieved everything;
-                        # now I store them inside the calculation
-                        retrieved_files.replace_with_folder(folder.abspath,
-                                                            overwrite=True)
-
-                    # Second, retrieve the singlefiles
-                    with SandboxFolder() as folder:
-                        singlefile_list = []
-                        for (linkname, subclassname, filename) in retrieve_singlefile_list:
-                            execlogger.debug("[retrieval of calc {}] Trying "
-                                             "to retrieve remote singlefile '{}'".format(
-                                calc.pk, filename),
-                                             extra=logger_extra)
-                            localfilename = os.path.join(
-                                folder.abspath, os.path.split(filename)[1])
-                            t.get(filename, localfilename,
-                                  ignore_nonexisting=True)
-                            singlefile_list.append((linkname, subclassname,
-                                                    localfilename))
-
-                        # ignore files that have not been retrieved
-                        singlefile_list = [i for i in singlefile_list if
-                                           os.path.exists(i[2])]
-
-                        # after retrieving from the cluster, I create the objects
-                        singlefiles = []
-                        for (linkname, subclassname, filename) in singlefile_list:
-                            SinglefileSubclass = DataFactory(subclassname)
-                            singlefile = SinglefileSubclass()
-                            singlefile.set_file(filename)
-                            singlefile.add_link_from(calc, label=linkname,
-                                                     link_type=LinkType.CREATE)
-                            singlefiles.append(singlefile)
-
-                    # Finally, store
-                    execlogger.debug("[retrieval of calc {}] "
-                                     "Storing retrieved_files={}".format(
-                        calc.pk, retrieved_files.dbnode.pk),
-                                     extra=logger_extra)
-                    retrieved_files.store()
-                    for fil in singlefiles:
+def _set_retrieval_failed(calc, logger_extra):
+    """
+    Log the exception being handled, and set the calculation to
+    RETRIEVALFAILED.
+    """
+    import traceback
+
+    tb = traceback.format_exc()
+    newextradict = logger_extra.copy()
+    newextradict['full_traceback'] = tb
+    execlogger.error("Error retrieving calc {}. "
+                     "Traceback: {}".format(calc.pk, tb),
+                     extra=newextradict)
+    try:
+        calc._set_state(calc_states.RETRIEVALFAILED)
+    except ModificationNotAllowed:
+        pass
+
+
+def _retrieve_calcs(t, calcs_to_retrieve, retrieving_pks, not_done,
+                    retrieved):
+    """
+    Retrieve the files of the calculations in the RETRIEVING state, and set
+    them to PARSING (or to RETRIEVALFAILED, if their retrieval fails).
+
+    :param t: the open transport
+    :param calcs_to_retrieve: the calculations that were COMPUTED
+    :param retrieving_pks: the pks of the calculations set to RETRIEVING
+        by this daemon
+    :param not_done: a dictionary {pk: calc} from which the calculations are
+        removed once they are either retrieved or RETRIEVALFAILED
+    :param retrieved: the list to which the retrieved calculations are
+        appended
+    """
+    from aiida.common.folders import SandboxFolder
+    from aiida.orm.data.folder import FolderData
+    from aiida.utils.logger import get_dblogger_extra
+    from aiida.orm import DataFactory
+
+    import os
+
+    # The calculations that this daemon is retrieving, with the
+    # FolderData nodes where the files are retrieved
+    calcs_retrieved_files = []
+    for calc in calcs_to_retrieve:
+        logger_extra = get_dblogger_extra(calc)
+
+        if calc.pk not in retrieving_pks:
+            # Someone else has already started to retrieve it,
+            # just log and continue
+            execlogger.debug("Attempting to retrieve more than once "
+                             "calculation {}: skipping!".format(calc.pk),
+                             extra=logger_extra)
+            continue  # with the next calculation to retrieve
+
+        try:
+            retrieved_files = FolderData()
+            retrieved_files.add_link_from(
+                calc, label=calc._get_linkname_retrieved(),
+                link_type=LinkType.CREATE)
+            # The files are retrieved directly in the repository
+            # folder of the node
+            retrieved_folder = retrieved_files._get_folder_pathsubfolder
+            retrieved_folder.create()
+        except Exception:
+            _set_retrieval_failed(calc, logger_extra)
+            del not_done[calc.pk]
+            continue
+        calcs_retrieved_files.append(
+            (calc, retrieved_files, retrieved_folder))
+
+    # First, transfer the files of folderdata as tar streams, for
+    # several calculations at the same time
+    retrieved_with_tar = set()
+    if _get_profile_setting('DAEMON_RETRIEVE_WITH_TAR',
+                            DAEMON_RETRIEVE_WITH_TAR):
+        try:
+            retrieved_with_tar = _retrieve_calcs_with_tar(
+                t, [(calc, calc._get_remote_workdir(),
+                     calc._get_retrieve_list(), retrieved_folder.abspath)
+                    for calc, _, retrieved_folder in calcs_retrieved_files])
+        except Exception as e:
+            # The files are then retrieved one by one
+            execlogger.warning("Unable to retrieve the files with tar, "
+                               "retrieving them one by one ({}: {})".format(
+                e.__class__.__name__, e))
+
+    for calc, retrieved_files, retrieved_folder in calcs_retrieved_files:
+        logger_extra = get_dblogger_extra(calc)
+        t._set_logger_extra(logger_extra)
+
+        try:
+            execlogger.debug("Retrieving calc {}".format(calc.pk),
+                             extra=logger_extra)
+            workdir = calc._get_remote_workdir()
+            retrieve_list = calc._get_retrieve_list()
+            retrieve_singlefile_list = calc._get_retrieve_singlefile_list()
+            execlogger.debug("[retrieval of calc {}] "
+                             "chdir {}".format(calc.pk, workdir),
+                             extra=logger_extra)
+            t.chdir(workdir)
+
+            # Retrieve the files of folderdata, if not done already
+            if calc.pk not in retrieved_with_tar:
+                for item in retrieve_list:
+                    # I have two possibilities:
+                    # * item is a string
+                    # * or is a list
+                    # then I have other two possibilities:
+                    # * there are file patterns
+                    # * or not
+                    # First decide the name of the files
+                    if isinstance(item, list):
+                        tmp_rname, tmp_lname, depth = item
+                        # if there are more than one file I do something differently
+                        if t.has_magic(tmp_rname):
+                            remote_names = t.glob(tmp_rname)
+                            local_names = []
+                            for rem in remote_names:
+                                to_append = rem.split(os.path.sep)[-depth:] if depth > 0 else []
+                                local_names.append(os.path.sep.join([tmp_lname] + to_append))
+                        else:
+                            remote_names = [tmp_rname]
+                            to_append = tmp_rname.split(os.path.sep)[-depth:] if depth > 0 else []
+                            local_names = [os.path.sep.join([tmp_lname] + to_append)]
+                        if depth > 1:  # create directories in the folder, if needed
+                            for this_local_file in local_names:
+                                new_folder = os.path.join(
+                                    retrieved_folder.abspath,
+                                    os.path.split(this_local_file)[0])
+                                if not os.path.exists(new_folder):
+                                    os.makedirs(new_folder)
+                    else:  # it is a string
+                        if t.has_magic(item):
+                            remote_names = t.glob(item)
+                            local_names = [os.path.split(rem)[1] for rem in remote_names]
+                        else:
+                            remote_names = [item]
+                            local_names = [os.path.split(item)[1]]
+
+                    for rem, loc in zip(remote_names, local_names):
                         execlogger.debug("[retrieval of calc {}] "
-                                         "Storing retrieved_singlefile={}".format(
-                            calc.pk, fil.dbnode.pk),
+                                         "Trying to retrieve remote item '{}'".format(
+                            calc.pk, rem),
                                          extra=logger_extra)
-                        fil.store()
-
-                    # If I was the one retrieving, I should also be the only
-                    # one parsing! I do not check
-                    calc._set_state(calc_states.PARSING)
-
-                    Parser = calc.get_parserclass()
-                    # If no parser is set, the calculation is successful
-                    successful = True
-                    if Parser is not None:
-                        # TODO: parse here
-                        parser = Parser(calc)
-                        successful, new_nodes_tuple = parser.parse_from_calc()
-
-                        for label, n in new_nodes_tuple:
-                            n.add_link_from(calc, label=label,
-                                            link_type=LinkType.CREATE)
-                            n.store()
-
-                    if successful:
-                        try:
-                            calc._set_state(calc_states.FINISHED)
-                        except ModificationNotAllowed:
-                            # I should have been the only one to set it, but
-                            # in order to avoid unuseful error messages, I
-                            # just ignore
-                            pass
-                    else:
-                        try:
-                            calc._set_state(calc_states.FAILED)
-                        except ModificationNotAllowed:
-                            # I should have been the only one to set it, but
-                            # in order to avoid unuseful error messages, I
-                            # just ignore
-                            pass
-                        execlogger.error("[parsing of calc {}] "
-                                         "The parser returned an error, but it should have "
-                                         "created an output node with some partial results "
-                                         "and warnings. Check there for more information on "
-                                         "the problem".format(calc.pk), extra=logger_extra)
-                    retrieved.append(calc)
-                except Exception:
-                    import traceback
-
-                    tb = traceback.format_exc()
-                    newextradict = logger_extra.copy()
-                    newextradict['full_traceback'] = tb
-                    if calc.get_state() == calc_states.PARSING:
-                        execlogger.error("Error parsing calc {}. "
-                                         "Traceback: {}".format(calc.pk, tb),
-                                         extra=newextradict)
-                        # TODO: add a 'comment' to the calculation
-                        try:
-                            calc._set_state(calc_states.PARSINGFAILED)
-                        except ModificationNotAllowed:
-                            pass
-                    else:
-                        execlogger.error("Error retrieving calc {}. "
-                                         "Traceback: {}".format(calc.pk, tb),
-                                         extra=newextradict)
-                        try:
-                            calc._set_state(calc_states.RETRIEVALFAILED)
-                        except ModificationNotAllowed:
-                            pass
-                        raise
+                        t.get(rem,
+                              os.path.join(retrieved_folder.abspath,
+                                           loc),
+                              ignore_nonexisting=True)
+
+            # Second, retrieve the singlefiles
+            with SandboxFolder() as folder:
+                singlefile_list = []
+                for (linkname, subclassname, filename) in retrieve_singlefile_list:
+                    execlogger.debug("[retrieval of calc {}] Trying "
+                                     "to retrieve remote singlefile '{}'".format(
+                        calc.pk, filename),
+                                     extra=logger_extra)
+                    localfilename = os.path.join(
+                        folder.abspath, os.path.split(filename)[1])
+                    t.get(filename, localfilename,
+                          ignore_nonexisting=True)
+                    singlefile_list.append((linkname, subclassname,
+                                            localfilename))
+
+                # ignore files that have not been retrieved
+                singlefile_list = [i for i in singlefile_list if
+                                   os.path.exists(i[2])]
+
+                # after retrieving from the cluster, I create the objects
+                singlefiles = []
+                for (linkname, subclassname, filename) in singlefile_list:
+                    SinglefileSubclass = DataFactory(subclassname)
+                    singlefile = SinglefileSubclass()
+                    singlefile.set_file(filename)
+                    singlefile.add_link_from(calc, label=linkname,
+                                             link_type=LinkType.CREATE)
+                    singlefiles.append(singlefile)
+
+            # Finally, store
+            execlogger.debug("[retrieval of calc {}] "
+                             "Storing retrieved_files={}".format(
+                calc.pk, retrieved_files.dbnode.pk),
+                             extra=logger_extra)
+            retrieved_files.store()
+            for fil in singlefiles:
+                execlogger.debug("[retrieval of calc {}] "
+                                 "Storing retrieved_singlefile={}".format(
+                    calc.pk, fil.dbnode.pk),
+                                 extra=logger_extra)
+                fil.store()
 
-    return retrieved
+            # The parsing itself is done by the parser stage, without
+            # keeping the connection open
+            calc._set_state(calc_states.PARSING)
+            retrieved.append(calc)
+        except Exception:
+            # Go on with the other calculations
+            _set_retrieval_failed(calc, logger_extra)
+        del not_done[calc.pk]
+
+
+def parse_calc(calc):
+    """
+    Run the parser of a calculation in the PARSING state, store the output
+    nodes and set the state to FINISHED, FAILED or PARSINGFAILED.
+
+    :return: True if the calculation is FINISHED, False otherwise
+    """
+    from aiida.utils.logger import get_dblogger_extra
+
+    logger_extra = get_dblogger_extra(calc)
+    try:
+        Parser = calc.get_parserclass()
+        # If no parser is set, the calculation is successful
+        successful = True
+        if Parser is not None:
+            parser = Parser(calc)
+            successful, new_nodes_tuple = parser.parse_from_calc()
+
+            for label, n in new_nodes_tuple:
+                n.add_link_from(calc, label=label,
+                                link_type=LinkType.CREATE)
+                n.store()
+
+        if successful:
+            try:
+                calc._set_state(calc_states.FINISHED)
+            except ModificationNotAllowed:
+                # I should have been the only one to set it, but
+                # in order to avoid unuseful error messages, I
+                # just ignore
+                pass
+        else:
+            try:
+                calc._set_state(calc_states.FAILED)
+            except ModificationNotAllowed:
+                # I should have been the only one to set it, but
+                # in order to avoid unuseful error messages, I
+                # just ignore
+                pass
+            execlogger.error("[parsing of calc {}] "
+                             "The parser returned an error, but it should have "
+                             "created an output node with some partial results "
+                             "and warnings. Check there for more information on "
+                             "the problem".format(calc.pk), extra=logger_extra)
+        return successful
+    except Exception:
+        import traceback
+
+        tb = traceback.format_exc()
+        newextradict = logger_extra.copy()
+        newextradict['full_traceback'] = tb
+        execlogger.error("Error parsing calc {}. "
+                         "Traceback: {}".format(calc.pk, tb),
+                         extra=newextradict)
+        # TODO: add a 'comment' to the calculation
+        try:
+            calc._set_state(calc_states.PARSINGFAILED)
+        except ModificationNotAllowed:
+            pass
+        return False
+
+
+def _claim_and_parse_calc(calc, owner=None, timeout=None):
+    """
+    Parse a calculation, unless someone else is already parsing it (e.g. the
+    daemon and a manual tick) or it is not in the PARSING state anymore.
+
+    :param owner: the owner of the lock taken on the calculation while
+        parsing it, by default its key
+    :param timeout: the timeout of the lock, by default DAEMON_PARSER_TIMEOUT
+    :return: the result of parse_calc, or None if the calculation was not
+        parsed
+    """
+    from aiida.common.exceptions import LockPresent
+    from aiida.orm.lock import LockManager
+
+    key = _get_parsing_lock_key(calc.pk)
+    if owner is None:
+        owner = key
+    if timeout is None:
+        timeout = _get_profile_setting('DAEMON_PARSER_TIMEOUT',
+                                       DAEMON_PARSER_TIMEOUT)
+    lock_manager = LockManager()
+    try:
+        try:
+            lock = lock_manager.aquire(key, timeout=timeout, owner=owner)
+        except InternalError:
+            # The lock of a parser that died: take it over
+            execlogger.warning("The parsing of calc {} did not end within "
+                               "the timeout: parsing it again".format(
+                calc.pk))
+            lock_manager.clear(key, expired_only=True)
+            lock = lock_manager.aquire(key, timeout=timeout, owner=owner)
+    except LockPresent:
+        execlogger.debug("Calc {} is being parsed by someone else: "
+                         "skipping!".format(calc.pk))
+        return None
+
+    try:
+        # Checked only now, as the parsing may have just ended
+        if calc.get_state() != calc_states.PARSING:
+            return None
+        return parse_calc(calc)
+    finally:
+        lock.release(owner=owner)
+
+
+def _get_parsing_lock_key(pk):
+    return 'parse_calc_{}'.format(pk)
+
+
+@_instrumented_stage('parse_calc')
+def _parse_calc_in_worker(pk, owner, timeout):
+    """
+    Load and parse a calculation; this runs in a process of the parser pool,
+    that opens its own database connection. The time it takes is recorded
+    as the phase 'parse_calc', the one of the parser stage only covering
+    the dispatch to the pool.
+    """
+    return _claim_and_parse_calc(load_node(pk), owner=owner, timeout=timeout)
+
+
+def _release_db_connection():
+    """
+    Close the database connection of this process (it is reopened on the
+    next query), so that it is not inherited by forked processes, that would
+    otherwise share the same socket.
+    """
+    from aiida.backends import settings
+    from aiida.backends.profile import BACKEND_DJANGO
+
+    if settings.BACKEND == BACKEND_DJANGO:
+        from django.db import connection
+        connection.close()
+    else:
+        import aiida.backends.sqlalchemy as sa
+        if sa.session is not None:
+            sa.session.close()
+            # The engine keeps the connections in its pool
+            dispose = getattr(sa.session.bind, 'dispose', None)
+            if dispose is not None:
+                dispose()
+
+
+def _get_parser_pool(processes):
+    """
+    Return the pool of processes parsing the calculations (created on first
+    use).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    global _parser_pool
+
+    if _parser_pool is None:
+        _parser_pool = ProcessPoolExecutor(max_workers=processes)
+    return _parser_pool
+
+
+def _shutdown_parser_pool():
+    global _parser_pool
+
+    if _parser_pool is not None:
+        _parser_pool.shutdown(wait=False)
+        _parser_pool = None
+    _parsing_calcs.clear()
+
+
+def _forget_parsed_calcs():
+    """
+    Remove from _parsing_calcs the calculations whose parsing is over, or
+    whose parser holds an expired lock (e.g. because the process of the
+    pool parsing them died). In both cases, the lock on the calculation is
+    released if the parser still holds it, so that the calculation is parsed
+    again at the next call.
+    """
+    from aiida.orm.lock import LockManager
+
+    lock_manager = LockManager()
+    lost = False
+    for pk, (future, owner) in _parsing_calcs.items():
+        key = _get_parsing_lock_key(pk)
+        if future.done():
+            del _parsing_calcs[pk]
+            e = future.exception()
+            if e is not None:
+                execlogger.error("Unexpected error in the parser pool for "
+                                 "calc {}, error type is {}, error message: "
+                                 "{}".format(pk, e.__class__.__name__,
+                                             e.message))
+                lock_manager.clear(key, owner=owner)
+        elif lock_manager.clear(key, expired_only=True, owner=owner):
+            del _parsing_calcs[pk]
+            execlogger.error("The parsing of calc {} did not end within the "
+                             "timeout: giving up on it".format(pk))
+            lost = True
+
+    if lost:
+        # The process parsing it may be dead or stuck: start again with a
+        # new pool
+        _shutdown_parser_pool()
+
+
+@_instrumented_stage(PARSE)
+def parse_jobs(wait=False):
+    """
+    Parse all the calculations in the PARSING state.
+
+    Unless DAEMON_PARSER_PROCESSES is 0, the calculations are dispatched to a
+    pool of processes, so that the parsing (CPU bound) scales with the number
+    of cores and does not delay the other stages: the call returns without
+    waiting for the parsers, and a calculation still being parsed since a
+    previous call is not dispatched again.
+    Each calculation is locked while being parsed, so that it is parsed only
+    once also when parse_jobs is called by more processes.
+
+    :param wait: if True, return only when the calculations dispatched by
+        this call are parsed
+    """
+    import uuid
+    from concurrent.futures import wait as wait_futures
+    from aiida.backends.utils import QueryFactory
+
+    timeout = _get_profile_setting('DAEMON_PARSER_TIMEOUT',
+                                   DAEMON_PARSER_TIMEOUT)
+    # Done before the query, so that the calculations parsed in the
+    # meantime are not dispatched again
+    _forget_parsed_calcs()
+
+    qmanager = QueryFactory()()
+    calcs_to_parse = qmanager.query_jobcalculations_by_computer_user_state(
+        state=calc_states.PARSING,
+        only_enabled=False)
+
+    calcs_to_parse = [calc for calc in calcs_to_parse
+                      if calc.pk not in _parsing_calcs]
+    if not calcs_to_parse:
+        return
+
+    processes = _get_profile_setting('DAEMON_PARSER_PROCESSES',
+                                     DAEMON_PARSER_PROCESSES)
+    if processes == 0:
+        for calc in calcs_to_parse:
+            _claim_and_parse_calc(calc, timeout=timeout)
+        return
+
+    pks_to_parse = [calc.pk for calc in calcs_to_parse]
+    new_pool = _parser_pool is None
+    pool = _get_parser_pool(processes)
+    if new_pool:
+        # The processes of the pool are forked at the first submission
+        _release_db_connection()
+
+    dispatched = []
+    for pk in pks_to_parse:
+        # Unique, so that the lock can be released here if the parser fails
+        owner = 'parser_{}'.format(uuid.uuid4().hex)
+        try:
+            future = pool.submit(_parse_calc_in_worker, pk, owner, timeout)
+        except Exception as e:
+            # e.g. a process of the pool died: start again with a new pool
+            # at the next call
+            execlogger.error("Unable to dispatch calc {} to the parser pool, "
+                             "error type is {}, error message: {}".format(
+                pk, e.__class__.__name__, e.message))
+            _shutdown_parser_pool()
+            return
+        _parsing_calcs[pk] = (future, owner)
+        dispatched.append(future)
+
+    if wait:
+        wait_futures(dispatched, timeout=timeout)
+        _forget_parsed_calcs()
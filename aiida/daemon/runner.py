@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+An event-driven loop running all the stages of the daemon.
+
+Rather than running every stage (submission, scheduler update, retrieval,
+parsing, workflow stepping) on a fixed timer, the runner watches the
+DbCalcState table, that gets a new row every time a calculation changes state,
+and wakes up the stages that can make progress as soon as a relevant state is
+entered.
+Each stage is anyway run also after its fallback interval has elapsed, which
+is in particular the only trigger for the scheduler update (a job finishing on
+the cluster does not leave any trace in the database).
+"""
+import time
+
+from aiida.common import aiidalogger
+from aiida.common.datastructures import calc_states
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+runnerlogger = aiidalogger.getChild('daemonrunner')
+
+# The names of the stages, in the order in which they are run within a cycle
+# (so that a calculation can go through more stages in a single cycle)
+SUBMIT = 'submitter'
+UPDATE = 'updater'
+RETRIEVE = 'retriever'
+PARSE = 'parser'
+WORKFLOW = 'workflow'
+TICK_WORK = 'tick_work'
+
+STAGES = (SUBMIT, UPDATE, RETRIEVE, PARSE, WORKFLOW, TICK_WORK)
+
+# For each calculation state, the stages that should be woken up when a
+# calculation enters that state
+_TERMINAL_STAGES = (WORKFLOW, TICK_WORK)
+STAGE_TRIGGERS = {
+    calc_states.TOSUBMIT: (SUBMIT,),
+    calc_states.COMPUTED: (RETRIEVE,),
+    calc_states.PARSING: (PARSE,),
+    calc_states.FINISHED: _TERMINAL_STAGES,
+    calc_states.FAILED: _TERMINAL_STAGES,
+    calc_states.SUBMISSIONFAILED: _TERMINAL_STAGES,
+    calc_states.RETRIEVALFAILED: _TERMINAL_STAGES,
+    calc_states.PARSINGFAILED: _TERMINAL_STAGES,
+}
+
+# Default values (in seconds), can be overridden in the profile configuration
+DEFAULT_POLL_INTERVAL = 2
+DEFAULT_FALLBACK_INTERVAL = 30
+
+
+def _submitter():
+    from aiida.daemon.execmanager import submit_jobs
+    from aiida.daemon.timestamps import set_daemon_timestamp
+    set_daemon_timestamp(task_name='submitter', when='start')
+    submit_jobs()
+    set_daemon_timestamp(task_name='submitter', when='stop')
+
+
+def _updater():
+    from aiida.daemon.execmanager import update_jobs
+    from aiida.daemon.timestamps import set_daemon_timestamp
+    set_daemon_timestamp(task_name='updater', when='start')
+    update_jobs()
+    set_daemon_timestamp(task_name='updater', when='stop')
+
+
+def _retriever():
+    from aiida.daemon.execmanager import retrieve_jobs
+    from aiida.daemon.timestamps import set_daemon_timestamp
+    set_daemon_timestamp(task_name='retriever', when='start')
+    retrieve_jobs()
+    set_daemon_timestamp(task_name='retriever', when='stop')
+
+
+def _parser():
+    from aiida.daemon.execmanager import parse_jobs
+    from aiida.daemon.timestamps import set_daemon_timestamp
+    set_daemon_timestamp(task_name='parser', when='start')
+    parse_jobs()
+    set_daemon_timestamp(task_name='parser', when='stop')
+
+
+def _workflow_stepper():
+    from aiida.daemon.workflowmanager import execute_steps
+    from aiida.daemon.timestamps import set_daemon_timestamp
+    set_daemon_timestamp(task_name='workflow', when='start')
+    execute_steps()
+    set_daemon_timestamp(task_name='workflow', when='stop')
+
+
+def _tick_work():
+    from aiida.work.daemon import tick_daemon_workflow_engine
+    tick_daemon_workflow_engine()
+
+
+_STAGE_FUNCTIONS = {
+    SUBMIT: _submitter,
+    UPDATE: _updater,
+    RETRIEVE: _retriever,
+    PARSE: _parser,
+    WORKFLOW: _workflow_stepper,
+    TICK_WORK: _tick_work,
+}
+
+
+class DaemonRunner(object):
+    """
+    Run the daemon stages, each one as soon as a calculation enters a state
+    that it can act upon, or at the latest after its fallback interval.
+
+    A runner keeps track of the last DbCalcState row it has seen. A new runner
+    (or one that has just been created in a new process) considers all stages
+    as due, so that no state change is missed while no runner was active.
+    """
+
+    def __init__(self, fallback_intervals=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        :param fallback_intervals: a dictionary with the maximum time (in
+            seconds) between two runs of each stage, even if no relevant
+            state change was detected. Stages not in the dictionary use
+            DEFAULT_FALLBACK_INTERVAL.
+        :param poll_interval: the time (in seconds) to wait between two checks
+            of the DbCalcState table.
+        """
+        from aiida.backends.utils import QueryFactory
+
+        self._qmanager = QueryFactory()()
+        self._fallback_intervals = {
+            stage: DEFAULT_FALLBACK_INTERVAL for stage in STAGES}
+        if fallback_intervals is not None:
+            self._fallback_intervals.update(fallback_intervals)
+        self._poll_interval = poll_interval
+
+        self._last_state_id = None
+        self._last_run = {}
+        self._pending = set(STAGES)
+
+    @property
+    def poll_interval(self):
+        return self._poll_interval
+
+    def notify(self, *stages):
+        """
+        Mark the given stages as to be run in the next cycle.
+        """
+        for stage in stages:
+            if stage not in _STAGE_FUNCTIONS:
+                raise ValueError("Unknown daemon stage '{}'".format(stage))
+            self._pending.add(stage)
+
+    def _collect_state_changes(self):
+        """
+        Look for new rows in the DbCalcState table and mark as pending the
+        stages that are interested in the newly entered states.
+        """
+        last_id, states = self._qmanager.get_calc_state_changes(
+            since_id=self._last_state_id)
+        self._last_state_id = last_id
+        for state in states:
+            self._pending.update(STAGE_TRIGGERS.get(state, ()))
+
+    def _collect_expired(self, now):
+        for stage in STAGES:
+            last_run = self._last_run.get(stage)
+            if (last_run is None or
+                    now - last_run >= self._fallback_intervals[stage]):
+                self._pending.add(stage)
+
+    def run_once(self):
+        """
+        Run a single cycle: run, in order, all stages that either were
+        triggered by a state change or whose fallback interval has elapsed.
+
+        :return: the list of stages that were run
+        """
+        self._collect_state_changes()
+        self._collect_expired(time.time())
+
+        ran = []
+        for stage in STAGES:
+            if stage not in self._pending:
+                continue
+            self._pending.discard(stage)
+            self._last_run[stage] = time.time()
+            runnerlogger.debug("Running daemon stage '{}'".format(stage))
+            try:
+                _STAGE_FUNCTIONS[stage]()
+            except Exception as e:
+                import traceback
+                runnerlogger.error(
+                    "Error while running the daemon stage '{}', "
+                    "error type is {}, traceback: {}".format(
+                        stage, e.__class__.__name__, traceback.format_exc()))
+            ran.append(stage)
+            # Pick up the states entered by this stage, so that the following
+            # stages of this same cycle can act on them
+            self._collect_state_changes()
+
+        return ran
+
+    def run(self, duration=None):
+        """
+        Run cycles until the given duration (in seconds) has elapsed, or
+        forever if duration is None.
+        """
+        start = time.time()
+        while True:
+            self.run_once()
+            if (duration is not None and
+                    time.time() - start + self._poll_interval > duration):
+                break
+            time.sleep(self._poll_interval)
@@ -21,8 +21,15 @@ from aiida.daemon.timestamps import set_daemon_timestamp,get_last_daemon_timesta
 DAEMON_INTERVALS_SUBMIT = 30
 DAEMON_INTERVALS_RETRIEVE = 30
 DAEMON_INTERVALS_UPDATE = 30
+DAEMON_INTERVALS_PARSE = 30
 DAEMON_INTERVALS_WFSTEP = 30
 DAEMON_INTERVALS_TICK_WORKFLOWS = 30
+# Used only by the event-driven runner: how often the DbCalcState table is
+# checked for state changes, and how long each run of the runner task lasts
+DAEMON_INTERVALS_EVENTS = 2
+DAEMON_INTERVALS_RUNNER = 60
+# If True, a single event-driven runner replaces the periodic tasks below
+DAEMON_EVENT_DRIVEN = False
 
 config = get_profile_config(settings.AIIDADB_PROFILE)
 
@@ -53,11 +60,6 @@ app = Celery('tasks', broker=broker)
 # the tasks as taken from the djsite.db.tasks, same tasks and same functionalities
 # will now of course fail because set_daemon_timestep has not be implementd for SA
 
-@periodic_task(
-    run_every=timedelta(
-        seconds=config.get("DAEMON_INTERVALS_SUBMIT", DAEMON_INTERVALS_SUBMIT)
-    )
-)
 def submitter():
     from aiida.daemon.execmanager import submit_jobs
     print "aiida.daemon.tasks.submitter:  Checking for calculations to submit"
@@ -66,11 +68,6 @@ def submitter():
     set_daemon_timestamp(task_name='submitter', when='stop')
 
 
-@periodic_task(
-    run_every=timedelta(
-        seconds=config.get("DAEMON_INTERVALS_UPDATE", DAEMON_INTERVALS_UPDATE)
-    )
-)
 def updater():
     from aiida.daemon.execmanager import update_jobs
     print "aiida.daemon.tasks.update:  Checking for calculations to update"
@@ -79,12 +76,6 @@ def updater():
     set_daemon_timestamp(task_name='updater', when='stop')
 
 
-@periodic_task(
-    run_every=timedelta(
-        seconds=config.get("DAEMON_INTERVALS_RETRIEVE",
-                           DAEMON_INTERVALS_RETRIEVE)
-    )
-)
 def retriever():
     from aiida.daemon.execmanager import retrieve_jobs
     print "aiida.daemon.tasks.retrieve:  Checking for calculations to retrieve"
@@ -93,22 +84,19 @@ def retriever():
     set_daemon_timestamp(task_name='retriever', when='stop')
 
 
-@periodic_task(
-    run_every=timedelta(
-        seconds=config.get("DAEMON_INTERVALS_TICK_WORKFLOWS",
-                           DAEMON_INTERVALS_TICK_WORKFLOWS)
-    )
-)
+def parser():
+    from aiida.daemon.execmanager import parse_jobs
+    print "aiida.daemon.tasks.parser:  Checking for calculations to parse"
+    set_daemon_timestamp(task_name='parser', when='start')
+    parse_jobs()
+    set_daemon_timestamp(task_name='parser', when='stop')
+
+
 def tick_work():
-    from aiida.work.daemon import tick_workflow_engine
+    from aiida.work.daemon import tick_daemon_workflow_engine
     print "aiida.daemon.tasks.tick_workflows:  Ticking workflows"
-    tick_workflow_engine()
+    tick_daemon_workflow_engine()
 
-@periodic_task(run_every=timedelta(seconds=config.get("DAEMON_INTERVALS_WFSTEP",
-                                                      DAEMON_INTERVALS_WFSTEP
-                                                      )
-                                   )
-               )
 def workflow_stepper(): # daemon for legacy workflow 
     from aiida.daemon.workflowmanager import execute_steps
     print "aiida.daemon.tasks.workflowmanager:  Checking for workflows to manage"
@@ -130,14 +118,105 @@ def workflow_stepper(): # daemon for legacy workflow
         set_daemon_timestamp(task_name='workflow', when='stop')
     else:
         print "aiida.daemon.tasks.workflowmanager: execute_steps already running"
-       
+
+
+# The runner is kept at module level, so that it survives between two
+# executions of the task in the same worker process
+_runner = None
+
+
+def runner():
+    from aiida.common.exceptions import InternalError, LockPresent
+    from aiida.orm.lock import LockManager
+    from aiida.daemon.runner import (
+        DaemonRunner, SUBMIT, UPDATE, RETRIEVE, PARSE, WORKFLOW, TICK_WORK)
+    global _runner
+
+    duration = config.get("DAEMON_INTERVALS_RUNNER", DAEMON_INTERVALS_RUNNER)
+    # Only one runner at a time: if the previous execution of this task is
+    # still going on, just skip this one
+    lock_manager = LockManager()
+    try:
+        try:
+            lock = lock_manager.aquire('daemon_runner', timeout=2 * duration,
+                                       owner='daemon_runner')
+        except InternalError:
+            # The lock expired: its runner died without releasing it, or is
+            # still running a very long stage. The stages claim the
+            # calculations they act upon, so the lock is taken over.
+            print ("aiida.daemon.tasks.runner: taking over the expired lock "
+                   "of the runner")
+            lock_manager.clear('daemon_runner', expired_only=True)
+            lock = lock_manager.aquire('daemon_runner', timeout=2 * duration,
+                                       owner='daemon_runner')
+    except LockPresent:
+        print "aiida.daemon.tasks.runner: runner already running"
+        return
+
+    try:
+        if _runner is None:
+            fallback_intervals = {
+                SUBMIT: config.get("DAEMON_INTERVALS_SUBMIT",
+                                   DAEMON_INTERVALS_SUBMIT),
+                UPDATE: config.get("DAEMON_INTERVALS_UPDATE",
+                                   DAEMON_INTERVALS_UPDATE),
+                RETRIEVE: config.get("DAEMON_INTERVALS_RETRIEVE",
+                                     DAEMON_INTERVALS_RETRIEVE),
+                PARSE: config.get("DAEMON_INTERVALS_PARSE",
+                                  DAEMON_INTERVALS_PARSE),
+                WORKFLOW: config.get("DAEMON_INTERVALS_WFSTEP",
+                                     DAEMON_INTERVALS_WFSTEP),
+                TICK_WORK: config.get("DAEMON_INTERVALS_TICK_WORKFLOWS",
+                                      DAEMON_INTERVALS_TICK_WORKFLOWS),
+            }
+            _runner = DaemonRunner(
+                fallback_intervals=fallback_intervals,
+                poll_interval=config.get("DAEMON_INTERVALS_EVENTS",
+                                         DAEMON_INTERVALS_EVENTS))
+
+        print "aiida.daemon.tasks.runner: running the daemon stages"
+        _runner.run(duration=duration)
+    finally:
+        # An expired lock may have been taken over by another runner
+        if not lock.isexpired:
+            lock.release(owner='daemon_runner')
+
+
+if config.get("DAEMON_EVENT_DRIVEN", DAEMON_EVENT_DRIVEN):
+    runner = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_RUNNER", DAEMON_INTERVALS_RUNNER)
+    ))(runner)
+else:
+    submitter = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_SUBMIT", DAEMON_INTERVALS_SUBMIT)
+    ))(submitter)
+    updater = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_UPDATE", DAEMON_INTERVALS_UPDATE)
+    ))(updater)
+    retriever = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_RETRIEVE",
+                           DAEMON_INTERVALS_RETRIEVE)
+    ))(retriever)
+    parser = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_PARSE", DAEMON_INTERVALS_PARSE)
+    ))(parser)
+    tick_work = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_TICK_WORKFLOWS",
+                           DAEMON_INTERVALS_TICK_WORKFLOWS)
+    ))(tick_work)
+    workflow_stepper = periodic_task(run_every=timedelta(
+        seconds=config.get("DAEMON_INTERVALS_WFSTEP", DAEMON_INTERVALS_WFSTEP)
+    ))(workflow_stepper)
+
 
 def manual_tick_all():
-    from aiida.daemon.execmanager import submit_jobs, update_jobs, retrieve_jobs
+    from aiida.daemon.execmanager import (
+        submit_jobs, update_jobs, retrieve_jobs, parse_jobs)
     from aiida.work.daemon import tick_workflow_engine
     from aiida.daemon.workflowmanager import execute_steps
     submit_jobs()
     update_jobs()
     retrieve_jobs()
+    parse_jobs(wait=True)
     execute_steps() # legacy workflows
     tick_workflow_engine()
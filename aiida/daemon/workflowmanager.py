@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from aiida.common import aiidalogger
-from aiida.common.datastructures import wf_states, wf_exit_call, wf_default_call
+from aiida.common.datastructures import (wf_states, wf_exit_call,
+                                         wf_default_call, calc_states)
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
 __license__ = "MIT license, see LICENSE.txt file."
@@ -10,6 +11,15 @@ __authors__ = "The AiiDA team."
 
 logger = aiidalogger.getChild('workflowmanager')
 
+# The states of the calculations to be submitted (as in
+# JobCalculation._is_new), and the ones of the calculations and workflows
+# that either finished or failed (as in has_finished_ok and has_failed)
+_CALC_NEW_STATES = (calc_states.NEW, None)
+_CALC_DONE_STATES = (calc_states.FINISHED, calc_states.SUBMISSIONFAILED,
+                     calc_states.RETRIEVALFAILED, calc_states.PARSINGFAILED,
+                     calc_states.FAILED)
+_WF_DONE_STATES = (wf_states.FINISHED, wf_states.SLEEP, wf_states.ERROR)
+
 def execute_steps():
     """
     This method loops on the RUNNING workflows and handled the execution of the
@@ -31,37 +41,35 @@ def execute_steps():
     """
 
     from aiida.orm import JobCalculation
-    from aiida.orm.implementation import get_all_running_steps
- 
+    from aiida.orm.implementation import get_all_running_steps_with_states
+
     logger.info("Querying the worflow DB")
-    
-    running_steps = get_all_running_steps()
-    
-    for s in running_steps:
-        w = s.parent.get_aiida_class()
 
-        logger.info("[{0}] Found active step: {1}".format(w.pk, s.name))
+    # The states of all the calculations and sub-workflows of the running
+    # steps are fetched at once, rather than querying each of them (several
+    # times) for each step
+    running_steps = get_all_running_steps_with_states()
 
-        s_calcs_new = [c.pk for c in s.get_calculations() if c._is_new()]
-        s_calcs_finished = [c.pk for c in s.get_calculations()
-                            if c.has_finished_ok()]
-        s_calcs_failed = [c.pk for c in s.get_calculations() if c.has_failed()]
-        s_calcs_num = len(s.get_calculations())
+    for s, calc_states_by_pk, sub_wf_states_by_pk in running_steps:
+        w_pk = s.parent_id
 
-        s_sub_wf_finished = [sw.pk for sw in s.get_sub_workflows()
-                             if sw.has_finished_ok()]
-        s_sub_wf_failed = [sw.pk for sw in s.get_sub_workflows()
-                           if sw.has_failed()]
-        s_sub_wf_num = len(s.get_sub_workflows())
+        logger.info("[{0}] Found active step: {1}".format(w_pk, s.name))
 
-        if (s_calcs_num == (len(s_calcs_finished) + len(s_calcs_failed)) and
-            s_sub_wf_num == (len(s_sub_wf_finished) + len(s_sub_wf_failed))):
+        s_calcs_new = [pk for pk, state in calc_states_by_pk.iteritems()
+                       if state in _CALC_NEW_STATES]
+        s_calcs_done = [pk for pk, state in calc_states_by_pk.iteritems()
+                        if state in _CALC_DONE_STATES]
+        s_sub_wf_done = [pk for pk, state in sub_wf_states_by_pk.iteritems()
+                         if state in _WF_DONE_STATES]
 
-            logger.info("[{0}] Step: {1} ready to move".format(w.pk, s.name))
+        if (len(calc_states_by_pk) == len(s_calcs_done) and
+            len(sub_wf_states_by_pk) == len(s_sub_wf_done)):
+
+            logger.info("[{0}] Step: {1} ready to move".format(w_pk, s.name))
 
             s.set_state(wf_states.FINISHED)
-            
-            advance_workflow(w, s)
+
+            advance_workflow(s.parent.get_aiida_class(), s)
 
         elif len(s_calcs_new) > 0:
 
@@ -70,9 +78,9 @@ def execute_steps():
                 obj_calc = JobCalculation.get_subclass_from_pk(pk=pk)
                 try:
                     obj_calc.submit()
-                    logger.info("[{0}] Step: {1} launched calculation {2}".format(w.pk, s.name, pk))
+                    logger.info("[{0}] Step: {1} launched calculation {2}".format(w_pk, s.name, pk))
                 except:
-                    logger.error("[{0}] Step: {1} cannot launch calculation {2}".format(w.pk, s.name, pk))
+                    logger.error("[{0}] Step: {1} cannot launch calculation {2}".format(w_pk, s.name, pk))
 
 
 
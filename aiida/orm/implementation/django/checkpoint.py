@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from aiida.orm.implementation.general.checkpoint import AbstractCheckpointManager
+from aiida.common.exceptions import NotExistent
+from aiida.utils import timezone
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+
+class CheckpointManager(AbstractCheckpointManager):
+    def save(self, pid, state, checkpoint, version, waiting_on='',
+             context=None, deleted_context=()):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        with transaction.atomic():
+            DbCheckpoint.objects.update_or_create(
+                pid=str(pid),
+                defaults={'state': state, 'checkpoint': checkpoint,
+                          'version': version, 'waiting_on': waiting_on})
+            self._save_context(str(pid), context or {}, deleted_context)
+
+    def save_many(self, checkpoints):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        checkpoints = {str(c['pid']): c for c in checkpoints}
+        with transaction.atomic():
+            existing = set(DbCheckpoint.objects.filter(
+                pid__in=checkpoints.keys()).values_list('pid', flat=True))
+            for pid in existing:
+                c = checkpoints[pid]
+                DbCheckpoint.objects.filter(pid=pid).update(
+                    state=c['state'], checkpoint=c['checkpoint'],
+                    version=c['version'], waiting_on=c.get('waiting_on', ''),
+                    mtime=timezone.now())
+            DbCheckpoint.objects.bulk_create([
+                DbCheckpoint(pid=pid, state=c['state'],
+                             checkpoint=c['checkpoint'], version=c['version'],
+                             waiting_on=c.get('waiting_on', ''))
+                for pid, c in checkpoints.iteritems() if pid not in existing])
+            for pid, c in checkpoints.iteritems():
+                self._save_context(pid, c.get('context') or {},
+                                   c.get('deleted_context', ()))
+
+    @staticmethod
+    def _save_context(pid, context, deleted_context):
+        from aiida.backends.djsite.db.models import DbCheckpointContext
+        entries = DbCheckpointContext.objects.filter(dbcheckpoint_id=pid)
+        if deleted_context is not None:
+            entries = entries.filter(
+                key__in=list(deleted_context) + context.keys())
+        if deleted_context is None or deleted_context or context:
+            entries.delete()
+        DbCheckpointContext.objects.bulk_create([
+            DbCheckpointContext(dbcheckpoint_id=pid, key=key, value=value)
+            for key, value in context.iteritems()])
+
+    def load(self, pid):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        try:
+            version, checkpoint = DbCheckpoint.objects.values_list(
+                'version', 'checkpoint').get(pid=str(pid))
+        except DbCheckpoint.DoesNotExist:
+            raise NotExistent("No checkpoint for the process {}".format(pid))
+        # Depending on the database driver, we can get a buffer or a
+        # memoryview instead of a string
+        if isinstance(checkpoint, memoryview):
+            checkpoint = checkpoint.tobytes()
+        return version, str(checkpoint)
+
+    def load_context(self, pid):
+        from aiida.backends.djsite.db.models import DbCheckpointContext
+        context = {}
+        for key, value in DbCheckpointContext.objects.filter(
+                dbcheckpoint_id=str(pid)).values_list('key', 'value'):
+            if isinstance(value, memoryview):
+                value = value.tobytes()
+            context[key] = str(value)
+        return context
+
+    def exists(self, pid):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        return DbCheckpoint.objects.filter(pid=str(pid)).exists()
+
+    def get_waiting_on(self, state):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        return dict(DbCheckpoint.objects.filter(state=state).values_list(
+            'pid', 'waiting_on'))
+
+    def set_state(self, pid, state):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        if not DbCheckpoint.objects.filter(pid=str(pid)).update(state=state):
+            raise NotExistent("No checkpoint for the process {}".format(pid))
+
+    def delete(self, pid):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        DbCheckpoint.objects.filter(pid=str(pid)).delete()
+
+    def claim(self, pids, owner, state, lease_time):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        pids = [str(pid) for pid in pids]
+        now = timezone.now()
+        # The conditions are checked again by the database on the locked
+        # rows, so only one of concurrent claimers gets each checkpoint
+        DbCheckpoint.objects.filter(pid__in=pids, state=state).filter(
+            Q(lease_owner='') | Q(lease_owner=owner) |
+            Q(lease_expiry__lt=now)).update(
+            lease_owner=owner,
+            lease_expiry=now + datetime.timedelta(seconds=lease_time))
+        return list(DbCheckpoint.objects.filter(
+            pid__in=pids, lease_owner=owner).values_list('pid', flat=True))
+
+    def renew(self, owner, lease_time):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        DbCheckpoint.objects.filter(lease_owner=owner).update(
+            lease_expiry=timezone.now() +
+            datetime.timedelta(seconds=lease_time))
+
+    def release(self, owner, pids=None):
+        from aiida.backends.djsite.db.models import DbCheckpoint
+        leases = DbCheckpoint.objects.filter(lease_owner=owner)
+        if pids is not None:
+            leases = leases.filter(pid__in=[str(pid) for pid in pids])
+        leases.update(lease_owner='', lease_expiry=None)
@@ -48,6 +48,24 @@ class LockManager(AbstractLockManager):
             transaction.savepoint_rollback(sid)
 
 
+    def clear(self, key, expired_only=False, owner=None):
+        from aiida.backends.djsite.db.models import DbLock
+        try:
+            old_lock = DbLock.objects.get(key=key)
+        except DbLock.DoesNotExist:
+            return False
+
+        if owner is not None and old_lock.owner != owner:
+            return False
+        if expired_only and not Lock(old_lock).isexpired:
+            return False
+        # Only this very lock, not one created by someone else in the meantime
+        locks = DbLock.objects.filter(key=key, creation=old_lock.creation)
+        deleted = locks.exists()
+        locks.delete()
+        return deleted
+
+
 class Lock(AbstractLock):
 
     def release(self, owner="None"):
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
 import copy
+import operator
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError, transaction
-from django.db.models import F
+from django.db.models import F, Q
 
 from aiida.backends.djsite.db.models import DbLink
 from aiida.backends.djsite.utils import get_automatic_user
@@ -65,6 +66,10 @@ class Node(AbstractNode):
         super(Node, self).__init__()
 
         self._temp_folder = None
+        # The attributes of the stored node, loaded on first access
+        self._attrs_db_cache = None
+        # Whether the node was found sealed in the DB, see _are_attrs_frozen
+        self._sealed_in_db = False
 
         dbnode = kwargs.pop('dbnode', None)
 
@@ -174,7 +179,6 @@ class Node(AbstractNode):
         DbLink.objects.filter(output=self.dbnode, label=label).delete()
 
     def _add_dblink_from(self, src, label=None, link_type=LinkType.UNSPECIFIED):
-        from aiida.backends.djsite.db.models import DbPath
         if not isinstance(src, Node):
             raise ValueError("src must be a Node instance")
         if self.uuid == src.uuid:
@@ -194,9 +198,9 @@ class Node(AbstractNode):
             # isn't, this test will never fail, but then having a circular link is not
             # meaningful but does not pose a huge threat
             #
-            # I am linking src->self; a loop would be created if a DbPath exists already
-            # in the TC table from self to src
-            if len(DbPath.objects.filter(parent=self.dbnode, child=src.dbnode)) > 0:
+            # I am linking src->self; a loop would be created if a path exists already
+            # from self to src
+            if self._path_exists([(self.pk, src.pk)]):
                 raise ValueError(
                     "The link you are attempting to create would generate a loop")
 
@@ -242,6 +246,84 @@ class Node(AbstractNode):
                                   "name (raw message was {})"
                                   "".format(e.message))
 
+    @staticmethod
+    def _path_exists(pairs):
+        """
+        Return whether a path exists from the first to the second node of
+        any of the given pairs.
+
+        The DbPath table is used, unless disabled (see
+        :func:`aiida.backends.utils.is_dbpath_enabled`): in that case the
+        links are walked with a recursive query, starting from the first
+        nodes.
+
+        :param pairs: a list of tuples (parent pk, child pk)
+        :return: a boolean
+        """
+        from django.db import connection
+        from aiida.backends.djsite.db.models import DbPath
+        from aiida.backends.utils import is_dbpath_enabled
+
+        if not pairs:
+            return False
+
+        if is_dbpath_enabled():
+            return DbPath.objects.filter(reduce(operator.or_, [
+                Q(parent_id=parent, child_id=child)
+                for parent, child in pairs])).exists()
+
+        parents = list(set(parent for parent, _ in pairs))
+        # UNION (rather than UNION ALL) discards the pairs already found, so
+        # that each pair is walked only once
+        query = (
+            "WITH RECURSIVE walk(parent_id, child_id) AS ("
+            "SELECT input_id, output_id FROM db_dblink "
+            "WHERE input_id IN ({}) "
+            "UNION "
+            "SELECT walk.parent_id, db_dblink.output_id FROM walk "
+            "JOIN db_dblink ON db_dblink.input_id = walk.child_id) "
+            "SELECT 1 FROM walk WHERE {} LIMIT 1".format(
+                ", ".join(["%s"] * len(parents)),
+                " OR ".join(["(parent_id = %s AND child_id = %s)"] *
+                            len(pairs))))
+        cursor = connection.cursor()
+        cursor.execute(query, parents + [pk for pair in pairs for pk in pair])
+        return cursor.fetchone() is not None
+
+    @classmethod
+    def _add_dblinks(cls, links, with_transaction=True):
+        from aiida.common.utils import EmptyContextManager
+
+        links = list(links)
+        to_check = cls._check_dblinks(links)
+        if not links:
+            return
+
+        if with_transaction:
+            context_man = transaction.commit_on_success()
+        else:
+            context_man = EmptyContextManager()
+
+        with context_man:
+            # Check for cycles all together, see _add_dblink_from
+            if cls._path_exists([(dest.pk, src.pk)
+                                 for dest, src in to_check]):
+                raise ValueError(
+                    "The link you are attempting to create would generate a "
+                    "loop")
+            sid = transaction.savepoint()
+            try:
+                DbLink.objects.bulk_create([
+                    DbLink(input_id=src.pk, output_id=dest.pk, label=label,
+                           type=link_type.value)
+                    for src, dest, label, link_type in links])
+                transaction.savepoint_commit(sid)
+            except IntegrityError as e:
+                transaction.savepoint_rollback(sid)
+                raise UniquenessError("There is already a link with the same "
+                                      "name (raw message was {})"
+                                      "".format(e.message))
+
     def get_inputs(self, node_type=None, also_labels=False, only_in_db=False,
                    link_type=None):
         from aiida.backends.djsite.db.models import DbLink
@@ -311,6 +393,7 @@ class Node(AbstractNode):
         if self._to_be_stored:
             self._attrs_cache[key] = copy.deepcopy(value)
         else:
+            self._attrs_db_cache = None
             DbAttribute.set_value_for_node(self.dbnode, key, value)
             self._increment_version_number_db()
 
@@ -326,6 +409,7 @@ class Node(AbstractNode):
             if not DbAttribute.has_key(self.dbnode, key):
                 raise AttributeError("DbAttribute {} does not exist".format(
                     key))
+            self._attrs_db_cache = None
             DbAttribute.del_value_for_node(self.dbnode, key)
             self._increment_version_number_db()
 
@@ -338,14 +422,59 @@ class Node(AbstractNode):
                 except KeyError:
                     raise AttributeError(
                         "DbAttribute '{}' does not exist".format(key))
-            else:
+            elif (key in self._updatable_attributes or
+                  not self._are_attrs_frozen()):
+                # These can be changed at any time, also by other processes
                 return DbAttribute.get_value_for_node(
                     dbnode=self.dbnode, key=key)
+            else:
+                try:
+                    value = self._get_db_attrs()[key]
+                except KeyError:
+                    raise AttributeError(
+                        "DbAttribute with key {} for node {} not found "
+                        "in db".format(key, self.pk))
+                # The callers may modify the value they get
+                return copy.deepcopy(value)
         except AttributeError:
             if default is _NO_DEFAULT:
                 raise
             return default
 
+    def _are_attrs_frozen(self):
+        """
+        Return False if the attributes of the stored node may still be
+        changed by another process, and therefore cannot be cached: this is
+        the case of the Sealable nodes (e.g. the calculations, changed by
+        the daemon) until they are sealed.
+        """
+        from aiida.backends.djsite.db.models import DbAttribute
+        if not isinstance(self, Sealable) or self._sealed_in_db:
+            return True
+        try:
+            # Once sealed, the node cannot be unsealed
+            self._sealed_in_db = bool(DbAttribute.get_value_for_node(
+                dbnode=self.dbnode, key=Sealable.SEALED_KEY))
+        except AttributeError:
+            pass
+        return self._sealed_in_db
+
+    def _get_db_attrs(self, refresh=False):
+        """
+        Return the attributes of the stored node. They are fetched with a
+        single query on first access, and then kept until an attribute is set
+        or deleted through this node.
+
+        :param refresh: if True, fetch them again from the DB (e.g. because
+            the updatable attributes may have been changed by another process)
+        :return: a dictionary {key: value}, not to be modified
+        """
+        from aiida.backends.djsite.db.models import DbAttribute
+        if refresh or self._attrs_db_cache is None:
+            self._attrs_db_cache = DbAttribute.get_all_values_for_node(
+                self.dbnode)
+        return self._attrs_db_cache
+
     def set_extra(self, key, value, exclusive=False):
         from aiida.backends.djsite.db.models import DbExtra
         DbExtra.validate_key(key)
@@ -431,32 +560,30 @@ class Node(AbstractNode):
                 yield (e.key, e.getvalue())
 
     def iterattrs(self):
-        from aiida.backends.djsite.db.models import DbAttribute
         # TODO: check what happens if someone stores the object while
         #        the iterator is being used!
         if self._to_be_stored:
             for k, v in self._attrs_cache.iteritems():
                 yield (k, v)
         else:
-            all_attrs = DbAttribute.get_all_values_for_node(self.dbnode)
+            all_attrs = self._get_db_attrs(
+                refresh=(bool(self._updatable_attributes) or
+                         not self._are_attrs_frozen()))
             for attr in all_attrs:
-                yield (attr, all_attrs[attr])
+                yield (attr, copy.deepcopy(all_attrs[attr]))
 
     def get_attrs(self):
         return dict(self.iterattrs())
 
     def attrs(self):
-        from aiida.backends.djsite.db.models import DbAttribute
-        # Note: I "duplicate" the code from iterattrs, rather than
-        # calling iterattrs from here, because iterattrs is slow on each call
-        # since it has to call .getvalue(). To improve!
         if self._to_be_stored:
             for k in self._attrs_cache.iterkeys():
                 yield k
         else:
-            attrlist = DbAttribute.list_all_node_elements(self.dbnode)
-            for attr in attrlist:
-                yield attr.key
+            for k in self._get_db_attrs(
+                    refresh=(bool(self._updatable_attributes) or
+                             not self._are_attrs_frozen())).keys():
+                yield k
 
     def add_comment(self, content, user=None):
         from aiida.backends.djsite.db.models import DbComment
@@ -705,9 +832,10 @@ class Node(AbstractNode):
             # stored
             links_to_store = list(self._inputlinks_cache.keys())
 
-            for label in links_to_store:
-                src, link_type = self._inputlinks_cache[label]
-                self._add_dblink_from(src, label, link_type)
+            self._add_dblinks(
+                [(self._inputlinks_cache[label][0], self, label,
+                  self._inputlinks_cache[label][1])
+                 for label in links_to_store], with_transaction=False)
             # If everything went smoothly, clear the entries from the cache.
             # I do it here because I delete them all at once if no error
             # occurred; otherwise, links will not be stored and I
@@ -736,9 +864,7 @@ class Node(AbstractNode):
         # for storing data and its attributes.
         from django.db import transaction
         from aiida.common.utils import EmptyContextManager
-        from aiida.common.exceptions import ValidationError
         from aiida.backends.djsite.db.models import DbAttribute
-        import aiida.orm.autogroup
 
         if with_transaction:
             context_man = transaction.commit_on_success()
@@ -796,31 +922,143 @@ class Node(AbstractNode):
                 raise
 
             # Set up autogrouping used be verdi run
-            autogroup = aiida.orm.autogroup.current_autogroup
-            grouptype = aiida.orm.autogroup.VERDIAUTOGROUP_TYPE
-            if autogroup is not None:
-                if not isinstance(autogroup, aiida.orm.autogroup.Autogroup):
-                    raise ValidationError("current_autogroup is not an AiiDA Autogroup")
-                if autogroup.is_to_be_grouped(self):
-                    group_name = autogroup.get_group_name()
-                    if group_name is not None:
-                        from aiida.orm import Group
-
-                        g = Group.get_or_create(name=group_name, type_string=grouptype)[0]
-                        g.add_nodes(self)
+            self._add_to_autogroup([self])
 
         # This is useful because in this way I can do
         # n = Node().store()
         return self
 
+    @classmethod
+    def store_many(cls, nodes, with_transaction=True):
+        from django.db import transaction
+        from aiida.common.utils import EmptyContextManager
+        from aiida.backends.djsite.db.models import DbNode, DbAttribute
+
+        nodes = list(nodes)
+        cls._check_store_many(nodes)
+
+        # The nodes with their own store() are stored with it
+        to_insert = [node for node in nodes
+                     if type(node).store.im_func is Node.store.im_func]
+        to_store = [node for node in nodes
+                    if type(node).store.im_func is not Node.store.im_func]
+        attrs_caches = [node._attrs_cache for node in to_insert]
+        # What store() consumes, to restore the nodes on failure
+        to_store_caches = [(node._attrs_cache, dict(node._inputlinks_cache))
+                           for node in to_store]
+
+        if with_transaction:
+            context_man = transaction.commit_on_success()
+        else:
+            context_man = EmptyContextManager()
+
+        # As in store, the files are moved before storing the DB entries
+        moved = []
+        try:
+            for node in to_insert:
+                node._repository_folder.replace_with_folder(
+                    node._get_temp_folder().abspath, move=True,
+                    overwrite=True)
+                moved.append(node)
+
+            with context_man:
+                dbnodes = [node.dbnode for node in to_insert]
+                DbNode.objects.bulk_create(dbnodes)
+                # bulk_create does not set the pks of the new rows: they are
+                # fetched by uuid, in chunks to keep the queries small
+                pks = {}
+                uuids = [dbnode.uuid for dbnode in dbnodes]
+                for i in range(0, len(uuids), 500):
+                    pks.update(DbNode.objects.filter(
+                        uuid__in=uuids[i:i + 500]).values_list('uuid', 'pk'))
+                for dbnode in dbnodes:
+                    dbnode.pk = pks[dbnode.uuid]
+                    dbnode._state.adding = False
+                    dbnode._state.db = DbNode.objects.db
+
+                attributes = []
+                for node, attrs in zip(to_insert, attrs_caches):
+                    attributes.extend(DbAttribute.reset_values_for_node(
+                        node.dbnode, attributes=attrs, with_transaction=False,
+                        return_not_store=True))
+                DbAttribute.objects.bulk_create(attributes)
+
+                for node in to_insert:
+                    del node._attrs_cache
+                    node._to_be_stored = False
+
+                for node in to_store:
+                    node.store(with_transaction=False)
+
+                cls._add_dblinks(
+                    [(src, node, label, link_type) for node in to_insert
+                     for label, (src, link_type)
+                     in node._inputlinks_cache.iteritems()],
+                    with_transaction=False)
+
+        # This is one of the few cases where it is ok to do a 'global'
+        # except, also because I am re-raising the exception
+        except:
+            for node, attrs in zip(to_insert, attrs_caches):
+                node._attrs_cache = attrs
+                node._to_be_stored = True
+                node.dbnode.pk = None
+                node.dbnode._state.adding = True
+            # I put back the files in the sandbox folders since the
+            # transaction did not succeed
+            for node in moved:
+                node._get_temp_folder().replace_with_folder(
+                    node._repository_folder.abspath, move=True,
+                    overwrite=True)
+            # The same for the nodes stored with their own store()
+            for node, (attrs, links) in zip(to_store, to_store_caches):
+                if node._to_be_stored:
+                    continue
+                node._attrs_cache = attrs
+                node._inputlinks_cache.clear()
+                node._inputlinks_cache.update(links)
+                node._to_be_stored = True
+                node.dbnode.pk = None
+                node.dbnode._state.adding = True
+                node._get_temp_folder().replace_with_folder(
+                    node._repository_folder.abspath, move=True,
+                    overwrite=True)
+            raise
+
+        for node in to_insert:
+            node._inputlinks_cache.clear()
+            node._temp_folder = None
+
+        # Set up autogrouping used be verdi run
+        cls._add_to_autogroup(to_insert)
+
+        return nodes
+
+    @classmethod
+    def prefetch_attributes(cls, nodes):
+        from aiida.backends.djsite.db.models import DbAttribute
+
+        nodes = list(nodes)
+        to_load = {}
+        for node in nodes:
+            if not node._to_be_stored and node._attrs_db_cache is None:
+                to_load.setdefault(node.pk, []).append(node)
+
+        pks = to_load.keys()
+        for i in range(0, len(pks), 500):
+            all_attrs = DbAttribute.get_all_values_for_nodepks(pks[i:i + 500])
+            for pk, attrs in all_attrs.iteritems():
+                for node in to_load[pk]:
+                    node._attrs_db_cache = attrs
+
+        return nodes
+
     @property
     def has_children(self):
-        from aiida.backends.djsite.db.models import DbPath
-        childrens = DbPath.objects.filter(parent=self.pk)
-        return False if not childrens else True
+        # A node has descendants if and only if it has direct outputs
+        return DbLink.objects.filter(input=self.pk).exists()
 
     @property
     def has_parents(self):
-        from aiida.backends.djsite.db.models import DbPath
-        parents = DbPath.objects.filter(child=self.pk)
-        return False if not parents else True
+        # A node has ancestors if and only if it has direct inputs
+        return DbLink.objects.filter(output=self.pk).exists()
@@ -573,6 +573,58 @@ def get_all_running_steps():
     from aiida.backends.djsite.db.models import DbWorkflowStep
     return DbWorkflowStep.objects.filter(state=wf_states.RUNNING)
 
+def get_all_running_steps_with_states():
+    """
+    Get all the RUNNING steps, with the states of their calculations and
+    sub-workflows, using a fixed number of queries.
+
+    :return: a list of tuples (step, calc_states, sub_workflow_states), where
+      step is a DbWorkflowStep (with its parent already fetched),
+      calc_states a dictionary {calculation pk: state} (the state being
+      None for calculations with no state in the DB) and
+      sub_workflow_states a dictionary {sub-workflow pk: state}
+    """
+    from collections import defaultdict
+    from aiida.backends.djsite.db.models import DbWorkflowStep, DbCalcState
+    from aiida.common.datastructures import sort_states
+    from aiida.common.exceptions import DbContentError
+
+    steps = list(DbWorkflowStep.objects.filter(
+        state=wf_states.RUNNING).select_related('parent'))
+    step_pks = [s.pk for s in steps]
+    calcs = defaultdict(dict)
+    sub_workflows = defaultdict(dict)
+
+    if step_pks:
+        all_calc_states = defaultdict(list)
+        for pk, state in DbCalcState.objects.filter(
+                dbnode__workflow_step__in=step_pks).values_list(
+                'dbnode_id', 'state'):
+            all_calc_states[pk].append(state)
+
+        for step_pk, pk in DbWorkflowStep.calculations.through.objects.filter(
+                dbworkflowstep_id__in=step_pks).values_list(
+                'dbworkflowstep_id', 'dbnode_id'):
+            this_calc_states = all_calc_states.get(pk)
+            if not this_calc_states:
+                calcs[step_pk][pk] = None
+                continue
+            # The same logic as in JobCalculation.get_state
+            try:
+                calcs[step_pk][pk] = sort_states(this_calc_states)[0]
+            except ValueError as e:
+                raise DbContentError("Error in the content of the "
+                                     "DbCalcState table ({})".format(
+                    e.message))
+
+        for step_pk, pk, state in \
+                DbWorkflowStep.sub_workflows.through.objects.filter(
+                    dbworkflowstep_id__in=step_pks).values_list(
+                    'dbworkflowstep_id', 'dbworkflow_id', 'dbworkflow__state'):
+            sub_workflows[step_pk][pk] = state
+
+    return [(s, calcs[s.pk], sub_workflows[s.pk]) for s in steps]
+
 def get_workflow_info(w, tab_size=2, short=False, pre_string="",
                       depth=16):
     """
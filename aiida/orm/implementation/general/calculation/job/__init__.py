@@ -562,6 +562,42 @@ class AbstractJobCalculation(object):
         """
         pass
 
+    @classmethod
+    def _set_state_bulk(cls, pks, state):
+        """
+        Set the state of many calculations at once, with a constant number
+        of queries instead of a few queries per calculation.
+
+        The same checks as in _set_state are done, but calculations that
+        cannot be moved to the given state (because they already went
+        through it, or through a later state) are just skipped instead of
+        raising ModificationNotAllowed.
+
+        :param pks: an iterable with the pks of the calculations
+        :param state: a string with the state. This must be a valid string,
+          from ``aiida.common.datastructures.calc_states``.
+        :return: the list of the pks of the calculations whose state was set
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def _set_state_one_by_one(cls, pks, state):
+        """
+        Fallback of _set_state_bulk, calling _set_state on each calculation
+        (e.g. when another process changed some of the states concurrently).
+        """
+        from aiida.orm import load_node
+        from aiida.common.exceptions import NotExistent
+
+        set_pks = []
+        for pk in pks:
+            try:
+                load_node(pk, parent_class=cls)._set_state(state)
+            except (ModificationNotAllowed, NotExistent):
+                continue
+            set_pks.append(pk)
+        return set_pks
+
     @abstractmethod
     def get_state(self, from_attribute=False):
         """
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+
+class AbstractCheckpointManager(object):
+    """
+    Management class to store the checkpoints of the processes of the
+    workflow engine in the DbCheckpoint table.
+
+    The checkpoints are opaque binary strings for this class, the
+    serialization is done by aiida.work.persistence.DbPersistence.
+    """
+
+    def save(self, pid, state, checkpoint, version, waiting_on='',
+             context=None, deleted_context=()):
+        """
+        Create or replace the checkpoint of a process.
+
+        :param pid: the pid of the process
+        :param state: the state of the process, a string
+        :param checkpoint: the checkpoint data, a binary string
+        :param version: the version of the format of the checkpoint data
+        :param waiting_on: a string describing what the process waits on
+        :param context: a dictionary {key: data} with the entries of the
+            context of the process to create or replace, as binary strings.
+            The other entries are left untouched.
+        :param deleted_context: the keys of the entries of the context to
+            delete, or None to delete all the entries that are not in context
+        """
+        raise NotImplementedError
+
+    def save_many(self, checkpoints):
+        """
+        Create or replace the checkpoints of several processes, in a single
+        transaction.
+
+        :param checkpoints: a list of dictionaries, each with the arguments
+            of save
+        """
+        raise NotImplementedError
+
+    def load(self, pid):
+        """
+        Get the checkpoint of a process.
+
+        :param pid: the pid of the process
+        :return: a tuple (version, checkpoint data)
+        :raise: NotExistent: if there is no checkpoint for the process
+        """
+        raise NotImplementedError
+
+    def load_context(self, pid):
+        """
+        Get the entries of the context of a process, stored separately from
+        its checkpoint.
+
+        :param pid: the pid of the process
+        :return: a dictionary {key: data}
+        """
+        raise NotImplementedError
+
+    def exists(self, pid):
+        """
+        :param pid: the pid of the process
+        :return: True if there is a checkpoint for the process
+        """
+        raise NotImplementedError
+
+    def get_waiting_on(self, state):
+        """
+        Get what the processes in a given state are waiting on.
+
+        :param state: the state of the processes
+        :return: a dictionary {pid: waiting_on}, with the pids as strings
+        """
+        raise NotImplementedError
+
+    def set_state(self, pid, state):
+        """
+        Change the state of the checkpoint of a process.
+
+        :param pid: the pid of the process
+        :param state: the new state
+        :raise: NotExistent: if there is no checkpoint for the process
+        """
+        raise NotImplementedError
+
+    def delete(self, pid):
+        """
+        Delete the checkpoint of a process, with its context, if it exists.
+
+        :param pid: the pid of the process
+        """
+        raise NotImplementedError
+
+    def claim(self, pids, owner, state, lease_time):
+        """
+        Lease the checkpoints of some processes, so that only the owner runs
+        them until the lease expires. Checkpoints that are already leased by
+        someone else are not claimed, unless their lease has expired.
+
+        :param pids: the pids of the processes to claim
+        :param owner: a string identifying the claimer
+        :param state: only claim checkpoints in this state
+        :param lease_time: the duration of the lease, in seconds
+        :return: the list of the pids (as strings) leased to the owner
+        """
+        raise NotImplementedError
+
+    def renew(self, owner, lease_time):
+        """
+        Extend all the leases of an owner.
+
+        :param owner: a string identifying the owner
+        :param lease_time: the new duration of the leases, in seconds
+        """
+        raise NotImplementedError
+
+    def release(self, owner, pids=None):
+        """
+        Release the leases of an owner.
+
+        :param owner: a string identifying the owner
+        :param pids: if not None, only release the leases of these processes
+        """
+        raise NotImplementedError
@@ -669,6 +669,28 @@ class AbstractComputer(object):
                 raise TypeError("def_cpus_per_machine must be an integer (or None)")
         self._set_property("default_mpiprocs_per_machine", def_cpus_per_machine)
 
+    def get_minimum_job_poll_interval(self):
+        """
+        Return the minimum time (in seconds) between two queries of the
+        scheduler of this computer by the daemon, or None if it was not set.
+        """
+        return self._get_property("minimum_job_poll_interval", None)
+
+    def set_minimum_job_poll_interval(self, interval):
+        """
+        Set the minimum time (in seconds) between two queries of the
+        scheduler of this computer by the daemon.
+        Accepts None if you do not want to set this value.
+        """
+        if interval is None:
+            self._del_property("minimum_job_poll_interval",
+                               raise_exception=False)
+        else:
+            if not isinstance(interval, (int, long, float)) or interval < 0:
+                raise TypeError("interval must be a non-negative number "
+                                "(or None)")
+            self._set_property("minimum_job_poll_interval", interval)
+
     @abstractmethod
     def get_transport_params(self):
         pass
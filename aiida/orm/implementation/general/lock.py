@@ -34,6 +34,17 @@ class AbstractLockManager(object):
         """
         raise NotImplementedError
 
+    def clear(self, key, expired_only=False, owner=None):
+        """
+        Delete the lock with the given key, if any.
+        :param key: the lock key, a string
+        :param expired_only: if True, delete the lock only if it is expired
+        :param owner: if given, delete the lock only if it belongs to this
+            owner, otherwise whoever its owner
+        :return: True if a lock was deleted, False otherwise
+        """
+        raise NotImplementedError
+
 
 class AbstractLock(object):
     """
@@ -89,6 +89,9 @@ class AbstractNode(object):
     # See documentation in the set() method.
     _set_incompatibilities = []
 
+    # The attributes that can be changed also after storing the node
+    _updatable_attributes = tuple()
+
     @staticmethod
     def get_db_columns():
         """
@@ -539,6 +542,53 @@ class AbstractNode(object):
         """
         pass
 
+    @classmethod
+    def _add_dblinks(cls, links, with_transaction=True):
+        """
+        Add several links to the database, e.g. all the links of a
+        calculation, with a single insertion when the backend supports it.
+
+        :note: this function should not be called directly; it acts directly on
+            the database.
+
+        :param links: a list of tuples (src, dest, label, link_type), where
+            both nodes are stored and the labels are not None
+        :parameter with_transaction: if False, no transaction is used. This
+          is meant to be used ONLY if the outer calling function has already
+          a transaction open!
+        """
+        for src, dest, label, link_type in links:
+            dest._add_dblink_from(src, label, link_type)
+
+    @staticmethod
+    def _check_dblinks(links):
+        """
+        Check the links to be added with _add_dblinks.
+
+        :return: the list of the (dest, src) pairs of the links that cannot be
+            created if there is already a path from dest to src
+        """
+        to_check = []
+        for src, dest, label, link_type in links:
+            if not isinstance(src, AbstractNode):
+                raise ValueError("src must be a Node instance")
+            if dest.uuid == src.uuid:
+                raise ValueError("Cannot link to itself")
+            if label is None:
+                raise ValueError("The label of the link from {} to {} must "
+                                 "be provided".format(src.uuid, dest.uuid))
+            if dest._to_be_stored:
+                raise ModificationNotAllowed(
+                    "Cannot call the internal _add_dblinks if the "
+                    "destination node is not stored")
+            if src._to_be_stored:
+                raise ModificationNotAllowed(
+                    "Cannot call the internal _add_dblinks if the "
+                    "source node is not stored")
+            if link_type is LinkType.CREATE or link_type is LinkType.INPUT:
+                to_check.append((dest, src))
+        return to_check
+
     def _linking_as_output(self, dest, link_type):
         """
         Raise a ValueError if a link from self to dest is not allowed.
@@ -997,6 +1047,35 @@ class AbstractNode(object):
         """
         return self._get_folder_pathsubfolder.get_subfolder(subfolder).get_content_list()
 
+    def get_hash(self):
+        """
+        Return a hash of the content of the node: its type, its attributes
+        and the files in its repository folder. The pk, uuid, label,
+        description, creation time, ... are not part of the content, so that
+        two nodes storing the same data have the same hash.
+
+        :return: a string
+        :raise ValueError: if some attribute cannot be hashed
+        """
+        import hashlib
+        from aiida.common.hashing import make_hash
+
+        file_hashes = {}
+        folder = self._get_folder_pathsubfolder
+        if folder.exists():
+            for dirpath, _, filenames in os.walk(folder.abspath):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    file_hash = hashlib.sha224()
+                    with open(path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(65536), b''):
+                            file_hash.update(chunk)
+                    file_hashes[os.path.relpath(path, folder.abspath)] = \
+                        file_hash.hexdigest()
+
+        return make_hash([self._plugin_type_string, self.get_attrs(),
+                          file_hashes])
+
     def _get_temp_folder(self):
         """
         Get the folder of the Node in the temporary repository.
@@ -1153,6 +1232,104 @@ class AbstractNode(object):
         # for storing data and its attributes.
         pass
 
+    @classmethod
+    def store_many(cls, nodes, with_transaction=True):
+        """
+        Store many new nodes at once, in a single transaction: all nodes are
+        validated first, then their rows, attributes and cached input links
+        are inserted with a few multi-row insertions.
+
+        The input links between the given nodes are stored as well, so that
+        e.g. a list of nodes can be stored together with the nodes they were
+        created from. The other parents must be stored already.
+
+        :note: the nodes whose class overrides store() (e.g. to perform
+          further actions after storing) are stored one by one, with their
+          own store(), within the same transaction.
+
+        :param nodes: a list of unstored nodes
+        :parameter with_transaction: if False, no transaction is used. This
+          is meant to be used ONLY if the outer calling function has already
+          a transaction open!
+        :return: the list of the nodes
+        :raise ModificationNotAllowed: if a node is already stored, or has
+          an unstored parent that is not among the given nodes
+        """
+        nodes = list(nodes)
+        cls._check_store_many(nodes)
+        # The parents among the nodes must come first
+        for node in nodes:
+            node.store(with_transaction=with_transaction)
+        return nodes
+
+    @classmethod
+    def prefetch_attributes(cls, nodes):
+        """
+        Load the attributes of many stored nodes at once, with a single query
+        for each batch of nodes, so that reading them afterwards does not
+        need a query for each node.
+
+        The nodes that are not stored, or whose attributes are already
+        loaded, are left untouched.
+
+        :param nodes: an iterable of nodes
+        :return: the list of the nodes
+        """
+        return list(nodes)
+
+    @staticmethod
+    def _check_store_many(nodes):
+        """
+        Check the nodes to be stored with store_many, validating them.
+
+        :raise ModificationNotAllowed: if a node is already stored, or has
+          an unstored parent that is not among the nodes
+        """
+        node_ids = set(id(node) for node in nodes)
+        if len(node_ids) != len(nodes):
+            raise ValueError("The same node was passed more than once to "
+                             "store_many")
+
+        for node in nodes:
+            if not node._to_be_stored:
+                raise ModificationNotAllowed(
+                    "Node with pk= {} was already stored".format(node.pk))
+
+        for node in nodes:
+            node._validate()
+            for label, (src, _) in node._inputlinks_cache.iteritems():
+                if src._to_be_stored and id(src) not in node_ids:
+                    raise ModificationNotAllowed(
+                        "Cannot store the input link '{}' of node {} because "
+                        "the source node is not stored, nor among the nodes "
+                        "to store".format(label, node.uuid))
+
+    @staticmethod
+    def _add_to_autogroup(nodes):
+        """
+        Add the newly stored nodes to the current autogroup (used by verdi
+        run), if any.
+        """
+        import aiida.orm.autogroup
+        from aiida.common.exceptions import ValidationError
+
+        autogroup = aiida.orm.autogroup.current_autogroup
+        grouptype = aiida.orm.autogroup.VERDIAUTOGROUP_TYPE
+        if autogroup is None:
+            return
+        if not isinstance(autogroup, aiida.orm.autogroup.Autogroup):
+            raise ValidationError("current_autogroup is not an AiiDA Autogroup")
+
+        to_group = [node for node in nodes if autogroup.is_to_be_grouped(node)]
+        if not to_group:
+            return
+        group_name = autogroup.get_group_name()
+        if group_name is not None:
+            from aiida.orm import Group
+
+            g = Group.get_or_create(name=group_name, type_string=grouptype)[0]
+            g.add_nodes(to_group)
+
     def __del__(self):
         """
         Called only upon real object destruction from memory
@@ -4,6 +4,8 @@ import datetime
 # XXX to remove when we implements the settings/tasks using SQLA
 from dateutil.parser import parse
 
+from sqlalchemy import cast, func
+from sqlalchemy.dialects.postgresql import JSONB, array
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload
 
@@ -78,6 +80,74 @@ class JobCalculation(AbstractJobCalculation, Calculation):
         if state != calc_states.IMPORTED:
             self._set_attr('state', state)
 
+    @classmethod
+    def _set_state_bulk(cls, pks, state):
+        """
+        Set the state of many calculations at once, with a constant number
+        of queries instead of a few queries per calculation.
+
+        The same checks as in _set_state are done, but calculations that
+        cannot be moved to the given state (because they already went
+        through it, or through a later state) are just skipped instead of
+        raising ModificationNotAllowed.
+
+        :param pks: an iterable with the pks of the calculations
+        :param state: a string with the state. This must be a valid string,
+          from ``aiida.common.datastructures.calc_states``.
+        :return: the list of the pks of the calculations whose state was set
+        """
+        from aiida.common.datastructures import get_states_not_before
+
+        if state not in calc_states:
+            raise ValueError(
+                "'{}' is not a valid calculation status".format(state))
+
+        pks = list(set(pks))
+        if not pks:
+            return []
+
+        # The calculations that did not go through this state, nor through
+        # a later one
+        blocked = sa.session.query(DbCalcState.dbnode_id).filter(
+            DbCalcState.dbnode_id.in_(pks),
+            DbCalcState.state.in_(get_states_not_before(state)))
+        pks_to_set = [pk for pk, in sa.session.query(DbNode.id).filter(
+            DbNode.id.in_(pks),
+            DbNode.type.like("{}%".format(cls._query_type_string)),
+            ~DbNode.id.in_(blocked))]
+        if not pks_to_set:
+            return []
+
+        try:
+            # The uniqueness constraint of the table still protects from
+            # concurrent changes
+            now = timezone.now()
+            sa.session.execute(DbCalcState.__table__.insert(), [
+                {'dbnode_id': pk, 'state': state, 'time': now}
+                for pk in pks_to_set])
+
+            # For non-imported states, also set in the attribute (so that,
+            # if we export, we can still see the original state the
+            # calculation had.
+            # A single UPDATE, that only changes the key in the JSONB
+            # column, to not overwrite concurrent changes of the other
+            # attributes
+            if state != calc_states.IMPORTED:
+                table = DbNode.__table__
+                sa.session.execute(table.update().where(
+                    table.c.id.in_(pks_to_set)).values(
+                    attributes=func.jsonb_set(table.c.attributes,
+                                              array([u'state']),
+                                              cast(state, JSONB)),
+                    nodeversion=table.c.nodeversion + 1))
+            sa.session.commit()
+        except SQLAlchemyError:
+            # Some state was set in the meantime by someone else
+            sa.session.rollback()
+            return cls._set_state_one_by_one(pks, state)
+
+        return pks_to_set
+
     def get_state(self, from_attribute=False):
         """
         Get the state of the calculation.
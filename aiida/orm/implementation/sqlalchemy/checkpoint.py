@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from aiida.backends.sqlalchemy import session
+from aiida.backends.sqlalchemy.models.checkpoint import DbCheckpoint, \
+    DbCheckpointContext
+from aiida.common.exceptions import NotExistent
+from aiida.orm.implementation.general.checkpoint import AbstractCheckpointManager
+from aiida.utils import timezone
+
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__authors__ = "The AiiDA team."
+__version__ = "0.7.1"
+
+
+class CheckpointManager(AbstractCheckpointManager):
+    # There is no migration mechanism for SQLAlchemy databases: the table is
+    # created on first use in databases set up before it existed
+    _table_checked = False
+
+    def __init__(self):
+        if not CheckpointManager._table_checked:
+            DbCheckpoint.__table__.create(session.bind, checkfirst=True)
+            DbCheckpointContext.__table__.create(session.bind,
+                                                 checkfirst=True)
+            CheckpointManager._table_checked = True
+
+    def save(self, pid, state, checkpoint, version, waiting_on='',
+             context=None, deleted_context=()):
+        try:
+            session.merge(DbCheckpoint(
+                pid=str(pid), state=state, checkpoint=checkpoint,
+                version=version, waiting_on=waiting_on,
+                mtime=timezone.now()))
+            # Write the checkpoint before the entries referencing it
+            session.flush()
+            self._save_context(str(pid), context or {}, deleted_context)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def save_many(self, checkpoints):
+        try:
+            for c in checkpoints:
+                session.merge(DbCheckpoint(
+                    pid=str(c['pid']), state=c['state'],
+                    checkpoint=c['checkpoint'], version=c['version'],
+                    waiting_on=c.get('waiting_on', ''), mtime=timezone.now()))
+            session.flush()
+            for c in checkpoints:
+                self._save_context(str(c['pid']), c.get('context') or {},
+                                   c.get('deleted_context', ()))
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    @staticmethod
+    def _save_context(pid, context, deleted_context):
+        query = session.query(DbCheckpointContext).filter(
+            DbCheckpointContext.dbcheckpoint_id == pid)
+        if deleted_context is not None:
+            query = query.filter(DbCheckpointContext.key.in_(
+                list(deleted_context) + context.keys()))
+        if deleted_context is None or deleted_context or context:
+            query.delete(synchronize_session=False)
+        session.add_all([
+            DbCheckpointContext(dbcheckpoint_id=pid, key=key, value=value)
+            for key, value in context.iteritems()])
+
+    def load(self, pid):
+        res = session.query(DbCheckpoint.version, DbCheckpoint.checkpoint).\
+            filter(DbCheckpoint.pid == str(pid)).first()
+        if res is None:
+            raise NotExistent("No checkpoint for the process {}".format(pid))
+        return res[0], str(res[1])
+
+    def load_context(self, pid):
+        return {key: str(value) for key, value in session.query(
+            DbCheckpointContext.key, DbCheckpointContext.value).filter(
+            DbCheckpointContext.dbcheckpoint_id == str(pid)).all()}
+
+    def exists(self, pid):
+        return session.query(DbCheckpoint.pid).filter(
+            DbCheckpoint.pid == str(pid)).first() is not None
+
+    def get_waiting_on(self, state):
+        return dict(
+            session.query(DbCheckpoint.pid, DbCheckpoint.waiting_on).
+            filter(DbCheckpoint.state == state).all())
+
+    def set_state(self, pid, state):
+        try:
+            updated = session.query(DbCheckpoint).\
+                filter(DbCheckpoint.pid == str(pid)).\
+                update({'state': state, 'mtime': timezone.now()},
+                       synchronize_session=False)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+        if not updated:
+            raise NotExistent("No checkpoint for the process {}".format(pid))
+
+    def delete(self, pid):
+        try:
+            session.query(DbCheckpointContext).\
+                filter(DbCheckpointContext.dbcheckpoint_id == str(pid)).\
+                delete(synchronize_session=False)
+            session.query(DbCheckpoint).\
+                filter(DbCheckpoint.pid == str(pid)).\
+                delete(synchronize_session=False)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def claim(self, pids, owner, state, lease_time):
+        pids = [str(pid) for pid in pids]
+        if not pids:
+            return []
+        now = timezone.now()
+        try:
+            # The conditions are checked again by the database on the locked
+            # rows, so only one of concurrent claimers gets each checkpoint
+            session.query(DbCheckpoint).filter(
+                DbCheckpoint.pid.in_(pids),
+                DbCheckpoint.state == state,
+                or_(DbCheckpoint.lease_owner == '',
+                    DbCheckpoint.lease_owner == None,
+                    DbCheckpoint.lease_owner == owner,
+                    DbCheckpoint.lease_expiry < now)).update(
+                {'lease_owner': owner,
+                 'lease_expiry': now + datetime.timedelta(seconds=lease_time)},
+                synchronize_session=False)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+        return [res[0] for res in session.query(DbCheckpoint.pid).filter(
+            DbCheckpoint.pid.in_(pids),
+            DbCheckpoint.lease_owner == owner).all()]
+
+    def renew(self, owner, lease_time):
+        try:
+            session.query(DbCheckpoint).filter(
+                DbCheckpoint.lease_owner == owner).update(
+                {'lease_expiry': timezone.now() +
+                 datetime.timedelta(seconds=lease_time)},
+                synchronize_session=False)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def release(self, owner, pids=None):
+        try:
+            query = session.query(DbCheckpoint).filter(
+                DbCheckpoint.lease_owner == owner)
+            if pids is not None:
+                query = query.filter(
+                    DbCheckpoint.pid.in_([str(pid) for pid in pids]))
+            query.update({'lease_owner': '', 'lease_expiry': None},
+                         synchronize_session=False)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import time
+
 from sqlalchemy.exc import SQLAlchemyError
 
 from aiida.backends.sqlalchemy import session
@@ -7,6 +9,7 @@ from aiida.backends.sqlalchemy.models.lock import DbLock
 from aiida.common.exceptions import (InternalError, ModificationNotAllowed,
                                      LockPresent)
 from aiida.orm.implementation.general.lock import AbstractLockManager, AbstractLock
+from aiida.utils import timezone
 
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
@@ -43,6 +46,21 @@ class LockManager(AbstractLockManager):
         with session.begin(subtransactions=True):
             DbLock.query.delete()
 
+    def clear(self, key, expired_only=False, owner=None):
+        old_lock = DbLock.query.filter_by(key=key).first()
+        if old_lock is None:
+            return False
+
+        if owner is not None and old_lock.owner != owner:
+            return False
+        if expired_only and not Lock(old_lock).isexpired:
+            return False
+        # Only this very lock, not one created by someone else in the meantime
+        deleted = DbLock.query.filter_by(
+            key=key, creation=old_lock.creation).delete()
+        session.commit()
+        return deleted > 0
+
 class Lock(AbstractLock):
 
     def release(self, owner="None"):
@@ -30,7 +30,6 @@ from aiida.orm.mixins import Sealable
 
 import aiida.backends.sqlalchemy
 
-import aiida.orm.autogroup
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
 __license__ = "MIT license, see LICENSE.txt file."
@@ -198,17 +197,12 @@ class Node(AbstractNode):
                 "Cannot call the internal _add_dblink_from if the "
                 "source node is not stored")
 
-        # Check for cycles. This works if the transitive closure is enabled; if
-        # it isn't, this test will never fail, but then having a circular link
-        # is not meaningful but does not pose a huge threat
+        # Check for cycles.
         #
-        # I am linking src->self; a loop would be created if a DbPath exists
-        # already in the TC table from self to src
+        # I am linking src->self; a loop would be created if a path exists
+        # already from self to src
         if link_type is LinkType.CREATE or link_type is LinkType.INPUT:
-            c = session.query(literal(True)).filter(DbPath.query
-                                                .filter_by(parent_id=self.dbnode.id, child_id=src.dbnode.id)
-                                                .exists()).scalar()
-            if c:
+            if self._path_exists([(self.dbnode.id, src.dbnode.id)]):
                 raise ValueError(
                     "The link you are attempting to create would generate a loop")
 
@@ -253,6 +247,84 @@ class Node(AbstractNode):
                                   "name (raw message was {})"
                                   "".format(e))
 
+    @staticmethod
+    def _path_exists(pairs):
+        """
+        Return whether a path exists from the first to the second node of
+        any of the given pairs.
+
+        The DbPath table is used, unless disabled (see
+        :func:`aiida.backends.utils.is_dbpath_enabled`): in that case the
+        links are walked with a recursive query, starting from the first
+        nodes.
+
+        :param pairs: a list of tuples (parent id, child id)
+        :return: a boolean
+        """
+        from sqlalchemy import and_, or_, select
+        from sqlalchemy.orm import aliased
+        from aiida.backends.sqlalchemy import session
+        from aiida.backends.utils import is_dbpath_enabled
+
+        if not pairs:
+            return False
+
+        if is_dbpath_enabled():
+            paths = DbPath.query.filter(or_(*[
+                and_(DbPath.parent_id == parent, DbPath.child_id == child)
+                for parent, child in pairs]))
+        else:
+            parents = set(parent for parent, _ in pairs)
+            walk = select([
+                DbLink.input_id.label('parent_id'),
+                DbLink.output_id.label('child_id')
+            ]).where(DbLink.input_id.in_(parents)).cte(recursive=True)
+            link = aliased(DbLink)
+            # UNION (rather than UNION ALL) discards the pairs already found,
+            # so that each pair is walked only once
+            walk = walk.union(select([
+                walk.c.parent_id,
+                link.output_id
+            ]).where(link.input_id == walk.c.child_id))
+            paths = session.query(walk).filter(or_(*[
+                and_(walk.c.parent_id == parent, walk.c.child_id == child)
+                for parent, child in pairs]))
+
+        return session.query(literal(True)).filter(
+            paths.exists()).scalar() or False
+
+    @classmethod
+    def _add_dblinks(cls, links, with_transaction=True):
+        from aiida.backends.sqlalchemy import session
+
+        links = list(links)
+        to_check = cls._check_dblinks(links)
+        if not links:
+            return
+
+        # Check for cycles all together, see _add_dblink_from
+        if cls._path_exists([(dest.dbnode.id, src.dbnode.id)
+                             for dest, src in to_check]):
+            raise ValueError(
+                "The link you are attempting to create would generate a loop")
+
+        try:
+            with session.begin_nested():
+                session.bulk_insert_mappings(DbLink, [
+                    {'input_id': src.dbnode.id, 'output_id': dest.dbnode.id,
+                     'label': label, 'type': link_type.value}
+                    for src, dest, label, link_type in links])
+        except SQLAlchemyError as e:
+            raise UniquenessError("There is already a link with the same "
+                                  "name (raw message was {})"
+                                  "".format(e))
+        if with_transaction:
+            try:
+                session.commit()
+            except SQLAlchemyError:
+                session.rollback()
+                raise
+
     def get_inputs(self, node_type=None, also_labels=False, only_in_db=False,
                    link_type=None):
 
@@ -642,9 +714,10 @@ class Node(AbstractNode):
         # stored
         links_to_store = list(self._inputlinks_cache.keys())
 
-        for label in links_to_store:
-            src, link_type = self._inputlinks_cache[label]
-            self._add_dblink_from(src, label, link_type)
+        self._add_dblinks(
+            [(self._inputlinks_cache[label][0], self, label,
+              self._inputlinks_cache[label][1])
+             for label in links_to_store], with_transaction=False)
         # If everything went smoothly, clear the entries from the cache.
         # I do it here because I delete them all at once if no error
         # occurred; otherwise, links will not be stored and I
@@ -732,32 +805,148 @@ class Node(AbstractNode):
                 raise
 
             # Set up autogrouping used be verdi run
-            autogroup = aiida.orm.autogroup.current_autogroup
-            grouptype = aiida.orm.autogroup.VERDIAUTOGROUP_TYPE
+            self._add_to_autogroup([self])
 
-            if autogroup is not None:
-                if not isinstance(autogroup, aiida.orm.autogroup.Autogroup):
-                    raise ValidationError("current_autogroup is not an AiiDA Autogroup")
+        return self
 
-                if autogroup.is_to_be_grouped(self):
-                    group_name = autogroup.get_group_name()
-                    if group_name is not None:
-                        g = Group.get_or_create(name=group_name, type_string=grouptype)[0]
-                        g.add_nodes(self)
+    @classmethod
+    def store_many(cls, nodes, with_transaction=True):
+        from sqlalchemy import text
+        from aiida.backends.sqlalchemy import session
 
-        return self
+        nodes = list(nodes)
+        cls._check_store_many(nodes)
+
+        # The nodes with their own store() are stored with it
+        to_insert = [node for node in nodes
+                     if type(node).store.im_func is Node.store.im_func]
+        to_store = [node for node in nodes
+                    if type(node).store.im_func is not Node.store.im_func]
+        attrs_caches = [node._attrs_cache for node in to_insert]
+        # What store() consumes, to restore the nodes on failure
+        to_store_caches = [(node._attrs_cache, dict(node._inputlinks_cache))
+                           for node in to_store]
+
+        # As in store, the files are moved before storing the DB entries
+        moved = []
+        try:
+            for node in to_insert:
+                node._repository_folder.replace_with_folder(
+                    node._get_temp_folder().abspath, move=True,
+                    overwrite=True)
+                moved.append(node)
+
+            if to_insert:
+                # The ids are reserved with a single query, so that the rows
+                # (with their attributes) are inserted together at the flush
+                ids = [id_ for id_, in session.execute(text(
+                    "SELECT nextval('db_dbnode_id_seq') "
+                    "FROM generate_series(1, :num)"),
+                    {'num': len(to_insert)})]
+                for node, attrs, id_ in zip(to_insert, attrs_caches, ids):
+                    node.dbnode.id = id_
+                    node.dbnode.attributes = attrs
+                session.add_all([node.dbnode for node in to_insert])
+                session.flush()
+
+            for node in to_insert:
+                del node._attrs_cache
+                node._to_be_stored = False
+
+            for node in to_store:
+                node.store(with_transaction=False)
+
+            cls._add_dblinks(
+                [(src, node, label, link_type) for node in to_insert
+                 for label, (src, link_type)
+                 in node._inputlinks_cache.iteritems()],
+                with_transaction=False)
+
+            if with_transaction:
+                session.commit()
+
+        # This is one of the few cases where it is ok to do a 'global'
+        # except, also because I am re-raising the exception
+        except:
+            if with_transaction:
+                session.rollback()
+            for node, attrs in zip(to_insert, attrs_caches):
+                node._attrs_cache = attrs
+                node._to_be_stored = True
+                node.dbnode.id = None
+            # I put back the files in the sandbox folders since the
+            # transaction did not succeed
+            for node in moved:
+                node._get_temp_folder().replace_with_folder(
+                    node._repository_folder.abspath, move=True,
+                    overwrite=True)
+            # The same for the nodes stored with their own store()
+            for node, (attrs, links) in zip(to_store, to_store_caches):
+                if node._to_be_stored:
+                    continue
+                node._attrs_cache = attrs
+                node._inputlinks_cache.clear()
+                node._inputlinks_cache.update(links)
+                node._to_be_stored = True
+                node.dbnode.id = None
+                node._get_temp_folder().replace_with_folder(
+                    node._repository_folder.abspath, move=True,
+                    overwrite=True)
+            raise
+
+        for node in to_insert:
+            node._inputlinks_cache.clear()
+            node._temp_folder = None
+
+        # Set up autogrouping used be verdi run
+        cls._add_to_autogroup(to_insert)
+
+        return nodes
+
+    @classmethod
+    def prefetch_attributes(cls, nodes):
+        from sqlalchemy import inspect
+        from sqlalchemy.orm.attributes import set_committed_value
+        from aiida.backends.sqlalchemy import session
+
+        nodes = list(nodes)
+        # The attributes are loaded together with the rows, but they are
+        # expired (as all the other columns) by every commit of the session
+        to_load = {}
+        for node in nodes:
+            if node._to_be_stored:
+                continue
+            state = inspect(node.dbnode)
+            if 'attributes' in state.unloaded and state.identity is not None:
+                # The pk is taken from the identity, as reading the id of an
+                # expired row would load it again
+                to_load.setdefault(state.identity[0], []).append(node.dbnode)
+
+        pks = to_load.keys()
+        for i in range(0, len(pks), 500):
+            for pk, attributes in session.query(
+                    DbNode.id, DbNode.attributes).filter(
+                    DbNode.id.in_(pks[i:i + 500])):
+                for dbnode in to_load[pk]:
+                    set_committed_value(dbnode, 'attributes', attributes)
+
+        return nodes
 
     @property
     def has_children(self):
-        #~ from aiida.backends.sqlalchemy.model.node import DbNode
-        return self.dbnode.outputs_q.all()
-        #~ return session.query(literal(True)).filter(
-            #~ self.dbnode.child_paths.exists()).scalar() or False
+        from aiida.backends.sqlalchemy import session
+        # A node has descendants if and only if it has direct outputs
+        return session.query(literal(True)).filter(
+            DbLink.query.filter_by(input_id=self.dbnode.id).exists()
+        ).scalar() or False
 
     @property
     def has_parents(self):
+        from aiida.backends.sqlalchemy import session
+        # A node has ancestors if and only if it has direct inputs
         return session.query(literal(True)).filter(
-            self.dbnode.parent_paths.exists()).scalar() or False
+            DbLink.query.filter_by(output_id=self.dbnode.id).exists()
+        ).scalar() or False
 
     @property
     def uuid(self):
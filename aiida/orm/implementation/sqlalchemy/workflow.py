@@ -724,6 +724,52 @@ def get_all_running_steps():
     from aiida.backends.sqlalchemy.models.workflow import DbWorkflowStep
     return DbWorkflowStep.query.filter_by(state=wf_states.RUNNING).all()
 
+
+def get_all_running_steps_with_states():
+    """
+    Get all the RUNNING steps, with the states of their calculations and
+    sub-workflows, using a fixed number of queries.
+
+    :return: a list of tuples (step, calc_states, sub_workflow_states), where
+      step is a DbWorkflowStep (with its parent already fetched),
+      calc_states a dictionary {calculation pk: state} (the state being
+      None for calculations with no state in the DB) and
+      sub_workflow_states a dictionary {sub-workflow pk: state}
+    """
+    from collections import defaultdict
+    from sqlalchemy.orm import joinedload
+    from aiida.backends.sqlalchemy import session
+    from aiida.backends.sqlalchemy.models.workflow import (
+        table_workflowstep_calc, table_workflowstep_subworkflow)
+
+    steps = DbWorkflowStep.query.filter_by(state=wf_states.RUNNING).options(
+        joinedload(DbWorkflowStep.parent)).all()
+    step_ids = [s.id for s in steps]
+    calcs = defaultdict(dict)
+    sub_workflows = defaultdict(dict)
+
+    if step_ids:
+        # DbNode.state is the most recent state, as in JobCalculation.get_state
+        for step_id, pk, state in session.query(
+                table_workflowstep_calc.c.dbworkflowstep_id, DbNode.id,
+                DbNode.state).join(
+                DbNode, DbNode.id == table_workflowstep_calc.c.dbnode_id
+                ).filter(
+                table_workflowstep_calc.c.dbworkflowstep_id.in_(step_ids)):
+            calcs[step_id][pk] = state.value if state else None
+
+        for step_id, pk, state in session.query(
+                table_workflowstep_subworkflow.c.dbworkflowstep_id,
+                DbWorkflow.id, DbWorkflow.state).join(
+                DbWorkflow,
+                DbWorkflow.id == table_workflowstep_subworkflow.c.dbworkflow_id
+                ).filter(
+                table_workflowstep_subworkflow.c.dbworkflowstep_id.in_(
+                    step_ids)):
+            sub_workflows[step_id][pk] = state.value if state else None
+
+    return [(s, calcs[s.id], sub_workflows[s.id]) for s in steps]
+
 def get_workflow_info(w, tab_size=2, short=False, pre_string="",
                       depth=16):
     """
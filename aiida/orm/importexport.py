@@ -2004,7 +2004,7 @@ def export_tree_sqla(what, folder, also_parents = True, also_calc_outputs=True,
       models.
     :param folder: a :py:class:`Folder <aiida.common.folders.Folder>` object
     :param also_parents: if True, also all the parents are stored (from th
-      DbPath transitive closure table)
+      DbPath transitive closure table, or walking the links if it is disabled)
     :param also_calc_outputs: if True, any output of a calculation is also exported
     :param allowed_licenses: a list or a function. If a list, then checks
       whether all licenses of Data nodes are in the list. If a function,
@@ -2402,7 +2402,7 @@ def export_tree_dj(what, folder, also_parents = True, also_calc_outputs=True,
       models.
     :param folder: a :py:class:`Folder <aiida.common.folders.Folder>` object
     :param also_parents: if True, also all the parents are stored (from th
-      DbPath transitive closure table)
+      DbPath transitive closure table, or walking the links if it is disabled)
     :param also_calc_outputs: if True, any output of a calculation is also exported
     :param allowed_licenses: a list or a function. If a list, then checks
       whether all licenses of Data nodes are in the list. If a function,
@@ -2424,6 +2424,7 @@ def export_tree_dj(what, folder, also_parents = True, also_calc_outputs=True,
 
     import aiida
     from aiida.backends.djsite.db import models
+    from aiida.backends.utils import is_dbpath_enabled
     from aiida.orm import Node, Calculation
     from aiida.common.exceptions import LicensingException
     from aiida.common.folders import RepositoryFolder
@@ -2451,9 +2452,17 @@ def export_tree_dj(what, folder, also_parents = True, also_calc_outputs=True,
 
         if given_nodes:
             # Also add the parents (to any level) to the query
-            given_nodes = list(set(given_nodes +
-                                   list(models.DbNode.objects.filter(
-                                       children__in=given_nodes).values_list('pk', flat=True))))
+            if is_dbpath_enabled():
+                parents = list(models.DbNode.objects.filter(
+                    children__in=given_nodes).values_list('pk', flat=True))
+            else:
+                from aiida.orm.querybuilder import QueryBuilder
+                qb = QueryBuilder()
+                qb.append(Node, tag='low_node',
+                          filters={'id': {'in': given_nodes}})
+                qb.append(Node, ancestor_of='low_node', project=['id'])
+                parents = [_ for [_] in qb.all()]
+            given_nodes = list(set(given_nodes + parents))
             entries_ids_to_add[get_class_string(models.DbNode)] = given_nodes
 
     if also_calc_outputs:
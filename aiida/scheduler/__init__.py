@@ -44,8 +44,18 @@ class Scheduler(object):
     # 'can_query_by_user': True if I can pass the 'user' argument to
     # get_joblist_command (and in this case, no 'jobs' should be given).
     # Otherwise, if False, a list of jobs is passed, and no 'user' is given.
+    # 'can_submit_array': True if many jobs can be submitted as the tasks of
+    # a single job array (see get_array_submit_script and submit_array); the
+    # plugin must then list each task of an array as a separate job, with
+    # the job id returned by _get_array_task_job_id.
     _features = {}
 
+    # The environment variable with the index of the current task, within
+    # the job of a job array
+    _array_task_id_variable = None
+    # The index of the first task of a job array
+    _array_first_task_index = 0
+
     # The class to be used for the job resource.
     _job_resource_class = None
 
@@ -403,6 +413,228 @@ stderr:
             self._get_submit_command(escape_for_bash(submit_script)))
         return self._parse_submit_output(retval, stdout, stderr)
 
+    def _get_array_directive(self, num_tasks):
+        """
+        Return the header line to request a job array with num_tasks tasks,
+        numbered starting from _array_first_task_index.
+
+        To be implemented by the plugins supporting job arrays.
+        """
+        raise NotImplementedError
+
+    def _get_array_task_job_id(self, array_job_id, task_index):
+        """
+        Return the job id of a single task of a job array, as listed by the
+        joblist command.
+
+        To be implemented by the plugins supporting job arrays.
+
+        :param array_job_id: the job id of the array, as returned by
+            _parse_array_submit_output
+        :param task_index: the index of the task within the array
+        """
+        raise NotImplementedError
+
+    def _parse_array_submit_output(self, retval, stdout, stderr):
+        """
+        Parse the output of the submit command used to submit a job array.
+
+        :return: a string with the job id of the array.
+        """
+        return self._parse_submit_output(retval, stdout, stderr)
+
+    def get_array_submit_script(self, job_tmpl, task_directories, task_script):
+        """
+        Return the script to submit a job array, whose i-th task goes in the
+        i-th of the task_directories and runs there the task_script (a
+        submit script as returned by get_submit_script).
+
+        All tasks run with the same scheduler requirements, taken from
+        job_tmpl. Each task writes the scheduler output and error files
+        defined in job_tmpl in its own directory, while the output files of
+        the scheduler for the whole array are left in the directory the
+        array is submitted from.
+
+        :param job_tmpl: a JobTemplate instance with the requirements of
+            each task.
+        :param task_directories: a list of absolute paths, one for each task.
+        :param task_script: the name of the script to run in each directory.
+        """
+        from aiida.common.exceptions import InternalError
+
+        if not isinstance(job_tmpl, JobTemplate):
+            raise InternalError("job_tmpl should be of type JobTemplate")
+
+        array_tmpl = job_tmpl.copy()
+        array_tmpl.sched_output_path = None
+        array_tmpl.sched_error_path = None
+        array_tmpl.sched_join_files = True
+
+        redirections = ""
+        if job_tmpl.sched_output_path:
+            redirections += " > {}".format(
+                escape_for_bash(job_tmpl.sched_output_path))
+        if job_tmpl.sched_join_files:
+            redirections += " 2>&1"
+        elif job_tmpl.sched_error_path:
+            redirections += " 2> {}".format(
+                escape_for_bash(job_tmpl.sched_error_path))
+
+        empty_line = ""
+
+        script_lines = []
+        script_lines.append("#!/bin/bash")
+        script_lines.append(empty_line)
+        script_lines.append(self._get_array_directive(len(task_directories)))
+        script_lines.append(self._get_submit_script_header(array_tmpl))
+        script_lines.append(empty_line)
+
+        script_lines.append('case "${}" in'.format(
+            self._array_task_id_variable))
+        for task_index, directory in enumerate(task_directories,
+                                               self._array_first_task_index):
+            script_lines.append("    {}) cd {} ;;".format(
+                task_index, escape_for_bash(directory)))
+        script_lines.append(
+            '    *) echo "Unknown task ${}" >&2; exit 1 ;;'.format(
+                self._array_task_id_variable))
+        script_lines.append("esac")
+        script_lines.append(empty_line)
+
+        script_lines.append("exec bash {}{}".format(
+            escape_for_bash(task_script), redirections))
+        script_lines.append(empty_line)
+
+        return "\n".join(script_lines)
+
+    def submit_array(self, working_directory, submit_script, num_tasks):
+        """
+        Goes in the working directory and submits the submit_script, that
+        must define a job array with num_tasks tasks (see
+        get_array_submit_script).
+
+        Typically, this function does not need to be modified by the plugins.
+
+        :return: a list with the job ids of the tasks, in order, in a valid
+            format to be used for querying.
+        """
+        self.transport.chdir(working_directory)
+        retval, stdout, stderr = self.transport.exec_command_wait(
+            self._get_submit_command(escape_for_bash(submit_script)))
+        array_job_id = self._parse_array_submit_output(retval, stdout, stderr)
+        return [self._get_array_task_job_id(array_job_id, task_index)
+                for task_index in range(
+                    self._array_first_task_index,
+                    self._array_first_task_index + num_tasks)]
+
+    # Markers used to split the output of _get_submit_many_command
+    _SUBMIT_MANY_BEGIN = '__AIIDA_SUBMIT_BEGIN__'
+    _SUBMIT_MANY_STDERR = '__AIIDA_SUBMIT_STDERR__'
+    _SUBMIT_MANY_END = '__AIIDA_SUBMIT_END__'
+
+    def _get_submit_many_command(self, scripts):
+        """
+        Return a single bash command that goes in each working directory and
+        submits the corresponding script, printing between markers the
+        index of the script and the return value, stdout and stderr of its
+        submission.
+
+        :param scripts: a list of (working_directory, submit_script) tuples
+        """
+        lines = ['__aiida_err=$(mktemp)']
+        for index, (working_directory, submit_script) in enumerate(scripts):
+            lines.append("echo {} {}".format(self._SUBMIT_MANY_BEGIN, index))
+            lines.append(
+                '( cd {} && {{ {} ; }} ) 2>"$__aiida_err"'.format(
+                    escape_for_bash(working_directory),
+                    self._get_submit_command(escape_for_bash(submit_script))))
+            lines.append("__aiida_retval=$?")
+            lines.append('echo; echo "{} $__aiida_retval"'.format(
+                self._SUBMIT_MANY_STDERR))
+            lines.append('cat "$__aiida_err"; echo; echo {}'.format(
+                self._SUBMIT_MANY_END))
+        lines.append('rm -f "$__aiida_err"')
+        return "\n".join(lines)
+
+    def _parse_submit_many_output(self, stdout):
+        """
+        Split the output of the command returned by _get_submit_many_command.
+
+        Each submission is parsed on its own, so that the output of the
+        other ones can still be used if one of them is incomplete (e.g.
+        because the command was interrupted).
+
+        :return: a dictionary {index: result}, with the index of each
+            script whose markers were found. result is a tuple (retval,
+            stdout, stderr), or the SchedulerParsingError describing why the
+            output of that submission could not be parsed.
+        """
+        results = {}
+        chunks = stdout.split(self._SUBMIT_MANY_BEGIN + ' ')[1:]
+        for chunk in chunks:
+            try:
+                index, chunk = chunk.split('\n', 1)
+                index = int(index)
+            except ValueError:
+                # Not even the index: nothing can be done with it
+                continue
+            try:
+                job_stdout, rest = chunk.split(
+                    '\n' + self._SUBMIT_MANY_STDERR + ' ', 1)
+                retval, rest = rest.split('\n', 1)
+                if '\n' + self._SUBMIT_MANY_END not in rest:
+                    raise ValueError("End marker not found")
+                job_stderr = rest.rsplit('\n' + self._SUBMIT_MANY_END, 1)[0]
+                results[index] = (int(retval), job_stdout, job_stderr)
+            except ValueError:
+                results[index] = SchedulerParsingError(
+                    "Unable to parse the output of a multiple submission: "
+                    "{}".format(chunk))
+        return results
+
+    def submit_many_from_scripts(self, scripts):
+        """
+        Submit many scripts with a single command executed through the
+        transport, rather than with one command for each script.
+
+        Typically, this function does not need to be modified by the plugins.
+
+        :param scripts: a list of (working_directory, submit_script) tuples.
+            The working directories must be absolute paths.
+        :return: a list with, for each script and in the same order, a tuple
+            (job_id, exception): job_id is the JobID (as returned by
+            submit_from_script), or None if the submission failed or its
+            output could not be parsed, in which case exception is the
+            SchedulerError describing the failure. The job ids of the
+            submissions whose output was parsed are returned even if the
+            output of other ones is missing or incomplete.
+        """
+        if not scripts:
+            return []
+
+        retval, stdout, stderr = self.transport.exec_command_wait(
+            self._get_submit_many_command(scripts))
+        results = self._parse_submit_many_output(stdout)
+
+        job_ids = []
+        for index in range(len(scripts)):
+            result = results.get(index)
+            if result is None:
+                job_ids.append((None, SchedulerError(
+                    "Error during multiple submission: no output found for "
+                    "script {} of {}, retval={}\nstderr={}".format(
+                        index, len(scripts), retval, stderr))))
+            elif isinstance(result, SchedulerError):
+                job_ids.append((None, result))
+            else:
+                job_retval, job_stdout, job_stderr = result
+                try:
+                    job_ids.append((self._parse_submit_output(
+                        job_retval, job_stdout, job_stderr), None))
+                except SchedulerError as e:
+                    job_ids.append((None, e))
+        return job_ids
+
     def kill(self, jobid):
         """
         Kill a remote job, and try to parse the output message of the scheduler
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+A cache of the job information returned by the schedulers, so that the
+scheduler of a computer is not queried more often than a minimum interval,
+and the result of a query can be reused by all the AiiDA users having jobs
+on that computer.
+"""
+import threading
+import time
+
+import aiida.common
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+# Default value (in seconds) of the minimum time between two queries for
+# the same job
+DEFAULT_MIN_INTERVAL = 10
+
+_logger = aiida.common.aiidalogger.getChild('scheduler').getChild('cache')
+
+
+class _CacheEntry(object):
+    """
+    The jobs known for a cache key, with the time they were last queried.
+    """
+
+    def __init__(self):
+        # Job id -> (query time, JobInfo), with None instead of the JobInfo
+        # for jobs that were queried but not found
+        self.jobs = {}
+        # Held while querying the scheduler, so that concurrent requests for
+        # the same key wait for the result instead of querying again
+        self.lock = threading.Lock()
+
+
+class SchedulerStatusCache(object):
+    """
+    Keep the results of the latest scheduler queries.
+
+    Use it as::
+
+        found_jobs = cache.get_jobs(key, job_ids, query)
+
+    where key identifies the jobs visible to the query (e.g. the computer
+    pk, as job ids are unique within a scheduler), and
+    query(job_ids_to_query) actually queries the scheduler and returns a
+    dictionary {job_id: JobInfo}. The query is only done if the information
+    on some of the job_ids is missing or older than the minimum interval,
+    and only for those jobs; a query may return more jobs than requested
+    (e.g. all the jobs of a user), and they are all cached.
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        :param min_interval: the default minimum time (in seconds) between
+            two queries for the same job
+        """
+        self._min_interval = min_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _CacheEntry()
+                self._entries[key] = entry
+            return entry
+
+    def get_jobs(self, key, job_ids, query, min_interval=None):
+        """
+        Return the information on the given jobs.
+
+        :param key: a hashable identifying the jobs visible to query
+        :param job_ids: the ids of the jobs to get the information for
+        :param query: a function querying the scheduler, see the class
+            docstring. Exceptions are propagated to the caller.
+        :param min_interval: if not None, override the default minimum
+            interval of the cache (e.g. with a value specific to a computer)
+        :return: a dictionary {job_id: JobInfo} with the jobs among job_ids
+            that were found by the scheduler
+        """
+        if min_interval is None:
+            min_interval = self._min_interval
+
+        entry = self._get_entry(key)
+        with entry.lock:
+            now = time.time()
+            # Forget the jobs that are too old to be reused: this is done
+            # before choosing the jobs to query, so that all the others are
+            # still there after the query, however long it takes
+            entry.jobs = {job_id: value
+                          for job_id, value in entry.jobs.iteritems()
+                          if now - value[0] < min_interval}
+            to_query = [job_id for job_id in job_ids
+                        if job_id not in entry.jobs]
+
+            if to_query:
+                _logger.debug("Querying the scheduler for {} jobs ({} "
+                              "cached) of {}".format(
+                    len(to_query), len(job_ids) - len(to_query), key))
+                found_jobs = query(to_query)
+                now = time.time()
+                for job_id in to_query:
+                    entry.jobs[job_id] = (now, None)
+                for job_id, jobinfo in found_jobs.iteritems():
+                    entry.jobs[job_id] = (now, jobinfo)
+
+            result = {}
+            for job_id in job_ids:
+                jobinfo = entry.jobs.get(job_id, (None, None))[1]
+                if jobinfo is not None:
+                    result[job_id] = jobinfo
+            return result
+
+    def clear(self):
+        """
+        Forget all the cached information.
+        """
+        with self._lock:
+            self._entries = {}
+
+
+_scheduler_status_cache = None
+
+
+def get_scheduler_status_cache():
+    """
+    Return the scheduler status cache shared within this process (created on
+    first use, with the DAEMON_SCHEDULER_MIN_POLL_INTERVAL value of the
+    profile configuration, if set).
+    """
+    from aiida.backends import settings
+    from aiida.common.exceptions import ConfigurationError
+    from aiida.common.setup import get_profile_config
+    global _scheduler_status_cache
+
+    if _scheduler_status_cache is None:
+        try:
+            config = get_profile_config(settings.AIIDADB_PROFILE)
+        except ConfigurationError:
+            config = {}
+        _scheduler_status_cache = SchedulerStatusCache(
+            min_interval=config.get("DAEMON_SCHEDULER_MIN_POLL_INTERVAL",
+                                    DEFAULT_MIN_INTERVAL))
+    return _scheduler_status_cache
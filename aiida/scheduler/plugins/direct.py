@@ -50,6 +50,7 @@ class DirectScheduler(aiida.scheduler.Scheduler):
     # Query only by list of jobs and not by user
     _features = {
         'can_query_by_user': True,
+        'can_submit_array': False,
     }
 
     # The class to be used for the job resource.
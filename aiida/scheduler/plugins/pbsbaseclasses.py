@@ -114,6 +114,7 @@ class PbsBaseClass(aiida.scheduler.Scheduler):
     # Query only by list of jobs and not by user
     _features = {
         'can_query_by_user': False,
+        'can_submit_array': True,
     }
 
     # The class to be used for the job resource.
@@ -121,6 +122,10 @@ class PbsBaseClass(aiida.scheduler.Scheduler):
 
     _map_status = _map_status_pbs_common
 
+    # The qsub option to request a job array, to be redefined in subclasses
+    # together with _array_task_id_variable
+    _array_option = None
+
     def _get_resource_lines(self, num_machines, num_mpiprocs_per_machine,
                             num_cores_per_machine, max_memory_kb, max_wallclock_seconds):
         """
@@ -143,12 +148,12 @@ class PbsBaseClass(aiida.scheduler.Scheduler):
         """
         The command to report full information on existing jobs.
 
-        TODO: in the case of job arrays, decide what to do (i.e., if we want
-              to pass the -t options to list each subjob).
+        The -t option lists also each subjob of job arrays, with its own
+        job id.
         """
         from aiida.common.exceptions import FeatureNotAvailable
 
-        command = ['qstat', '-f']
+        command = ['qstat', '-f', '-t']
 
         if jobs and user:
             raise FeatureNotAvailable("Cannot query by user and job(s) in PBS")
@@ -751,6 +756,21 @@ class PbsBaseClass(aiida.scheduler.Scheduler):
 
         return stdout.strip()
 
+    def _get_array_directive(self, num_tasks):
+        return "#PBS -{} {}-{}".format(
+            self._array_option, self._array_first_task_index,
+            self._array_first_task_index + num_tasks - 1)
+
+    def _get_array_task_job_id(self, array_job_id, task_index):
+        """
+        The job id of a job array has the form 1234[].server, the one of
+        each subjob the form 1234[5].server
+        """
+        if '[]' not in array_job_id:
+            raise SchedulerError("'{}' is not the job id of a job "
+                                 "array".format(array_job_id))
+        return array_job_id.replace('[]', '[{}]'.format(task_index), 1)
+
     def _get_kill_command(self, jobid):
         """
         Return the command to kill the job with specified jobid.
@@ -45,6 +45,9 @@ class PbsproScheduler(PbsBaseClass):
     ## for the time being, but I can redefine it if needed.
     #_map_status = _map_status_pbs_common
 
+    _array_option = 'J'
+    _array_task_id_variable = 'PBS_ARRAY_INDEX'
+
     def _get_resource_lines(self, num_machines, num_mpiprocs_per_machine,
                             num_cores_per_machine, max_memory_kb, max_wallclock_seconds):
         """
@@ -99,17 +99,22 @@ class SgeScheduler(aiida.scheduler.Scheduler):
     # user, but not by job id
     _features = {
         'can_query_by_user': True,
+        'can_submit_array': True,
         }
     
     # The class to be used for the job resource.
     _job_resource_class = SgeJobResource
+
+    _array_task_id_variable = 'SGE_TASK_ID'
+    # In SGE, the tasks of a job array are numbered starting from 1
+    _array_first_task_index = 1
     
     def _get_joblist_command(self,jobs=None,user=None):
         """
         The command to report full information on existing jobs.
 
-        TODO: in the case of job arrays, decide what to do (i.e., if we want
-              to pass the -t options to list each subjob).
+        The tasks of job arrays are reported in the 'tasks' element of
+        each job, see _parse_joblist_output.
         
         !!!ALL COPIED FROM PBSPRO!!!
         TODO: understand if it is worth escaping the username, 
@@ -466,11 +471,72 @@ class SgeScheduler(aiida.scheduler.Scheduler):
                 except IndexError:
                     self.logger.warning("No 'slots' field for job "
                                   "id {}".format(this_job.job_id))
-                
-            joblist.append(this_job)
+
+            # For job arrays, one element is listed for each running task
+            # and one for all pending tasks, in the 'tasks' field
+            try:
+                job_element = job.getElementsByTagName('tasks').pop(0)
+                element_child = job_element.childNodes.pop(0)
+                tasks = str(element_child.data).strip()
+            except IndexError:
+                joblist.append(this_job)
+                continue
+
+            try:
+                task_indices = self._parse_tasks(tasks)
+            except ValueError:
+                self.logger.warning("Unable to parse the tasks '{}' of job "
+                                    "id {}".format(tasks, this_job.job_id))
+                joblist.append(this_job)
+                continue
+
+            array_job_id = this_job.job_id
+            for task_index in task_indices:
+                task_job = this_job.copy()
+                task_job.job_id = self._get_array_task_job_id(
+                    array_job_id, task_index)
+                joblist.append(task_job)
+
         #self.logger.debug("joblist final: {}".format(joblist))
         return joblist
 
+    @staticmethod
+    def _parse_tasks(tasks):
+        """
+        Return the list of task indices described by the 'tasks' field of
+        qstat, a comma-separated list of indices or first-last:step ranges
+        (e.g. 1-7:2,10).
+        """
+        task_indices = []
+        for task_range in tasks.split(','):
+            if '-' in task_range:
+                first, rest = task_range.split('-')
+                if ':' in rest:
+                    last, step = rest.split(':')
+                else:
+                    last, step = rest, 1
+                task_indices.extend(range(int(first), int(last) + 1,
+                                          int(step)))
+            else:
+                task_indices.append(int(task_range))
+        return task_indices
+
+    def _get_array_directive(self, num_tasks):
+        return "#$ -t {}-{}".format(
+            self._array_first_task_index,
+            self._array_first_task_index + num_tasks - 1)
+
+    def _get_array_task_job_id(self, array_job_id, task_index):
+        return "{}.{}".format(array_job_id, task_index)
+
+    def _parse_array_submit_output(self, retval, stdout, stderr):
+        """
+        With -terse, qsub prints the job id of a job array followed by the
+        range of its tasks, e.g. 1234.1-10:1
+        """
+        return self._parse_submit_output(
+            retval, stdout, stderr).split('.')[0]
+
     def _parse_submit_output(self, retval, stdout, stderr):
         """
         Parse the output of the submit command, as returned by executing the
@@ -102,6 +102,11 @@ _time_regexp = re.compile(
 # Separator between fields in the output of squeue
 _field_separator = "^^^"
 
+# The job id of the pending tasks of a job array, when they are not listed
+# one per line, e.g. 65541_[3-5,7%2] (%2 is the maximum number of tasks
+# running at the same time)
+_array_tasks_regexp = re.compile(r'^(?P<jobid>\d+)_\[(?P<tasks>[^\]]+)\]$')
+
 class SlurmJobResource(NodeNumberJobResource):
     def __init__(self, *args, **kwargs):
         """
@@ -153,11 +158,14 @@ class SlurmScheduler(aiida.scheduler.Scheduler):
     # Query only by list of jobs and not by user
     _features = {
         'can_query_by_user': False,
+        'can_submit_array': True,
         }
     
     # The class to be used for the job resource.
     _job_resource_class = SlurmJobResource
 
+    _array_task_id_variable = 'SLURM_ARRAY_TASK_ID'
+
     # Fields to query or to parse
     # Unavailable fields: substate, cputime
     fields = [
@@ -191,7 +199,9 @@ class SlurmScheduler(aiida.scheduler.Scheduler):
         
         # I add the environment variable SLURM_TIME_FORMAT in front to be
         # sure to get the times in 'standard' format
+        # --array lists each task of a job array on a separate line
         command = ["SLURM_TIME_FORMAT='standard'", "squeue", "--noheader",
+                   "--array",
                    "-o '{}'".format(_field_separator.join(
                        _[0] for _ in self.fields))]
 
@@ -644,10 +654,51 @@ class SlurmScheduler(aiida.scheduler.Scheduler):
                         this_job.num_machines))
 
             # I append to the list of jobs to return
-            job_list.append(this_job)
+            job_list.extend(self._expand_array_tasks(this_job))
 
         return job_list
 
+    def _expand_array_tasks(self, job):
+        """
+        Return a list with a JobInfo for each task, if job describes many
+        tasks of a job array at once (e.g. 65541_[3-5,7]), or a list with
+        just job otherwise.
+        """
+        match = _array_tasks_regexp.match(job.job_id)
+        if match is None:
+            return [job]
+
+        # Remove the limit on the number of simultaneous tasks
+        tasks = match.group('tasks').split('%')[0]
+        task_indices = []
+        try:
+            for task_range in tasks.split(','):
+                if '-' in task_range:
+                    first, last = task_range.split('-')
+                    task_indices.extend(range(int(first), int(last) + 1))
+                else:
+                    task_indices.append(int(task_range))
+        except ValueError:
+            self.logger.warning("Unable to parse the tasks of the job "
+                                "array {}".format(job.job_id))
+            return [job]
+
+        jobs = []
+        for task_index in task_indices:
+            task_job = job.copy()
+            task_job.job_id = self._get_array_task_job_id(
+                match.group('jobid'), task_index)
+            jobs.append(task_job)
+        return jobs
+
+    def _get_array_directive(self, num_tasks):
+        return "#SBATCH --array={}-{}".format(
+            self._array_first_task_index,
+            self._array_first_task_index + num_tasks - 1)
+
+    def _get_array_task_job_id(self, array_job_id, task_index):
+        return "{}_{}".format(array_job_id, task_index)
+
     def _convert_time(self,string):
         """
         Convert a string in the format DD-HH:MM:SS to a number of seconds.
@@ -85,5 +85,81 @@ class TestParserGetJobList(unittest.TestCase):
         self.assertIn("11383", job_ids)
 
 
+class TestSubmitMany(unittest.TestCase):
+    """
+    Test the submission of many scripts with a single command.
+    """
+
+    def test_submit_many_from_scripts(self):
+        import os
+        import shutil
+        import tempfile
+        from aiida.transport.plugins.local import LocalTransport
+
+        base_dir = tempfile.mkdtemp()
+        try:
+            working_dirs = []
+            for i in range(2):
+                working_dir = os.path.join(base_dir, str(i))
+                os.mkdir(working_dir)
+                with open(os.path.join(working_dir, 'job.sh'), 'w') as f:
+                    f.write("true\n")
+                working_dirs.append(working_dir)
+            missing_dir = os.path.join(base_dir, 'missing')
+
+            s = DirectScheduler()
+            with LocalTransport() as t:
+                s.set_transport(t)
+                results = s.submit_many_from_scripts(
+                    [(working_dirs[0], 'job.sh'),
+                     (missing_dir, 'job.sh'),
+                     (working_dirs[1], 'job.sh')])
+        finally:
+            shutil.rmtree(base_dir)
+
+        self.assertEqual(len(results), 3)
+        for job_id, error in (results[0], results[2]):
+            self.assertIsNone(error)
+            self.assertTrue(job_id.isdigit())
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], SchedulerError)
+
+    def test_parse_submit_many_output(self):
+        s = DirectScheduler()
+        stdout = ("{begin} 0\n123\n\n{stderr} 0\n\n{end}\n"
+                  "{begin} 1\n\n{stderr} 1\nerror\n\n{end}\n").format(
+            begin=s._SUBMIT_MANY_BEGIN, stderr=s._SUBMIT_MANY_STDERR,
+            end=s._SUBMIT_MANY_END)
+        self.assertEqual(s._parse_submit_many_output(stdout),
+                         {0: (0, '123\n', ''), 1: (1, '', 'error\n')})
+
+    def test_submit_many_partial_output(self):
+        """
+        The job ids found are returned even if the output of the other
+        submissions is missing or incomplete.
+        """
+        from aiida.scheduler import SchedulerParsingError
+
+        s = DirectScheduler()
+        # The command was interrupted while submitting the second script
+        stdout = ("{begin} 0\n123\n\n{stderr} 0\n\n{end}\n"
+                  "{begin} 1\n456\n").format(
+            begin=s._SUBMIT_MANY_BEGIN, stderr=s._SUBMIT_MANY_STDERR,
+            end=s._SUBMIT_MANY_END)
+
+        class FakeTransport(object):
+            def exec_command_wait(self, command):
+                return 255, stdout, 'Connection closed'
+
+        s.set_transport(FakeTransport())
+        results = s.submit_many_from_scripts(
+            [('/dir0', 'job.sh'), ('/dir1', 'job.sh'), ('/dir2', 'job.sh')])
+        self.assertEqual(results[0], ('123', None))
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], SchedulerParsingError)
+        self.assertIsNone(results[2][0])
+        self.assertIsInstance(results[2][1], SchedulerError)
+
+
 if __name__ == '__main__':        
     unittest.main()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from aiida.scheduler.plugins.pbspro import *
 from aiida.scheduler.datastructures import job_states
+from aiida.scheduler import SchedulerError
 import unittest
 # import logging
 import uuid
@@ -893,6 +894,17 @@ class TestParserQstat(unittest.TestCase):
 #            job_list = s._parse_joblist_output(retval, stdout, stderr)
 #            #            print s._logger._log, dir(s._logger._log),'!!!!'
 
+class TestJobArrays(unittest.TestCase):
+    def test_array_task_job_id(self):
+        s = PbsproScheduler()
+
+        self.assertEquals(s._get_array_directive(3), '#PBS -J 0-2')
+        self.assertEquals(s._get_array_task_job_id('68350[].mycluster', 2),
+                          '68350[2].mycluster')
+        with self.assertRaises(SchedulerError):
+            s._get_array_task_job_id('68350.mycluster', 2)
+
+
 class TestSubmitScript(unittest.TestCase):
     def test_submit_script(self):
         """
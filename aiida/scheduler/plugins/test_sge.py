@@ -221,6 +221,21 @@ class TestCommand(unittest.TestCase):
             sge_parse_submit_output=sge._parse_submit_output(1,'','')
         logging.disable(logging.NOTSET)
                 
+    def test_parse_array_submit_output(self):
+        sge=SgeScheduler()
+
+        self.assertEquals(
+            sge._parse_array_submit_output(0, '1176936.1-4:1\n', ''),
+            '1176936')
+        self.assertEquals(sge._get_array_task_job_id('1176936', 2),
+                          '1176936.2')
+
+    def test_parse_tasks(self):
+        sge=SgeScheduler()
+
+        self.assertEquals(sge._parse_tasks('3'), [3])
+        self.assertEquals(sge._parse_tasks('1-7:2,10'), [1, 3, 5, 7, 10])
+
     def test_parse_joblist_output(self):
         sge=SgeScheduler()
         
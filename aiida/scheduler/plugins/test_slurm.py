@@ -331,5 +331,54 @@ class TestSubmitScript(unittest.TestCase):
 
 
 
+class TestJobArrays(unittest.TestCase):
+    def test_parse_array_tasks(self):
+        """
+        Test that the pending tasks of a job array listed on a single line
+        are returned as separate jobs.
+        """
+        s = SlurmScheduler()
+
+        stdout = ("863100_[1-3,5%2]^^^PD^^^Resources^^^n/a^^^user2^^^1^^^1^^^"
+                  "(Resources)^^^normal^^^10:00^^^0:00^^^N/A^^^aiida-array^^^"
+                  "2013-05-22T04:23:59\n"
+                  "863100_0^^^R^^^None^^^rosa1^^^user2^^^1^^^32^^^nid00471^^^"
+                  "normal^^^10:00^^^0:10^^^2013-05-23T11:44:11^^^aiida-array^^^"
+                  "2013-05-22T04:23:59\n")
+        job_list = s._parse_joblist_output(0, stdout, '')
+
+        self.assertEquals(
+            sorted(j.job_id for j in job_list),
+            ['863100_0', '863100_1', '863100_2', '863100_3', '863100_5'])
+        self.assertEquals(
+            len([j for j in job_list if j.job_state == job_states.QUEUED]), 4)
+
+    def test_array_submit_script(self):
+        from aiida.scheduler.datastructures import JobTemplate
+
+        s = SlurmScheduler()
+
+        job_tmpl = JobTemplate()
+        job_tmpl.job_name = 'aiida-array'
+        job_tmpl.job_resource = s.create_job_resource(
+            num_machines=1, num_mpiprocs_per_machine=1)
+        job_tmpl.sched_output_path = '_scheduler-stdout.txt'
+        job_tmpl.sched_error_path = '_scheduler-stderr.txt'
+
+        script = s.get_array_submit_script(
+            job_tmpl, ['/scratch/a', '/scratch/b'], '_aiidasubmit.sh')
+
+        self.assertTrue('#SBATCH --array=0-1' in script)
+        self.assertTrue('#SBATCH --nodes=1' in script)
+        # The scheduler output files are written by each task
+        self.assertFalse('#SBATCH --output' in script)
+        self.assertTrue("0) cd '/scratch/a' ;;" in script)
+        self.assertTrue("1) cd '/scratch/b' ;;" in script)
+        self.assertTrue("exec bash '_aiidasubmit.sh' > '_scheduler-stdout.txt'"
+                        " 2> '_scheduler-stderr.txt'" in script)
+
+        self.assertEquals(s._get_array_task_job_id('863100', 1), '863100_1')
+
+
 if __name__ == '__main__':        
     unittest.main()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from aiida.scheduler.plugins.torque import *
 from aiida.scheduler.datastructures import job_states
+from aiida.scheduler import SchedulerError
 import unittest
 # import logging
 import uuid
@@ -864,6 +865,17 @@ class TestParserQstat(unittest.TestCase):
                 self.assertTrue(j.num_cpus == num_cpus)
                 # TODO : parse the env_vars
 
+class TestJobArrays(unittest.TestCase):
+    def test_array_task_job_id(self):
+        s = TorqueScheduler()
+
+        self.assertEquals(s._get_array_directive(3), '#PBS -t 0-2')
+        self.assertEquals(s._get_array_task_job_id('68350[].mycluster', 2),
+                          '68350[2].mycluster')
+        with self.assertRaises(SchedulerError):
+            s._get_array_task_job_id('68350.mycluster', 2)
+
+
 class TestSubmitScript(unittest.TestCase):
     def test_submit_script(self):
         """
@@ -111,6 +111,26 @@ class Transport(object):
         """
         raise NotImplementedError
 
+    @property
+    def is_open(self):
+        """
+        Return True if the transport is open and can be used.
+        For transports that rely on a network connection, this also checks
+        that the connection is still alive.
+        """
+        raise NotImplementedError
+
+    def set_keepalive(self, interval):
+        """
+        Ask the transport to keep its connection alive (if it has one) by
+        sending a keepalive message every interval seconds, to be used for
+        transports that stay open for a long time.
+        Transports without a connection do not need to do anything.
+
+        :param int interval: seconds between keepalive messages, 0 to disable
+        """
+        pass
+
     def __repr__(self):
         return '<{}: {}>'.format(self.__class__.__name__, str(self))
 
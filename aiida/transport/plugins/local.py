@@ -72,6 +72,10 @@ class LocalTransport(aiida.transport.Transport):
                                    "it is already closed")
         self._is_open = False
 
+    @property
+    def is_open(self):
+        return self._is_open
+
     def __str__(self):
         """
         Return a description as a string.
@@ -485,6 +485,29 @@ class SshTransport(aiida.transport.Transport):
         self._client.close()
         self._is_open = False
 
+    @property
+    def is_open(self):
+        """
+        Return True if the transport was opened and the underlying SSH
+        connection is still active.
+        """
+        if not self._is_open:
+            return False
+        ssh_transport = self._client.get_transport()
+        return ssh_transport is not None and ssh_transport.is_active()
+
+    def set_keepalive(self, interval):
+        """
+        Send a SSH keepalive packet every interval seconds (0 to disable),
+        so that the connection is not dropped by firewalls or by the server
+        while idle.
+        """
+        if not self._is_open:
+            raise aiida.transport.TransportInternalError(
+                "Error, set_keepalive called for SshTransport "
+                "without opening the channel first")
+        self._client.get_transport().set_keepalive(interval)
+
     @property
     def sshclient(self):
         if not self._is_open:
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+A pool of open transports, to reuse the same connection to a computer
+across several operations (e.g. the different stages of the daemon) instead
+of opening and closing a new connection every time.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import aiida.common
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+# Default values (in seconds)
+# Transports not used for longer than this are closed
+DEFAULT_MAX_IDLE = 300
+# Interval between two keepalive messages on idle connections
+DEFAULT_KEEPALIVE_INTERVAL = 60
+
+_logger = aiida.common.aiidalogger.getChild('transport').getChild('pool')
+
+
+class _PoolEntry(object):
+    """
+    A transport in the pool, with the information needed to decide if it
+    can be reused.
+    """
+
+    def __init__(self, transport, fingerprint):
+        self.transport = transport
+        self.fingerprint = fingerprint
+        self.last_used = time.time()
+        # Held while the transport is borrowed: a transport cannot be used
+        # by two threads at the same time
+        self.lock = threading.Lock()
+
+
+class TransportPool(object):
+    """
+    Keep one open transport for each authinfo.
+
+    Use it as::
+
+        with pool.borrow(authinfo) as transport:
+            transport.listdir()
+
+    The borrowed transport is already open and must not be closed by the
+    caller. Transports that are found dead are transparently reopened, and
+    transports that have not been used for max_idle seconds are closed.
+    If the pooled transport of an authinfo is already borrowed (e.g. by
+    another thread), a new transport is opened, used and closed as it would
+    be done without a pool.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE,
+                 keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL):
+        """
+        :param max_idle: seconds after which an unused transport is closed
+        :param keepalive_interval: seconds between two keepalive messages
+            on the pooled connections (0 to disable)
+        """
+        self._max_idle = max_idle
+        self._keepalive_interval = keepalive_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_fingerprint(authinfo):
+        """
+        Return something that changes if the transport to use for the
+        authinfo has to be configured differently.
+        """
+        return (authinfo.dbcomputer.transport_type,
+                authinfo.dbcomputer.hostname,
+                sorted(authinfo.get_auth_params().items()))
+
+    def _open_transport(self, authinfo):
+        transport = authinfo.get_transport()
+        transport.open()
+        if self._keepalive_interval:
+            transport.set_keepalive(self._keepalive_interval)
+        return transport
+
+    @staticmethod
+    def _close_quietly(transport):
+        try:
+            transport.close()
+        except Exception as e:
+            _logger.debug("Error while closing the transport {}: {}".format(
+                transport, e.message))
+
+    @contextmanager
+    def borrow(self, authinfo):
+        """
+        Context manager returning an open transport for the given authinfo.
+
+        :param authinfo: a DbAuthInfo instance
+        """
+        self.evict_idle()
+
+        fingerprint = self._get_fingerprint(authinfo)
+        with self._lock:
+            entry = self._entries.get(authinfo.id)
+            if entry is not None and not entry.lock.acquire(False):
+                # Busy: do not wait for it, use a dedicated transport
+                entry = None
+                dedicated = True
+            else:
+                dedicated = False
+                if entry is None:
+                    entry = _PoolEntry(None, fingerprint)
+                    entry.lock.acquire()
+                    self._entries[authinfo.id] = entry
+
+        if dedicated:
+            with authinfo.get_transport() as transport:
+                yield transport
+            return
+
+        try:
+            if entry.transport is not None and (
+                    entry.fingerprint != fingerprint or
+                    not entry.transport.is_open):
+                _logger.debug("Reopening the transport for {}".format(
+                    authinfo))
+                self._close_quietly(entry.transport)
+                entry.transport = None
+
+            if entry.transport is None:
+                entry.transport = self._open_transport(authinfo)
+                entry.fingerprint = fingerprint
+
+            try:
+                yield entry.transport
+            finally:
+                entry.transport._set_logger_extra(None)
+                entry.last_used = time.time()
+        except Exception:
+            # The transport may be in an unknown state: do not reuse it
+            with self._lock:
+                if self._entries.get(authinfo.id) is entry:
+                    del self._entries[authinfo.id]
+            if entry.transport is not None:
+                self._close_quietly(entry.transport)
+            raise
+        finally:
+            entry.lock.release()
+
+    def evict_idle(self):
+        """
+        Close the transports that are not in use and were not used for
+        longer than max_idle seconds.
+        """
+        now = time.time()
+        to_close = []
+        with self._lock:
+            for key, entry in self._entries.items():
+                if now - entry.last_used < self._max_idle:
+                    continue
+                if not entry.lock.acquire(False):
+                    continue
+                del self._entries[key]
+                to_close.append(entry)
+
+        for entry in to_close:
+            if entry.transport is not None:
+                self._close_quietly(entry.transport)
+            entry.lock.release()
+
+    def close_all(self):
+        """
+        Close all the transports that are not in use, and empty the pool.
+        """
+        with self._lock:
+            entries = self._entries
+            self._entries = {}
+
+        for entry in entries.itervalues():
+            with entry.lock:
+                if entry.transport is not None:
+                    self._close_quietly(entry.transport)
+
+
+_transport_pool = None
+
+
+def get_transport_pool():
+    """
+    Return the transport pool shared within this process (created on first
+    use, with the TRANSPORT_POOL_MAX_IDLE and TRANSPORT_POOL_KEEPALIVE
+    values of the profile configuration, if set).
+    """
+    from aiida.backends import settings
+    from aiida.common.exceptions import ConfigurationError
+    from aiida.common.setup import get_profile_config
+    global _transport_pool
+
+    if _transport_pool is None:
+        try:
+            config = get_profile_config(settings.AIIDADB_PROFILE)
+        except ConfigurationError:
+            config = {}
+        _transport_pool = TransportPool(
+            max_idle=config.get("TRANSPORT_POOL_MAX_IDLE", DEFAULT_MAX_IDLE),
+            keepalive_interval=config.get("TRANSPORT_POOL_KEEPALIVE",
+                                          DEFAULT_KEEPALIVE_INTERVAL))
+    return _transport_pool
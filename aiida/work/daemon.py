@@ -5,11 +5,19 @@ from aiida.backends.utils import load_dbenv, is_dbenv_loaded
 if not is_dbenv_loaded():
     load_dbenv()
 
+import os
+import random
+import socket
+import time
 import traceback
+import uuid
+
 import aiida.work.defaults as defaults
+from aiida.common import aiidalogger
 from plum.process import ProcessState
 from aiida.work.process import Process
 import aiida.work.persistence
+from aiida.work import instrumentation
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
 __license__ = "MIT license, see LICENSE.txt file."
@@ -17,51 +25,253 @@ __version__ = "0.7.0"
 __authors__ = "The AiiDA team."
 
 
-def tick_workflow_engine(storage=None, print_exceptions=True):
+# Default values, can be overridden in the profile configuration
+# Number of worker processes ticking the workflow engine, 0 to tick it in the
+# daemon process itself
+WORK_DAEMON_WORKERS = 0
+# Duration (in seconds) of the lease of a process by a worker: if the worker
+# dies, the process is run by another worker after this time
+WORK_DAEMON_LEASE_TIME = 300
+# Number of processes claimed at a time by a worker
+WORK_DAEMON_CLAIM_BATCH = 10
+
+_LOGGER = aiidalogger.getChild('work').getChild('daemon')
+
+_worker_pool = None
+_worker_futures = []
+_worker_id = None
+
+
+def tick_workflow_engine(storage=None, print_exceptions=True, owner=None,
+                         lease_time=WORK_DAEMON_LEASE_TIME,
+                         claim_batch=WORK_DAEMON_CLAIM_BATCH):
+    """
+    Tick all the processes that can make progress.
+
+    :param storage: The persistence to load the processes from (by default
+        the one of the profile)
+    :param print_exceptions: Print the exceptions raised by the processes
+    :param owner: If not None, a string identifying the worker ticking the
+        engine: only the processes that this worker can lease (see
+        DbPersistence.claim) are ticked, so that several workers can tick
+        the engine at the same time
+    :param lease_time: The duration of the leases, in seconds
+    :param claim_batch: The number of processes to lease at a time
+    :return: True if there are processes that still have to be ticked
+    """
+    try:
+        with instrumentation.phase(instrumentation.TICK):
+            return _tick_workflow_engine(storage, print_exceptions, owner,
+                                         lease_time, claim_batch)
+    finally:
+        instrumentation.flush()
+
+
+def _tick_workflow_engine(storage, print_exceptions, owner, lease_time,
+                          claim_batch):
+    from aiida.work.process_registry import clear_finished_cache
+
     if storage is None:
         storage = aiida.work.persistence.get_default()
 
-    more_work = False
+    clear_finished_cache()
+    pids, more_work = _get_ready_pids(storage)
 
-    for proc in _load_all_processes(storage):
-        storage.persist_process(proc)
-        is_waiting = proc.get_waiting_on()
+    if owner is None:
+        for cp in storage.load_checkpoints(pids).itervalues():
+            if _tick_process(storage, cp, print_exceptions):
+                more_work = True
+        return more_work
+
+    # Workers starting at the same time should not compete for the same
+    # processes
+    random.shuffle(pids)
+    last_renewal = time.time()
+    for i in range(0, len(pids), claim_batch):
+        batch = pids[i:i + claim_batch]
+        claimed = storage.claim(batch, owner, lease_time)
+        if len(claimed) < len(batch):
+            # Leased by other workers
+            more_work = True
         try:
+            for cp in storage.load_checkpoints(claimed).itervalues():
+                if _tick_process(storage, cp, print_exceptions):
+                    more_work = True
+                # Heartbeat, so that the leases do not expire while the
+                # worker is alive
+                if time.time() - last_renewal > lease_time / 3.:
+                    storage.renew_leases(owner, lease_time)
+                    last_renewal = time.time()
+        finally:
+            storage.release(owner, claimed)
+
+    return more_work
+
+
+def _tick_process(storage, cp, print_exceptions):
+    """
+    Recreate a process from its checkpoint and tick it.
+
+    :return: True if the process did not finish
+    """
+    try:
+        proc = Process.create_from(cp)
+    except KeyboardInterrupt:
+        raise
+    except BaseException:
+        _LOGGER.warning("Failed to recreate a process:\n{}".format(
+            traceback.format_exc()))
+        return False
+
+    is_waiting = proc.get_waiting_on()
+    try:
+        with instrumentation.phase(instrumentation.TICK, proc):
             # Get the Process till the point it is about to do some work
             if is_waiting is not None:
                 proc.run_until(ProcessState.WAITING)
+                # Only start saving now: up to here the process just went
+                # back to the state of its checkpoint, so if it is not ready
+                # to continue there is nothing to write
+                storage.persist_process(proc)
             else:
+                storage.persist_process(proc)
                 proc.run_until(ProcessState.STARTED)
 
             proc.tick()
 
-            # Now stop the process and let it finish running through the states
-            # until it is destroyed
-            proc.stop()
-            proc.run_until(ProcessState.DESTROYED)
-        except BaseException:
-            if print_exceptions:
-                traceback.print_exc()
-            continue
-
-        # Check if the process finished or was stopped early
-        if not proc.has_finished():
-            more_work = True
+        # Now stop the process and let it finish running through the states
+        # until it is destroyed
+        proc.stop()
+        proc.run_until(ProcessState.DESTROYED)
+    except BaseException:
+        if print_exceptions:
+            traceback.print_exc()
+        return False
+
+    # Check if the process finished or was stopped early
+    return not proc.has_finished()
 
-    return more_work
 
+def _get_ready_pids(storage):
+    """
+    Get the processes that can make progress, using the readiness index of
+    the storage to skip those waiting on calculations that did not finish.
+
+    :return: A tuple with the list of pids and a boolean that is True if
+        some running processes were skipped
+    """
+    from aiida.work.persistence import get_waiting_on_pks, is_ready
+    from aiida.work.process_registry import get_finished_states
 
-def _load_all_processes(storage):
-    procs = []
-    for cp in storage.load_all_checkpoints():
+    index = storage.load_all_waiting_on()
+
+    pks = set()
+    for descriptor in index.itervalues():
+        pks.update(get_waiting_on_pks(descriptor))
+    finished = get_finished_states(pks)
+
+    pids = []
+    skipped = False
+    for pid, descriptor in index.iteritems():
+        if is_ready(descriptor, finished) is False:
+            skipped = True
+        else:
+            pids.append(pid)
+    return pids, skipped
+
+
+def tick_daemon_workflow_engine():
+    """
+    Tick the workflow engine from the daemon: in the daemon process itself,
+    or with a pool of WORK_DAEMON_WORKERS worker processes leasing the
+    processes to run (this requires the database persistence, see
+    aiida.work.persistence.DbPersistence).
+    """
+    from aiida.daemon.execmanager import _get_profile_setting
+    from aiida.work.persistence import DbPersistence
+
+    storage = aiida.work.persistence.get_default()
+    workers = _get_profile_setting('WORK_DAEMON_WORKERS', WORK_DAEMON_WORKERS)
+    if workers and not isinstance(storage, DbPersistence):
+        _LOGGER.warning("WORK_DAEMON_WORKERS is ignored, as it requires "
+                        "WORKFLOW_PERSISTENCE to be 'db'")
+        workers = 0
+
+    if not workers:
+        return tick_workflow_engine(storage)
+
+    tick_workflow_engine_workers(
+        workers, _get_profile_setting('WORK_DAEMON_LEASE_TIME',
+                                      WORK_DAEMON_LEASE_TIME))
+
+
+def tick_workflow_engine_workers(workers, lease_time=WORK_DAEMON_LEASE_TIME):
+    """
+    Dispatch ticks of the workflow engine to a pool of worker processes.
+    The call returns without waiting for the workers, and only starts new
+    ticks on the workers that are idle.
+
+    :param workers: The number of worker processes
+    :param lease_time: The duration of the leases, in seconds
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from aiida.daemon.execmanager import _release_db_connection
+    global _worker_pool, _worker_futures
+
+    for future in [f for f in _worker_futures if f.done()]:
+        _worker_futures.remove(future)
+        e = future.exception()
+        if e is not None:
+            _LOGGER.error("Unexpected error in a workflow engine worker, "
+                          "error type is {}, error message: {}".format(
+                e.__class__.__name__, e.message))
+
+    if _worker_pool is None:
+        _worker_pool = ProcessPoolExecutor(max_workers=workers)
+        # The processes of the pool are forked at the first submission
+        _release_db_connection()
+
+    for _ in range(workers - len(_worker_futures)):
         try:
-            procs.append(Process.create_from(cp))
-        except KeyboardInterrupt:
-            raise
-        except BaseException:
-            # TODO: Log exception
-            pass
-    return procs
+            _worker_futures.append(
+                _worker_pool.submit(_tick_in_worker, lease_time))
+        except Exception as e:
+            # e.g. a process of the pool died: start again with a new pool
+            # at the next call, the leases of its processes will expire
+            _LOGGER.error("Unable to dispatch to the workflow engine "
+                          "workers, error type is {}, error message: "
+                          "{}".format(e.__class__.__name__, e.message))
+            _worker_pool.shutdown(wait=False)
+            _worker_pool = None
+            _worker_futures = []
+            return
+
+
+def _get_worker_id():
+    """
+    Get a string identifying this worker process, as owner of the leases.
+    """
+    global _worker_id
+
+    # The worker processes are forked, check that the id is not inherited
+    if _worker_id is None or _worker_id[1] != os.getpid():
+        _worker_id = ("{}:{}:{}".format(
+            socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8]),
+            os.getpid())
+    return _worker_id[0]
+
+
+def _tick_in_worker(lease_time):
+    """
+    Tick the workflow engine in a worker process of the pool.
+    """
+    owner = _get_worker_id()
+    storage = aiida.work.persistence.get_default()
+    try:
+        return tick_workflow_engine(storage, owner=owner,
+                                    lease_time=lease_time)
+    finally:
+        storage.release(owner)
 
 
 if __name__ == "__main__":
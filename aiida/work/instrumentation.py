@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of the workflow engine and of the daemon: the time
+spent in each phase of the life of the processes (creation, setup of the
+database record, emission of outputs, saving and loading of checkpoints,
+daemon ticks) and in each stage of the daemon (submission, scheduler update,
+retrieval, parsing) is recorded, with the number of database queries, stored
+nodes and checkpoint bytes of each phase.
+
+The instrumentation is enabled with the WORK_INSTRUMENTATION setting of the
+profile configuration, or with enable(). The records of a process are
+appended, as a line of JSON, to the file given by the
+WORK_INSTRUMENTATION_FILE setting (by default work_instrumentation.jsonl
+in the daemon log directory) when the process is destroyed, i.e. at the end
+of each daemon tick for the processes run by the daemon, and can be
+summarised with 'verdi work stats'. The records of the daemon are written at
+the end of each tick and of each stage.
+
+Use it as::
+
+    with instrumentation.phase('setup_db_record', process):
+        ...
+        instrumentation.count('nodes_stored')
+
+The counts are attributed to the innermost active phase, and to the phases
+containing it.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+from plum.process_monitor import MONITOR, ProcessMonitorListener
+from aiida.common import aiidalogger
+from aiida.common.lang import override
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+# The names of the phases
+ON_CREATE = 'on_create'
+SETUP_DB_RECORD = 'setup_db_record'
+OUTPUT_EMITTED = 'output_emitted'
+CHECKPOINT_SAVE = 'checkpoint_save'
+CHECKPOINT_LOAD = 'checkpoint_load'
+TICK = 'tick'
+
+# The names of the counters, in addition to the calls and the time of each
+# phase
+QUERIES = 'queries'
+NODES_STORED = 'nodes_stored'
+CHECKPOINT_BYTES = 'checkpoint_bytes'
+
+DEFAULT_FILENAME = 'work_instrumentation.jsonl'
+
+_LOGGER = aiidalogger.getChild('work').getChild('instrumentation')
+
+
+class _Frame(object):
+    """
+    An active phase.
+    """
+
+    def __init__(self, name, process, pid, queries):
+        self.name = name
+        self.process = process
+        self.pid = pid
+        self.start = time.time()
+        self.start_queries = queries
+        self.counts = collections.Counter()
+
+
+class _QueryCounter(object):
+    """
+    Count the queries sent to the database.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._installed = False
+        self._django = False
+
+    def install(self):
+        from aiida.backends import settings
+        from aiida.backends.profile import BACKEND_SQLA
+
+        if self._installed:
+            return
+        if settings.BACKEND == BACKEND_SQLA:
+            from sqlalchemy import event
+            from aiida.backends.sqlalchemy import session
+            event.listen(session.bind, 'before_cursor_execute',
+                         self._on_execute)
+        else:
+            from django.db import connection
+            # Django only keeps the list of the executed queries
+            connection.use_debug_cursor = True
+            self._django = True
+        self._installed = True
+
+    def _on_execute(self, *args):
+        self._count += 1
+
+    def get_count(self):
+        if self._django:
+            from django.db import connection
+            return self._count + len(connection.queries)
+        return self._count
+
+    def trim(self):
+        """
+        Forget the queries kept by Django, keeping their count.
+        """
+        if self._django:
+            from django.db import connection
+            self._count += len(connection.queries)
+            del connection.queries[:]
+
+
+class _Recorder(object):
+    def __init__(self, path):
+        self.path = path
+        self.os_pid = os.getpid()
+        self._records = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queries = _QueryCounter()
+
+    def _get_stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def push(self, name, process, pid):
+        self._queries.install()
+        frame = _Frame(name, process, pid, self._queries.get_count())
+        self._get_stack().append(frame)
+        return frame
+
+    def pop(self, frame):
+        stack = self._get_stack()
+        stack.remove(frame)
+        frame.counts[QUERIES] += \
+            self._queries.get_count() - frame.start_queries
+        elapsed = time.time() - frame.start
+
+        process = frame.process
+        pid = frame.pid
+        pending_key = None
+        if process is not None:
+            # The pid of a new process is only known after its creation:
+            # until then, its phases are kept aside
+            pending_key = ('pending', id(process))
+            pid = process.pid
+        if pid is not None:
+            key = str(pid)
+        elif pending_key is not None:
+            key = pending_key
+        else:
+            key = None
+
+        with self._lock:
+            record = self._get_record(key)
+            if process is not None:
+                record['process_class'] = '{}.{}'.format(
+                    process.__class__.__module__, process.__class__.__name__)
+                if key != pending_key and pending_key in self._records:
+                    self._merge(record, self._records.pop(pending_key))
+            self._merge(record, {'phases': {frame.name: dict(
+                frame.counts, calls=1, time=elapsed)}})
+
+        if stack:
+            # The queries are measured by every phase on its own
+            stack[-1].counts.update(
+                {k: v for k, v in frame.counts.iteritems() if k != QUERIES})
+        else:
+            self._queries.trim()
+
+    def _get_record(self, key):
+        record = self._records.get(key)
+        if record is None:
+            record = {'pid': key, 'process_class': None, 'phases': {}}
+            self._records[key] = record
+        return record
+
+    @staticmethod
+    def _merge(record, other):
+        for name, counters in other['phases'].iteritems():
+            stats = record['phases'].setdefault(name, {})
+            for counter, value in counters.iteritems():
+                stats[counter] = stats.get(counter, 0) + value
+
+    def count(self, counter, amount):
+        stack = self._get_stack()
+        if stack:
+            stack[-1].counts[counter] += amount
+
+    def flush(self, pid):
+        key = None if pid is None else str(pid)
+        with self._lock:
+            record = self._records.pop(key, None)
+        if record is None:
+            return
+
+        record['time'] = time.time()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            # Lines written in append mode are not interleaved, so several
+            # daemon workers can share the same file
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except (IOError, OSError) as e:
+            _LOGGER.warning("Failed to write the instrumentation records to "
+                            "{}: {}".format(self.path, e))
+
+
+_recorder = None
+_configured = False
+
+
+def _get_recorder():
+    global _recorder, _configured
+
+    if not _configured:
+        from aiida.daemon.execmanager import _get_profile_setting
+
+        _configured = True
+        if _get_profile_setting('WORK_INSTRUMENTATION', False):
+            enable(_get_profile_setting('WORK_INSTRUMENTATION_FILE', None))
+    elif _recorder is not None and _recorder.os_pid != os.getpid():
+        # A forked process (e.g. of the parser pool) starts afresh, rather
+        # than with the records and the active phases of its parent
+        _recorder = _Recorder(_recorder.path)
+    return _recorder
+
+
+def get_default_path():
+    """
+    :return: The path of the file where the records are written, if not set
+        in the profile configuration
+    """
+    from aiida.common.setup import AIIDA_CONFIG_FOLDER, LOG_SUBDIR
+    return os.path.join(os.path.expanduser(AIIDA_CONFIG_FOLDER), LOG_SUBDIR,
+                        DEFAULT_FILENAME)
+
+
+def get_path():
+    """
+    :return: The path of the file where the records are written
+    """
+    from aiida.daemon.execmanager import _get_profile_setting
+    if _recorder is not None:
+        return _recorder.path
+    return _get_profile_setting('WORK_INSTRUMENTATION_FILE', None) or \
+        get_default_path()
+
+
+def enable(path=None):
+    """
+    Start recording, whatever the profile configuration.
+
+    :param path: The file where the records are written, by default the one
+        returned by get_default_path
+    """
+    global _recorder, _configured
+
+    _configured = True
+    if _recorder is None:
+        MONITOR.add_monitor_listener(_flusher)
+    _recorder = _Recorder(path or get_default_path())
+
+
+def disable():
+    """
+    Stop recording, the records not written yet are lost.
+    """
+    global _recorder, _configured
+
+    _configured = True
+    if _recorder is not None:
+        MONITOR.remove_monitor_listener(_flusher)
+    _recorder = None
+
+
+def is_enabled():
+    return _get_recorder() is not None
+
+
+class _Phase(object):
+    """
+    The context manager returned by phase.
+    """
+    __slots__ = ('_args', '_frame', '_recorder')
+
+    def __init__(self, name, process, pid):
+        self._args = (name, process, pid)
+        self._frame = None
+        self._recorder = None
+
+    def __enter__(self):
+        recorder = _get_recorder()
+        if recorder is not None:
+            self._frame = recorder.push(*self._args)
+            self._recorder = recorder
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Unless the recorder was disabled or replaced in the meantime
+        if self._frame is not None and self._recorder is _recorder:
+            _recorder.pop(self._frame)
+        self._frame = None
+        self._recorder = None
+
+
+def phase(name, process=None, pid=None):
+    """
+    Record the time spent, and the counts, in a phase of the life of a
+    process. Does nothing if the instrumentation is not enabled.
+
+    :param name: The name of the phase
+    :param process: The process, if any
+    :param pid: The pid of the process, if the process is not available
+        (e.g. when loading its checkpoint). The phases with neither a process
+        or a pid are recorded as the ones of the daemon.
+    :return: A context manager
+    """
+    return _Phase(name, process, pid)
+
+
+def count(counter, amount=1):
+    """
+    Increment a counter of the innermost active phase (and of the phases
+    containing it).
+    """
+    recorder = _get_recorder()
+    if recorder is not None:
+        recorder.count(counter, amount)
+
+
+def flush(pid=None):
+    """
+    Write the records of a process, or of the daemon if pid is None.
+    """
+    recorder = _get_recorder()
+    if recorder is not None:
+        recorder.flush(pid)
+
+
+class _Flusher(ProcessMonitorListener):
+    """
+    Write the records of the processes when they are destroyed.
+    """
+
+    @override
+    def on_monitored_process_destroying(self, process):
+        flush(process.pid)
+
+    @override
+    def on_monitored_process_failed(self, pid):
+        flush(pid)
+
+
+_flusher = _Flusher()
+
+
+def read_records(path=None):
+    """
+    Read the records written to a file.
+
+    :param path: The file, by default the one returned by get_path
+    :return: A list of records, one for each process (or daemon tick or
+        stage) and each time it was written, as dictionaries with the keys
+        pid, process_class, time and phases. phases is a dictionary
+        {phase name: {counter name: value}}, with at least the counters
+        'calls' and 'time'.
+    """
+    records = []
+    path = path or get_path()
+    if not os.path.isfile(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # E.g. a line being written
+                pass
+    return records
+
+
+def summarise(records, by='process_class'):
+    """
+    Sum the counters of the records.
+
+    :param records: The records, see read_records
+    :param by: The key of the records to group them by, 'process_class' or
+        'pid'
+    :return: A dictionary {group: {phase name: {counter name: total}}}, where
+        the records of the daemon are in the group None
+    """
+    summary = {}
+    for record in records:
+        phases = summary.setdefault(record.get(by), {})
+        for name, counters in record['phases'].iteritems():
+            totals = phases.setdefault(name, {})
+            for counter, value in counters.iteritems():
+                totals[counter] = totals.get(counter, 0) + value
+    return summary
@@ -25,6 +25,11 @@ class WaitOnJobCalculation(WaitOn):
 
     @override
     def is_ready(self, registry=None):
+        from aiida.work.process_registry import get_finished_states
+
+        states = get_finished_states([self._pk])
+        if self._pk in states:
+            return states[self._pk][0]
         return not load_node(pk=self._pk)._is_running()
 
     @override
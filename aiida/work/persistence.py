@@ -1,35 +1,93 @@
 
 import collections
+import glob
+import hashlib
+import json
+import pickle
 import uritools
+import os
 import os.path
+import zlib
 
 import plum.persistence.pickle_persistence
+from plum.persistence.bundle import Bundle
 from plum.process import Process
+from plum.process_listener import ProcessListener
+from plum.process_monitor import MONITOR, ProcessMonitorListener
+from aiida.common import aiidalogger
+from aiida.common.exceptions import NotExistent
 from aiida.common.lang import override
+from aiida.work import instrumentation
 from aiida.work.defaults import class_loader
 
+_LOGGER = aiidalogger.getChild('work').getChild('persistence')
 
-class Persistence(plum.persistence.pickle_persistence.PicklePersistence):
-    @override
-    def load_checkpoint_from_file(self, filepath):
-        cp = super(Persistence, self).load_checkpoint_from_file(filepath)
 
-        inputs = cp[Process.BundleKeys.INPUTS.value]
+class _NodeBundleMixin(object):
+    """
+    Store the input nodes of the processes by id in the checkpoints, and
+    describe what the processes wait on.
+    """
+
+    def _to_checkpoint(self, bundle):
+        inputs = bundle[Process.BundleKeys.INPUTS.value]
         if inputs:
-            cp[Process.BundleKeys.INPUTS.value] = self._load_nodes_from(inputs)
+            bundle[Process.BundleKeys.INPUTS.value] = \
+                self._convert_to_ids(inputs)
+        return bundle
 
-        cp.set_class_loader(class_loader)
-        return cp
+    # The resolver shared by the checkpoints loaded by load_checkpoints
+    _batch_resolver = None
 
-    @override
-    def create_bundle(self, process):
-        b = super(Persistence, self).create_bundle(process)
+    def load_checkpoints(self, pids):
+        """
+        Load the checkpoints of several processes. Their input nodes are
+        loaded, all together, only when one of them is first used.
 
-        inputs = b[Process.BundleKeys.INPUTS.value]
+        :param pids: The pids of the processes
+        :return: A dictionary {pid: checkpoint}, without the checkpoints
+            that could not be loaded
+        """
+        checkpoints = {}
+        self._batch_resolver = _NodeResolver()
+        try:
+            for pid in pids:
+                try:
+                    checkpoints[pid] = self.load_checkpoint(pid)
+                except KeyboardInterrupt:
+                    raise
+                except BaseException as e:
+                    _LOGGER.warning(
+                        "Failed to load checkpoint {} because of "
+                        "exception\n{}".format(pid, e.message))
+        finally:
+            self._batch_resolver = None
+        return checkpoints
+
+    def _from_checkpoint(self, cp):
+        inputs = cp[Process.BundleKeys.INPUTS.value]
         if inputs:
-            b[Process.BundleKeys.INPUTS.value] = self._convert_to_ids(inputs)
+            resolver = self._batch_resolver or _NodeResolver()
+            cp[Process.BundleKeys.INPUTS.value] = \
+                self._load_nodes_from(inputs, resolver)
 
-        return b
+        cp.set_class_loader(class_loader)
+        return cp
+
+    @staticmethod
+    def _get_waiting_on(process):
+        """
+        Get the descriptor of what a process waits on, see
+        get_waiting_on_descriptor.
+        """
+        wait_on = process.get_waiting_on()
+        if wait_on is None:
+            # The process has still to start, or to continue from where it
+            # has stopped
+            return True
+        bundle = Bundle()
+        wait_on.save_instance_state(bundle)
+        return get_waiting_on_descriptor(bundle)
 
     def _convert_to_ids(self, nodes):
         from aiida.orm import Node
@@ -38,6 +96,9 @@ class Persistence(plum.persistence.pickle_persistence.PicklePersistence):
         for label, node in nodes.iteritems():
             if node is None:
                 continue
+            elif type(node) is _LazyNode:
+                # Do not load the node just to get its id back
+                input_ids[label] = node._lazy_pk
             elif isinstance(node, Node):
                 if node.is_stored:
                     input_ids[label] = node.pk
@@ -51,27 +112,602 @@ class Persistence(plum.persistence.pickle_persistence.PicklePersistence):
 
         return input_ids
 
-    def _load_nodes_from(self, pks_mapping):
+    def _load_nodes_from(self, pks_mapping, resolver):
         """
         Take a dictionary of of {label: pk} or nested dictionary i.e.
         {label: {label: pk}} and convert to the equivalent dictionary but
         with nodes instead of the ids.
 
         :param pks_mapping: The dictionary of node pks.
-        :return: A dictionary with the loaded nodes.
+        :param resolver: The resolver that will load the nodes
+        :type resolver: :class:`_NodeResolver`
+        :return: A dictionary with lazy nodes, that are loaded on first use.
         :rtype: dict
         """
-        from aiida.orm import load_node
-
         nodes = {}
         for label, pk in pks_mapping.iteritems():
             if isinstance(pk, collections.Mapping):
-                nodes[label] = self._load_nodes_from(pk)
+                nodes[label] = self._load_nodes_from(pk, resolver)
             else:
-                nodes[label] = load_node(pk=pk)
+                nodes[label] = resolver.get_lazy_node(pk)
         return nodes
 
 
+class _NodeResolver(object):
+    """
+    Load nodes in bulk: the nodes requested with get_lazy_node are all loaded
+    with a single query as soon as one of them is used.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._nodes = {}
+
+    def get_lazy_node(self, pk):
+        """
+        :param pk: The pk (or uuid) of the node
+        :return: A proxy behaving as the node, see _LazyNode
+        """
+        if pk not in self._nodes:
+            self._pending.add(pk)
+        return _LazyNode(pk, self)
+
+    def get_node(self, pk):
+        """
+        Get a node, loading all the pending ones if it was not loaded yet.
+
+        :raise NotExistent: if the node does not exist
+        """
+        if pk not in self._nodes:
+            self._pending.add(pk)
+            self._load_pending()
+        try:
+            return self._nodes[pk]
+        except KeyError:
+            raise NotExistent("No node with pk or uuid {}".format(pk))
+
+    def _load_pending(self):
+        from aiida.orm import Node
+        from aiida.orm.querybuilder import QueryBuilder
+
+        pks = [pk for pk in self._pending if isinstance(pk, (int, long))]
+        uuids = [pk for pk in self._pending if not isinstance(pk, (int, long))]
+        self._pending = set()
+
+        if pks:
+            qb = QueryBuilder()
+            qb.append(Node, filters={'id': {'in': pks}})
+            for node, in qb.iterall():
+                self._nodes[node.pk] = node
+        if uuids:
+            qb = QueryBuilder()
+            qb.append(Node, filters={'uuid': {'in': uuids}})
+            for node, in qb.iterall():
+                self._nodes[node.uuid] = node
+
+
+class _LazyNode(object):
+    """
+    A proxy for a node that is only loaded when it is first used. The proxy
+    forwards all the attribute accesses to the node, and passes the
+    isinstance checks of the node class.
+    """
+    __slots__ = ('_lazy_pk', '_lazy_resolver')
+
+    def __init__(self, pk, resolver):
+        object.__setattr__(self, '_lazy_pk', pk)
+        object.__setattr__(self, '_lazy_resolver', resolver)
+
+    def _get_lazy_node(self):
+        return self._lazy_resolver.get_node(self._lazy_pk)
+
+    @property
+    def __class__(self):
+        return self._get_lazy_node().__class__
+
+    def __getattr__(self, name):
+        return getattr(self._get_lazy_node(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_lazy_node(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._get_lazy_node(), name)
+
+    def __nonzero__(self):
+        return bool(self._get_lazy_node())
+
+    def __hash__(self):
+        return hash(self._get_lazy_node())
+
+    def __dir__(self):
+        return dir(self._get_lazy_node())
+
+    def __reduce_ex__(self, protocol):
+        # Pickled as the node itself, e.g. if put in the context of a
+        # workchain
+        return self._get_lazy_node().__reduce_ex__(protocol)
+
+
+def _make_forwarder(name):
+    def forwarder(self, *args):
+        try:
+            method = getattr(self._get_lazy_node(), name)
+        except AttributeError:
+            if args:
+                # Let Python try the reflected operation of the other operand
+                return NotImplemented
+            raise TypeError("'{}' object does not support {}".format(
+                self.__class__.__name__, name))
+        return method(*args)
+    forwarder.__name__ = name
+    return forwarder
+
+
+# The special methods are looked up on the type, not through __getattr__
+for _name in ['__str__', '__repr__', '__unicode__', '__eq__', '__ne__',
+              '__lt__', '__le__', '__gt__', '__ge__', '__len__', '__iter__',
+              '__contains__', '__getitem__', '__setitem__', '__delitem__',
+              '__int__', '__float__', '__add__', '__radd__', '__iadd__',
+              '__sub__', '__rsub__', '__isub__', '__mul__', '__rmul__',
+              '__imul__', '__pow__']:
+    setattr(_LazyNode, _name, _make_forwarder(_name))
+del _name
+
+
+class _NodeReference(object):
+    """
+    Stands for a stored node in a checkpoint, see to_node_references.
+    """
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+def to_node_references(value):
+    """
+    Replace the stored nodes in a value (also within lists, tuples and
+    dictionaries) with references to their pk, so that they are not pickled
+    with the checkpoint.
+
+    :param value: The value, e.g. a variable of the context of a workchain
+    :return: The value with the stored nodes replaced
+    """
+    from aiida.orm import Node
+
+    if type(value) is _LazyNode:
+        return _NodeReference(value._lazy_pk)
+    elif isinstance(value, Node):
+        if value.is_stored:
+            return _NodeReference(value.pk)
+        return value
+    elif type(value) is list:
+        return [to_node_references(v) for v in value]
+    elif type(value) is tuple:
+        return tuple(to_node_references(v) for v in value)
+    elif type(value) is dict:
+        return {k: to_node_references(v) for k, v in value.iteritems()}
+    return value
+
+
+def from_node_references(value, resolver=None):
+    """
+    The inverse of to_node_references.
+
+    :param value: The value with the node references
+    :param resolver: The resolver that will load the nodes, by default a new
+        one, so that all the nodes of the value are loaded together
+    :type resolver: :class:`_NodeResolver`
+    :return: The value with lazy nodes instead of the references, that are
+        loaded on first use.
+    """
+    if resolver is None:
+        resolver = _NodeResolver()
+
+    if type(value) is _NodeReference:
+        return resolver.get_lazy_node(value.pk)
+    elif type(value) is list:
+        return [from_node_references(v, resolver) for v in value]
+    elif type(value) is tuple:
+        return tuple(from_node_references(v, resolver) for v in value)
+    elif type(value) is dict:
+        return {k: from_node_references(v, resolver)
+                for k, v in value.iteritems()}
+    return value
+
+
+class Persistence(_NodeBundleMixin,
+                  plum.persistence.pickle_persistence.PicklePersistence):
+    # The suffix of the readiness index files, see load_all_waiting_on
+    WAITING_ON_SUFFIX = '.waiting_on.json'
+
+    def save_many(self, processes):
+        """
+        Save the checkpoints of several processes.
+        """
+        for process in processes:
+            self.save(process)
+
+    @override
+    def load_checkpoint(self, pid):
+        with instrumentation.phase(instrumentation.CHECKPOINT_LOAD, pid=pid):
+            return super(Persistence, self).load_checkpoint(pid)
+
+    @override
+    def load_checkpoint_from_file(self, filepath):
+        return self._from_checkpoint(
+            super(Persistence, self).load_checkpoint_from_file(filepath))
+
+    @override
+    def create_bundle(self, process):
+        return self._to_checkpoint(
+            super(Persistence, self).create_bundle(process))
+
+    @override
+    def save(self, process):
+        with instrumentation.phase(instrumentation.CHECKPOINT_SAVE, process):
+            super(Persistence, self).save(process)
+            self._save_waiting_on(process)
+            if instrumentation.is_enabled():
+                instrumentation.count(
+                    instrumentation.CHECKPOINT_BYTES,
+                    os.path.getsize(self.get_running_path(process.pid)))
+
+    @override
+    def _release_process(self, pid, save_path):
+        super(Persistence, self)._release_process(pid, save_path)
+        waiting_on_path = self.get_waiting_on_path(pid)
+        if os.path.isfile(waiting_on_path):
+            os.remove(waiting_on_path)
+
+    def get_waiting_on_path(self, pid):
+        """
+        Get the path of the file with the readiness index of a running
+        process, stored next to its pickle.
+
+        :param pid: The process pid
+        :return: A string to the absolute path of the file.
+        """
+        return os.path.join(self.store_directory,
+                            "{}{}".format(pid, self.WAITING_ON_SUFFIX))
+
+    def load_all_waiting_on(self):
+        """
+        Read the readiness index of all the running processes, that is what
+        they are waiting on (see get_waiting_on_descriptor), without loading
+        their checkpoints.
+
+        :return: A dictionary {pid: descriptor}, with the pids as strings
+            and where the descriptor is None if unknown (e.g. for checkpoints
+            saved before the index existed)
+        """
+        suffix = self.pickle_filename('')
+        index = {}
+        for f in glob.glob(os.path.join(self.store_directory,
+                                        "*{}".format(suffix))):
+            pid = os.path.basename(f)[:-len(suffix)]
+            try:
+                with open(self.get_waiting_on_path(pid)) as index_file:
+                    index[pid] = json.load(index_file)
+            except (IOError, ValueError):
+                index[pid] = None
+        return index
+
+    def _save_waiting_on(self, process):
+        filename = self.get_waiting_on_path(process.pid)
+        # Write and rename, so that the index is never found half written
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self._get_waiting_on(process), f)
+        os.rename(filename + '.tmp', filename)
+
+
+class DbPersistence(_NodeBundleMixin, ProcessListener, ProcessMonitorListener):
+    """
+    Store the checkpoints of the processes in the DbCheckpoint table of the
+    database, instead of in pickle files, so that listing, loading and
+    moving checkpoints are indexed queries, that can be safely done by
+    several daemon workers.
+
+    The checkpoints are stored as compressed pickles, with the version of
+    this format. The variables of the context of the workchains are stored
+    separately, each in its own compressed pickle, and only the ones that
+    changed since the checkpoint was loaded or last saved are rewritten.
+    """
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+
+    # Version of the format of the checkpoint data written by this class
+    CHECKPOINT_VERSION = 2
+    # The key of the context in the checkpoints of the workchains, see
+    # WorkChain.save_instance_state
+    CONTEXT_KEY = 'context'
+    # Set in the checkpoints whose context is stored separately
+    SEPARATE_CONTEXT_KEY = 'separate_context'
+
+    def __init__(self, auto_persist=False):
+        """
+        :param auto_persist: Will automatically persist Processes if True.
+        :type auto_persist: bool
+        """
+        from aiida.orm.implementation import CheckpointManager
+
+        self._manager = CheckpointManager()
+        self._auto_persist = auto_persist
+        # pid -> {key: digest} of the entries of the context as they are in
+        # the database
+        self._context_digests = {}
+        MONITOR.add_monitor_listener(self)
+
+    def load_checkpoint(self, pid):
+        with instrumentation.phase(instrumentation.CHECKPOINT_LOAD, pid=pid):
+            try:
+                version, data = self._manager.load(pid)
+            except NotExistent:
+                raise ValueError(
+                    "Not checkpoint with pid '{}' could be found".format(pid))
+            cp = self._decode(version, data)
+            if cp.pop(self.SEPARATE_CONTEXT_KEY, False):
+                cp[self.CONTEXT_KEY] = self._load_context(pid)
+            return self._from_checkpoint(cp)
+
+    def _load_context(self, pid):
+        context = Bundle()
+        digests = {}
+        for key, data in self._manager.load_context(pid).iteritems():
+            data = zlib.decompress(data)
+            digests[key] = hashlib.sha1(data).digest()
+            context[key] = pickle.loads(data)
+        self._context_digests[str(pid)] = digests
+        return context
+
+    def load_all_checkpoints(self):
+        checkpoints = []
+        for pid in self._manager.get_waiting_on(self.RUNNING):
+            try:
+                checkpoints.append(self.load_checkpoint(pid))
+            except BaseException as e:
+                _LOGGER.warning(
+                    "Failed to load checkpoint {} because of exception\n"
+                    "{}".format(pid, e.message))
+        return checkpoints
+
+    def load_all_waiting_on(self):
+        """
+        Get what all the running processes are waiting on, without loading
+        their checkpoints.
+
+        :return: A dictionary {pid: descriptor}, see Persistence
+        """
+        index = {}
+        for pid, waiting_on in \
+                self._manager.get_waiting_on(self.RUNNING).iteritems():
+            try:
+                index[pid] = json.loads(waiting_on)
+            except ValueError:
+                index[pid] = None
+        return index
+
+    def persist_process(self, process):
+        # If the process doesn't have a persisted state then persist it now
+        if not self._manager.exists(process.pid):
+            self.save(process)
+
+        try:
+            process.add_process_listener(self)
+        except AssertionError:
+            # Happens if we're already listening
+            pass
+
+    def create_bundle(self, process):
+        checkpoint = Bundle()
+        process.save_instance_state(checkpoint)
+        return self._to_checkpoint(checkpoint)
+
+    def save(self, process, state=RUNNING):
+        try:
+            with instrumentation.phase(instrumentation.CHECKPOINT_SAVE,
+                                       process):
+                self._manager.save(**self._get_record(process, state))
+        except BaseException:
+            # We don't know any more what is in the database: rewrite the
+            # whole context at the next save
+            self._context_digests.pop(str(process.pid), None)
+            raise
+
+    def save_many(self, processes):
+        """
+        Save the checkpoints of several processes, in a single transaction.
+        """
+        try:
+            self._manager.save_many([self._get_record(process, self.RUNNING)
+                                     for process in processes])
+        except BaseException:
+            for process in processes:
+                self._context_digests.pop(str(process.pid), None)
+            raise
+
+    def _get_record(self, process, state):
+        checkpoint = self.create_bundle(process)
+        record = {'pid': process.pid, 'state': state,
+                  'version': self.CHECKPOINT_VERSION,
+                  'waiting_on': json.dumps(self._get_waiting_on(process))}
+        context = checkpoint.pop(self.CONTEXT_KEY, None)
+        if context is not None:
+            checkpoint[self.SEPARATE_CONTEXT_KEY] = True
+            record.update(self._get_context_changes(process.pid, context))
+        record['checkpoint'] = zlib.compress(
+            pickle.dumps(checkpoint, pickle.HIGHEST_PROTOCOL))
+        instrumentation.count(
+            instrumentation.CHECKPOINT_BYTES, len(record['checkpoint']) +
+            sum(len(data) for data in record.get('context', {}).itervalues()))
+        return record
+
+    def _get_context_changes(self, pid, context):
+        """
+        Get the entries of a context that changed since the checkpoint was
+        loaded or last saved.
+
+        :return: A dictionary with the context and deleted_context arguments
+            of CheckpointManager.save
+        """
+        old_digests = self._context_digests.get(str(pid))
+        digests = {}
+        changed = {}
+        for key, value in context.iteritems():
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            digests[key] = hashlib.sha1(data).digest()
+            if old_digests is None or old_digests.get(key) != digests[key]:
+                changed[key] = zlib.compress(data)
+
+        if old_digests is None:
+            # Replace whatever there is in the database
+            deleted = None
+        else:
+            deleted = [key for key in old_digests if key not in digests]
+        self._context_digests[str(pid)] = digests
+        return {'context': changed, 'deleted_context': deleted}
+
+    def claim(self, pids, owner, lease_time):
+        """
+        Lease the checkpoints of running processes to a daemon worker, see
+        CheckpointManager.claim.
+
+        :return: the list of the pids (as strings) leased to the owner
+        """
+        return self._manager.claim(pids, owner, self.RUNNING, lease_time)
+
+    def renew_leases(self, owner, lease_time):
+        self._manager.renew(owner, lease_time)
+
+    def release(self, owner, pids=None):
+        self._manager.release(owner, pids)
+
+    def _decode(self, version, data):
+        # Version 1 is version 2 with the context inside the checkpoint
+        if version not in (1, self.CHECKPOINT_VERSION):
+            raise ValueError(
+                "Unknown checkpoint version {}".format(version))
+        return pickle.loads(zlib.decompress(data))
+
+    # ProcessListener messages #################################################
+    @override
+    def on_process_run(self, process):
+        self.save(process)
+
+    @override
+    def on_process_wait(self, process, wait_on):
+        self.save(process)
+
+    @override
+    def on_process_finish(self, process):
+        self.save(process, state=self.FINISHED)
+
+    @override
+    def on_process_destroy(self, process):
+        self._context_digests.pop(str(process.pid), None)
+    ############################################################################
+
+    # ProcessMonitorListener messages ##########################################
+    @override
+    def on_monitored_process_failed(self, pid):
+        try:
+            self._manager.set_state(pid, self.FAILED)
+        except NotExistent:
+            pass
+
+    @override
+    def on_monitored_process_created(self, process):
+        if self._auto_persist:
+            self.persist_process(process)
+    ############################################################################
+
+
+def get_waiting_on_descriptor(bundle):
+    """
+    Describe what a saved WaitOn waits for, in a form that can be stored as
+    JSON and checked for many processes at once with a few database queries.
+
+    The descriptor is one of:
+      - True: ready (e.g. a checkpoint)
+      - {'job': pk}: ready when the job calculation is not running
+      - {'process': pk}: ready when the process has finished
+      - {'all': [descriptors]} or {'any': [descriptors]}
+      - None: unknown, the process has to be loaded to know if it is ready
+
+    :param bundle: The bundle the WaitOn was saved to
+    :type bundle: :class:`plum.persistence.bundle.Bundle`
+    """
+    from plum.wait import WaitOn
+
+    class_name = bundle.get(WaitOn.BundleKeys.CLASS_NAME.value)
+    if class_name == 'plum.wait_ons.Checkpoint':
+        return True
+    elif class_name in ('plum.wait_ons.WaitOnAll',
+                        'aiida.work.wait_ons.WaitOnAll'):
+        return {'all': [get_waiting_on_descriptor(b) for b in
+                        bundle['wait_list']]}
+    elif class_name == 'plum.wait_ons.WaitOnAny':
+        return {'any': [get_waiting_on_descriptor(b) for b in
+                        bundle['wait_list']]}
+    elif class_name == 'plum.wait_ons.WaitOnProcess':
+        key, pk = 'process', bundle['pid']
+    elif class_name == 'aiida.work.legacy.wait_on.WaitOnJobCalculation':
+        key, pk = 'job', bundle['pk']
+    else:
+        return None
+
+    # Only stored nodes can be looked up in the database
+    return {key: pk} if isinstance(pk, (int, long)) else None
+
+
+def is_ready(descriptor, finished):
+    """
+    Evaluate a waiting on descriptor (see get_waiting_on_descriptor).
+
+    :param descriptor: The descriptor
+    :param finished: A dictionary {pk: (job_ready, process_finished)} for the
+        calculations in the descriptor, where a missing pk is unknown
+    :return: True, False or None if it cannot be known without loading the
+        process
+    """
+    if descriptor is None or descriptor is True:
+        return descriptor
+    elif 'all' in descriptor or 'any' in descriptor:
+        results = [is_ready(d, finished) for d in
+                   descriptor.get('all', descriptor.get('any'))]
+        if 'all' in descriptor:
+            if False in results:
+                return False
+            return None if None in results else True
+        else:
+            if True in results:
+                return True
+            return None if None in results else False
+    elif 'job' in descriptor:
+        state = finished.get(descriptor['job'])
+        return None if state is None else state[0]
+    elif 'process' in descriptor:
+        state = finished.get(descriptor['process'])
+        return None if state is None else state[1]
+    return None
+
+
+def get_waiting_on_pks(descriptor):
+    """
+    Get the pks of the calculations in a waiting on descriptor.
+    """
+    if descriptor is None or descriptor is True:
+        return set()
+    elif 'all' in descriptor or 'any' in descriptor:
+        pks = set()
+        for d in descriptor.get('all', descriptor.get('any')):
+            pks.update(get_waiting_on_pks(d))
+        return pks
+    return set(v for k, v in descriptor.iteritems()
+               if k in ('job', 'process'))
+
+
 _DEFAULT_STORAGE = None
 
 
@@ -87,8 +723,18 @@ def get_default():
 def _create_storage():
     import aiida.common.setup as setup
     import aiida.settings as settings
+    from aiida.backends import settings as backend_settings
+    from aiida.common.exceptions import ConfigurationError
     global _DEFAULT_STORAGE
 
+    try:
+        config = setup.get_profile_config(backend_settings.AIIDADB_PROFILE)
+    except ConfigurationError:
+        config = {}
+    if config.get("WORKFLOW_PERSISTENCE", "file") == "db":
+        _DEFAULT_STORAGE = DbPersistence(auto_persist=False)
+        return
+
     parts = uritools.urisplit(settings.REPOSITORY_URI)
     if parts.scheme == u'file':
         WORKFLOWS_DIR = os.path.expanduser(
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import collections
+import contextlib
+import threading
 import uuid
 from enum import Enum
 import itertools
@@ -19,7 +21,9 @@ from aiida.common.links import LinkType
 from aiida.utils.calculation import add_source_info
 from aiida.work.defaults import class_loader
 import aiida.work.util
-from aiida.work.util import PROCESS_LABEL_ATTR
+from aiida.work import instrumentation
+from aiida.work.util import (
+    PROCESS_LABEL_ATTR, PROCESS_HASH_ATTR, FAST_FORWARDED_FROM_ATTR)
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
 __license__ = "MIT license, see LICENSE.txt file."
@@ -157,6 +161,12 @@ class Process(plum.process.Process):
         super(Process, self).__init__()
         self._calc = None
         self._parent_pid = None
+        self._hash = None
+        self._fast_forward_node = None
+        # The outputs and the links to them that are not in the database
+        # yet, see _store_pending_outputs
+        self._pending_outputs = []
+        self._pending_links = []
 
     @property
     def calc(self):
@@ -164,6 +174,8 @@ class Process(plum.process.Process):
 
     @override
     def save_instance_state(self, bundle):
+        # The checkpoint must not refer to outputs that are not stored
+        self._store_pending_outputs()
         super(Process, self).save_instance_state(bundle)
 
         if self.inputs._store_provenance:
@@ -192,6 +204,10 @@ class Process(plum.process.Process):
     # Messages #####################################################
     @override
     def on_create(self, pid, inputs, saved_instance_state):
+        with instrumentation.phase(instrumentation.ON_CREATE, self):
+            self._on_create(pid, inputs, saved_instance_state)
+
+    def _on_create(self, pid, inputs, saved_instance_state):
         from aiida.orm import load_node
         super(Process, self).on_create(pid, inputs, saved_instance_state)
 
@@ -222,9 +238,20 @@ class Process(plum.process.Process):
         super(Process, self).on_start()
         aiida.work.util.ProcessStack.push(self)
 
+    @override
+    def on_wait(self, wait_on):
+        # Before the checkpoint is saved
+        self._store_pending_outputs()
+        super(Process, self).on_wait(wait_on)
+
     @override
     def on_finish(self):
         super(Process, self).on_finish()
+        self._store_pending_outputs()
+        if self._is_hashable() and self._get_hash() is not None:
+            # Only set at the end, so that only successful processes can be
+            # used to fast-forward other ones
+            self.calc._set_attr(PROCESS_HASH_ATTR, self._get_hash())
         self.calc.seal()
 
     @override
@@ -243,17 +270,33 @@ class Process(plum.process.Process):
             "Values outputted from process must be instances of AiiDA Data" \
             "types.  Got: {}".format(value.__class__)
 
-        if not value.is_stored:
-            value.add_link_from(self.calc, output_port, LinkType.CREATE)
-            if self.inputs._store_provenance:
-                value.store()
-        value.add_link_from(self.calc, output_port, LinkType.RETURN)
+        with instrumentation.phase(instrumentation.OUTPUT_EMITTED, self):
+            if self.calc.is_stored:
+                # The outputs and the links are stored all together, when
+                # the process waits or finishes
+                if not value.is_stored:
+                    # Cached in the output, so that it is always stored
+                    # together with the output
+                    value.add_link_from(self.calc, output_port,
+                                        LinkType.CREATE)
+                    self._pending_outputs.append(value)
+                self._add_pending_link(value, output_port, LinkType.RETURN)
+            else:
+                if not value.is_stored:
+                    value.add_link_from(self.calc, output_port,
+                                        LinkType.CREATE)
+                    if self.inputs._store_provenance:
+                        value.store()
+                        instrumentation.count(instrumentation.NODES_STORED)
+                value.add_link_from(self.calc, output_port, LinkType.RETURN)
     #################################################################
 
     @override
     def do_run(self):
         # Exclude all private inputs
         ins = {k: v for k, v in self.inputs.iteritems() if not k.startswith('_')}
+        if self._can_fast_forward(ins):
+            return self._fast_forward()
         return self._run(**ins)
 
     @protected
@@ -288,16 +331,62 @@ class Process(plum.process.Process):
     #     return parsed
 
     def _create_and_setup_db_record(self):
-        self._calc = self.create_db_record()
-        self._setup_db_record()
-        if self.inputs._store_provenance:
-            self.calc.store_all()
+        with instrumentation.phase(instrumentation.SETUP_DB_RECORD, self):
+            self._calc = self.create_db_record()
+            self._setup_db_record()
+            if self.inputs._store_provenance:
+                batch = _get_db_records_batch()
+                if batch is not None:
+                    # Stored at the end of the batch, see db_records_batch
+                    batch.add_process(self)
+                else:
+                    self.calc.store_all()
+                    instrumentation.count(instrumentation.NODES_STORED)
 
         if self.calc.pk is not None:
             return self.calc.pk
         else:
             return uuid.UUID(self.calc.uuid)
 
+    def _add_pending_link(self, output, label, link_type):
+        # Check now that the link is allowed, as add_link_from would do
+        self.calc._linking_as_output(output, link_type)
+        self._pending_links.append((self.calc, output, label, link_type))
+
+    def _store_pending_outputs(self):
+        """
+        Store the outputs emitted since the last call, in a single
+        transaction with their CREATE links, then create the RETURN links
+        to the outputs with a single insertion.
+        """
+        from aiida.orm import Node
+
+        outputs, self._pending_outputs = self._pending_outputs, []
+        links, self._pending_links = self._pending_links, []
+        if not outputs and not links:
+            return
+
+        with instrumentation.phase(instrumentation.OUTPUT_EMITTED, self):
+            # An output may have been stored in the meantime, e.g. as the
+            # input of another process: its CREATE link was stored with it
+            to_store = [output for output in outputs if not output.is_stored]
+            if to_store:
+                Node.store_many(to_store)
+                instrumentation.count(instrumentation.NODES_STORED,
+                                      len(to_store))
+            if links:
+                self.calc._add_dblinks(links)
+
+    def _use_calc_pk_as_pid(self):
+        """
+        Once the calculation has been stored at the end of a
+        db_records_batch, replace the temporary pid of the process with the
+        pk of the calculation.
+        """
+        old_pid, self._pid = self._pid, self.calc.pk
+        # The monitor knows the process by the pid it had when created
+        MONITOR._processes[self._pid] = MONITOR._processes.pop(old_pid)
+
     def _setup_db_record(self):
         assert self.inputs is not None
         assert not self.calc.is_sealed, \
@@ -307,9 +396,42 @@ class Process(plum.process.Process):
         self.calc._set_attr(PROCESS_LABEL_ATTR, self.__class__.__name__)
 
         parent_calc = self.get_parent_calc()
+        batch = (_get_db_records_batch() if self.inputs._store_provenance
+                 else None)
+
+        for name, input in self._get_inputs_to_link().iteritems():
+            # In a batch, an input shared with a previous process is not
+            # stored yet, but was already set up
+            if not input.is_stored and (batch is None or
+                                        batch.add_node(input)):
+                # If the input isn't stored then assume our parent created it
+                if parent_calc:
+                    input.add_link_from(parent_calc, "CREATE",
+                                        link_type=LinkType.CREATE)
+                if self.inputs._store_provenance and batch is None:
+                    input.store()
+                    instrumentation.count(instrumentation.NODES_STORED)
+
+            self.calc.add_link_from(input, name)
+
+        if parent_calc:
+            self.calc.add_link_from(parent_calc, "CALL",
+                                    link_type=LinkType.CALL)
+
+        if self.raw_inputs:
+            if '_description' in self.raw_inputs:
+                self.calc.description = self.raw_inputs._description
+            if '_label' in self.raw_inputs:
+                self.calc.label = self.raw_inputs._label
+
+    def _get_inputs_to_link(self):
+        """
+        Get a dictionary of all the inputs to link to the calculation node,
+        this is needed to deal with things like input groups.
 
-        # First get a dictionary of all the inputs to link, this is needed to
-        # deal with things like input groups
+        :return: a dictionary with the link labels as keys and the input
+            nodes as values
+        """
         to_link = {}
         for name, input in self.inputs.iteritems():
             # Ignore all inputs starting with a leading underscore
@@ -327,35 +449,81 @@ class Process(plum.process.Process):
                 # It's not in the spec, so we better support dynamic inputs
                 assert self.spec().has_dynamic_input()
                 to_link[name] = input
+        return to_link
 
-        for name, input in to_link.iteritems():
-            if not input.is_stored:
-                # If the input isn't stored then assume our parent created it
-                if parent_calc:
-                    input.add_link_from(parent_calc, "CREATE",
-                                        link_type=LinkType.CREATE)
-                if self.inputs._store_provenance:
-                    input.store()
+    def _is_hashable(self):
+        """
+        Can this process be fast-forwarded, or be used to fast-forward other
+        processes?
+        """
+        return (self.spec().is_fastforwardable() and
+                self.inputs._store_provenance)
 
-            self.calc.add_link_from(input, name)
+    def _get_process_identity(self):
+        """
+        Get what identifies the code run by this process, as part of its hash.
+        """
+        return [self.__class__.__module__, self.__class__.__name__]
 
-        if parent_calc:
-            self.calc.add_link_from(parent_calc, "CALL",
-                                    link_type=LinkType.CALL)
+    def _get_hash(self):
+        """
+        Get a hash of this process, that is the same for all processes running
+        the same code on inputs with the same content.
 
-        if self.raw_inputs:
-            if '_description' in self.raw_inputs:
-                self.calc.description = self.raw_inputs._description
-            if '_label' in self.raw_inputs:
-                self.calc.label = self.raw_inputs._label
+        :return: a string, or None if some input cannot be hashed
+        """
+        from aiida.common.hashing import make_hash
+
+        if self._hash is None:
+            try:
+                self._hash = make_hash([
+                    self._get_process_identity(),
+                    {name: input.get_hash() for name, input in
+                     self._get_inputs_to_link().iteritems()}])
+            except ValueError as e:
+                self.logger.debug("Cannot hash the process {}: {}".format(
+                    self.pid, e.message))
+                self._hash = False
+        return self._hash or None
 
     def _can_fast_forward(self, inputs):
-        return False
+        """
+        Look for a finished process with the same hash as this one, whose
+        outputs can be reused instead of running this process.
+
+        :param inputs: the inputs the process would be run with
+        :return: True if such a process was found
+        """
+        from aiida.orm.calculation import Calculation
+        from aiida.orm.querybuilder import QueryBuilder
+
+        if not self._is_hashable() or self._get_hash() is None:
+            return False
+
+        qb = QueryBuilder()
+        qb.append(Calculation, filters={
+            'attributes.{}'.format(PROCESS_HASH_ATTR): self._get_hash(),
+            'id': {'!==': self.calc.pk}})
+        qb.limit(1)
+        res = qb.first()
+        if res is None:
+            return False
+
+        self._fast_forward_node = res[0]
+        return True
 
     def _fast_forward(self):
-        node = None  # Here we should find the old node
-        for k, v in node.get_output_dict():
-            self.out(k, v)
+        """
+        Emit, as outputs of this process, the outputs returned by the
+        finished process found by _can_fast_forward.
+        """
+        node = self._fast_forward_node
+        self.logger.info("Fast-forwarding {} using the outputs of {}".format(
+            self.calc.pk, node.pk))
+        self.calc._set_attr(FAST_FORWARDED_FROM_ATTR, node.pk)
+        for label, output in node.get_outputs(also_labels=True,
+                                              link_type=LinkType.RETURN):
+            self.out(label, output)
 
 
 class FunctionProcess(Process):
@@ -427,6 +595,18 @@ class FunctionProcess(Process):
         assert (len(args) == len(cls._func_args))
         return dict(zip(cls._func_args, args))
 
+    @override
+    def _get_process_identity(self):
+        import inspect
+
+        # The class is built on the fly, and does not say much about the
+        # function it runs
+        try:
+            source = inspect.getsource(self._func)
+        except (IOError, TypeError):
+            source = self._func.func_code.co_code
+        return [self._func.__module__, self._func.__name__, source]
+
     @override
     def _setup_db_record(self):
         super(FunctionProcess, self)._setup_db_record()
@@ -455,6 +635,73 @@ class FunctionProcess(Process):
                     format(outs.__class__))
 
 
+class _DbRecordsBatch(object):
+    """
+    The processes created within a db_records_batch, with the nodes to
+    store at the end of the block.
+    """
+
+    def __init__(self):
+        self.processes = []
+        self.nodes = []
+        self._node_ids = set()
+
+    def add_node(self, node):
+        """
+        :return: False if the node was already added
+        """
+        if id(node) in self._node_ids:
+            return False
+        self._node_ids.add(id(node))
+        self.nodes.append(node)
+        return True
+
+    def add_process(self, process):
+        self.processes.append(process)
+        self.add_node(process.calc)
+
+
+# The current db_records_batch of each thread
+_db_records_batch_local = threading.local()
+
+
+def _get_db_records_batch():
+    return getattr(_db_records_batch_local, 'batch', None)
+
+
+@contextlib.contextmanager
+def db_records_batch():
+    """
+    Within this block, the calculations of the new processes, and their
+    unstored inputs, are not stored one process at a time: they are all
+    stored together with Node.store_many at the end of the block, with their
+    links. The processes then get the pk of their calculation as pid.
+
+    The processes must not be run within the block (see
+    aiida.work.run.submit_many). Nested blocks join the outermost one.
+    """
+    from aiida.orm import Node
+
+    if _get_db_records_batch() is not None:
+        yield
+        return
+
+    batch = _DbRecordsBatch()
+    _db_records_batch_local.batch = batch
+    try:
+        yield
+    finally:
+        _db_records_batch_local.batch = None
+
+    if batch.nodes:
+        with instrumentation.phase(instrumentation.SETUP_DB_RECORD):
+            Node.store_many(batch.nodes)
+            instrumentation.count(instrumentation.NODES_STORED,
+                                  len(batch.nodes))
+    for process in batch.processes:
+        process._use_calc_pk_as_pid()
+
+
 class _ProcessFinaliser(plum.process_monitor.ProcessMonitorListener):
     """
     Take care of finalising a process when it finishes either through successful
@@ -465,6 +712,9 @@ class _ProcessFinaliser(plum.process_monitor.ProcessMonitorListener):
 
     @override
     def on_monitored_process_destroying(self, process):
+        if isinstance(process, Process):
+            # E.g. if the process failed after emitting some outputs
+            process._store_pending_outputs()
         aiida.work.util.ProcessStack.pop(process)
 
     @override
@@ -1,4 +1,6 @@
 
+import time
+
 import plum.process
 import plum.knowledge_provider
 import plum.in_memory_database
@@ -7,6 +9,81 @@ import aiida.common.exceptions as exceptions
 from aiida.common.lang import override
 from aiida.work.util import ProcessStack
 
+# How long (in seconds) the state of a calculation that has not finished is
+# cached, so that the barriers of all the processes ticked at the same time
+# are checked with the same few queries
+FINISHED_CACHE_TIME = 2
+
+# pk -> (time of the query, (job_ready, process_finished))
+_finished_cache = {}
+
+
+def clear_finished_cache():
+    """
+    Forget the cached states of the calculations (e.g. at the beginning of
+    each tick of the workflow engine).
+    """
+    _finished_cache.clear()
+
+
+def get_finished_states(pks):
+    """
+    Get, with one query per calculation type, whether the given calculations
+    have finished. The results are cached: a finished calculation does not
+    change state any more, the others are queried again after
+    FINISHED_CACHE_TIME.
+
+    :param pks: The pks of the calculations
+    :return: A dictionary {pk: (job_ready, process_finished)} where job_ready
+        is True if the calculation is not running (see
+        WaitOnJobCalculation) and process_finished if it has finished (see
+        ProcessRegistry.has_finished). Calculations of other types, or not
+        found, are not in the dictionary.
+    """
+    from aiida.common.datastructures import calc_states
+    from aiida.orm.calculation.job import JobCalculation
+    from aiida.orm.calculation.work import WorkCalculation
+    from aiida.orm.querybuilder import QueryBuilder
+
+    now = time.time()
+    finished = {}
+    to_query = []
+    # Processes that are not stored have a uuid as pid
+    for pk in (pk for pk in pks if isinstance(pk, (int, long))):
+        cached = _finished_cache.get(pk)
+        if cached is not None and (
+                cached[1][1] or now - cached[0] < FINISHED_CACHE_TIME):
+            finished[pk] = cached[1]
+        else:
+            to_query.append(pk)
+    if not to_query:
+        return finished
+
+    running_states = [calc_states.TOSUBMIT, calc_states.SUBMITTING,
+                      calc_states.WITHSCHEDULER, calc_states.COMPUTED,
+                      calc_states.RETRIEVING, calc_states.PARSING]
+    finished_states = [calc_states.FINISHED, calc_states.SUBMISSIONFAILED,
+                       calc_states.RETRIEVALFAILED, calc_states.PARSINGFAILED,
+                       calc_states.FAILED]
+
+    queried = {}
+    qb = QueryBuilder()
+    qb.append(JobCalculation, filters={'id': {'in': to_query}},
+              project=['id', 'attributes.state'])
+    for pk, state in qb.all():
+        queried[pk] = (state not in running_states, state in finished_states)
+
+    qb = QueryBuilder()
+    qb.append(WorkCalculation, filters={'id': {'in': to_query}},
+              project=['id', 'attributes._sealed'])
+    for pk, sealed in qb.all():
+        queried[pk] = (True, bool(sealed))
+
+    for pk, states in queried.iteritems():
+        _finished_cache[pk] = (now, states)
+    finished.update(queried)
+    return finished
+
 
 class ProcessRegistry(plum.knowledge_provider.KnowledgeProvider):
     """
@@ -21,8 +98,31 @@ class ProcessRegistry(plum.knowledge_provider.KnowledgeProvider):
     def current_calc_node(self):
         return ProcessStack.top().calc
 
+    def have_finished(self, pids):
+        """
+        Check if several processes have finished, with a few database
+        queries.
+
+        :param pids: The pids of the processes
+        :return: A dictionary {pid: finished}
+        :raise plum.knowledge_provider.NotKnown: if some of the pids are not
+            calculations of the workflow engine
+        """
+        states = get_finished_states(pids)
+        unknown = [pid for pid in pids if pid not in states]
+        if unknown:
+            raise plum.knowledge_provider.NotKnown(
+                "Can't find processes with pk {}".format(unknown))
+        return {pid: states[pid][1] for pid in pids}
+
     @override
     def has_finished(self, pid):
+        states = get_finished_states([pid])
+        if pid in states:
+            return states[pid][1]
+        return self._has_finished_uncached(pid)
+
+    def _has_finished_uncached(self, pid):
         from aiida.orm.calculation.job import JobCalculation
         from aiida.orm.calculation.work import WorkCalculation
 
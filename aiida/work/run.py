@@ -2,7 +2,7 @@
 
 from aiida.work import util as util
 from aiida.work.defaults import parallel_engine, serial_engine
-from aiida.work.process import Process
+from aiida.work.process import Process, db_records_batch
 import aiida.work.persistence
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
@@ -64,6 +64,49 @@ def submit(process_class, _jobs_store=None, **kwargs):
     return queue_up(process_class, kwargs, _jobs_store)
 
 
+def submit_many(process_class, inputs_list, _jobs_store=None):
+    """
+    Submit several processes of the same class to the daemon, e.g. from a
+    step of a WorkChain that launches many children at once::
+
+        pids = submit_many(MyProcess, [{'x': Int(i)} for i in range(100)])
+        return ToContext(**{'child_{}'.format(i): pid
+                            for i, pid in enumerate(pids)})
+
+    The processes are all created first. Their calculations and unstored
+    inputs are then stored together, with their links, in a single
+    transaction (see aiida.work.process.db_records_batch), and their
+    checkpoints are saved together (in a single transaction with the
+    database persistence).
+
+    :param process_class: The process class to submit
+    :param inputs_list: A list with the inputs of each process
+    :param _jobs_store: The storage engine used to save the processes
+    :return: The list of the pids of the submitted processes, in the same
+        order as inputs_list
+    """
+    assert not util.is_workfunction(process_class),\
+        "You cannot submit a workfunction to the daemon"
+
+    if _jobs_store is None:
+        _jobs_store = aiida.work.persistence.get_default()
+
+    procs = []
+    try:
+        with db_records_batch():
+            for inputs in inputs_list:
+                procs.append(process_class.new_instance(inputs))
+        _jobs_store.save_many(procs)
+    finally:
+        # Whatever happened, the created processes have to be stopped (the
+        # ones that were not saved are lost, as with a failed submit)
+        for proc in procs:
+            proc.stop()
+            proc.run_until_complete()
+
+    return [proc.pid for proc in procs]
+
+
 def queue_up(process_class, inputs, storage):
     """
     This queues up the Process so that it's executed by the daemon when it gets
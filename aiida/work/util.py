@@ -10,6 +10,12 @@ __authors__ = "The AiiDA team."
 
 # The name of the attribute to store the label of a process in a node with.
 PROCESS_LABEL_ATTR = '_process_label'
+# The name of the attribute with the hash of the class and inputs of a
+# fast-forwardable process, set when the process finishes
+PROCESS_HASH_ATTR = '_process_hash'
+# The name of the attribute with the pk of the node whose outputs were
+# reused by a fast-forwarded process
+FAST_FORWARDED_FROM_ATTR = '_fast_forwarded_from'
 
 
 class ProcessStack(object):
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import plum.wait_ons
+from plum.persistence.bundle import Bundle
+from aiida.common.lang import override
+from aiida.work.defaults import class_loader
+
+__copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
+__license__ = "MIT license, see LICENSE.txt file."
+__version__ = "0.7.1"
+__authors__ = "The AiiDA team."
+
+
+class WaitOnAll(plum.wait_ons.WaitOnAll):
+    """
+    Wait on all the WaitOns of a list, getting the state of all the
+    calculations they wait on with a few queries, instead of letting each
+    WaitOn load its own calculation.
+    """
+
+    @override
+    def is_ready(self):
+        from aiida.work.persistence import (
+            get_waiting_on_descriptor, get_waiting_on_pks)
+        from aiida.work.process_registry import get_finished_states
+
+        bundle = Bundle()
+        self.save_instance_state(bundle)
+        # Fill the cache of the registry, that is used by the WaitOns
+        get_finished_states(
+            get_waiting_on_pks(get_waiting_on_descriptor(bundle)))
+        return super(WaitOnAll, self).is_ready()
+
+    @override
+    def save_instance_state(self, out_state):
+        super(WaitOnAll, self).save_instance_state(out_state)
+        out_state.set_class_loader(class_loader)
@@ -6,9 +6,11 @@ from aiida.work.process import Process, ProcessSpec
 from aiida.common.lang import override
 from aiida.common.utils import get_class_string, get_object_string,\
     get_object_from_string
-from plum.wait_ons import Checkpoint, WaitOnAll, WaitOnProcess
+from plum.wait_ons import Checkpoint, WaitOnProcess
 from plum.wait import WaitOn
 from plum.persistence.bundle import Bundle
+from aiida.work.wait_ons import WaitOnAll
+from aiida.work.persistence import to_node_references, from_node_references
 from collections import namedtuple
 
 __copyright__ = u"Copyright (c), This file is part of the AiiDA platform. For further information please visit http://www.aiida.net/. All rights reserved."
@@ -109,8 +111,14 @@ class WorkChain(Process):
             return self._content.setdefault(key, default)
 
         def save_instance_state(self, out_state):
+            # Stored nodes are saved by pk, and loaded back lazily
             for k, v in self._content.iteritems():
-                out_state[k] = v
+                out_state[k] = to_node_references(v)
+
+        @classmethod
+        def create_from(cls, saved_state):
+            # A single resolver loads all the nodes of the context together
+            return cls(from_node_references(dict(saved_state)))
 
     def __init__(self):
         super(WorkChain, self).__init__()
@@ -198,7 +206,8 @@ class WorkChain(Process):
             self._context = self.Context()
         else:
             # Recreate the context
-            self._context = self.Context(saved_instance_state[self._CONTEXT])
+            self._context = self.Context.create_from(
+                saved_instance_state[self._CONTEXT])
 
             # Recreate the stepper
             if self._STEPPER_STATE in saved_instance_state:
@@ -18,3 +18,25 @@ class WorkflowTestEmpty(Workflow):
 
     def __init__(self, **kwargs):
         super(WorkflowTestEmpty, self).__init__(**kwargs)
+
+
+class WorkflowTestSteps(Workflow):
+    """
+    Workflow attaching to its start step the calculations and sub-workflows
+    whose pks are given in the 'calc_pks' and 'sub_workflow_pks'
+    parameters, just for testing
+    """
+
+    def __init__(self, **kwargs):
+        super(WorkflowTestSteps, self).__init__(**kwargs)
+
+    @Workflow.step
+    def start(self):
+        from aiida.orm import load_node, load_workflow
+
+        params = self.get_parameters()
+        for pk in params.get('calc_pks', []):
+            self.attach_calculation(load_node(pk))
+        for pk in params.get('sub_workflow_pks', []):
+            self.attach_workflow(load_workflow(pk))
+        self.next(self.exit)
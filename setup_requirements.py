@@ -12,6 +12,7 @@ install_requires=[
     'supervisor==3.1.3',
     'meld3==1.0.0',
     'numpy',
+    'futures',
     'plum==0.7.5',
     'SQLAlchemy==1.0.12',
     'SQLAlchemy-Utils==0.31.2',